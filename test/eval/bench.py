@@ -0,0 +1,365 @@
+"""Micro-benchmarks of the processing of the experiment results
+
+They run on synthetic inputs (see eval.synthetic) and need neither a
+running network nor root privileges:
+
+    python -m eval.bench run -o baseline.json
+    python -m eval.bench run -o current.json
+    python -m eval.bench compare baseline.json current.json
+
+The launch benchmarks write in the cgroup v2 of the benchmark process so
+they only run when they are named (e.g., -b launch_exec_cgroup) and are
+skipped if this cgroup is not writable.
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import OrderedDict
+from datetime import datetime
+from ipaddress import ip_network
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from reroutemininet.cgroup import current_cgroup, in_cgroup
+
+from .bpf_stats import Snapshot, ShortSnapshot, FlowBenderSnapshot, BPFPaths, MAX_PATHS_BY_DEST
+from .db import IPerfBandwidthSample, ABLatency
+from .db import tcp_ebpf_experiment
+from .db.base import SQLBaseModel
+from .utils import cdf_data
+from . import synthetic
+
+DEFAULT_SIZES = [100, 1000, 10000]
+DEFAULT_REPEAT = 5
+LAUNCHES_BY_SIZE = 100  # The launch benchmarks start size / LAUNCHES_BY_SIZE processes
+REGRESSION_THRESHOLD = 0.2  # Relative increase of the median time
+
+BENCHMARKS = OrderedDict()
+REQUIREMENTS = {}  # name -> function returning why the benchmark cannot run (None if it can)
+
+
+def benchmark(name, requires=None):
+    """Register a benchmark
+
+    The decorated function takes the size of the input, builds it and
+    returns the function to time (without argument).
+
+    :param requires: A function returning why the benchmark cannot run or None,
+     such benchmarks are only run when they are named
+    """
+    def register(setup):
+        BENCHMARKS[name] = setup
+        if requires is not None:
+            REQUIREMENTS[name] = requires
+        return setup
+    return register
+
+
+def writable_cgroup():
+    """Why the processes cannot be moved in the cgroup of this process (None if they can)"""
+    if os.geteuid() != 0:
+        return "it needs root privileges"
+    try:
+        procs = os.path.join(current_cgroup(), "cgroup.procs")
+    except (OSError, ValueError) as e:
+        return str(e)
+    if not os.access(procs, os.W_OK):
+        return "%s is not writable" % procs
+    return None
+
+
+def memory_db():
+    engine = create_engine("sqlite://", echo=False)
+    SQLBaseModel.metadata.create_all(engine)
+    return sessionmaker(bind=engine)()
+
+
+class FakeNode:
+
+    def __init__(self, name):
+        self.name = name
+
+    def intf(self):
+        return self  # Only the node of the interface is used
+
+
+class FakeNet:
+    """The address lookups of ReroutingNet used by BPFPaths"""
+
+    def __init__(self, nbr_hosts):
+        self.nodes = {}
+        self._ip_allocs = {}
+        for i in range(nbr_hosts):
+            node = FakeNode("h%d" % i)
+            node.node = node
+            addr = synthetic.host_address(i)
+            self.nodes[addr] = node
+            self._ip_allocs[addr + "/64"] = node
+
+    def node_for_ip(self, ip):
+        return self.nodes[str(ip).split("/")[0]]
+
+
+@benchmark("snapshot_decoding")
+def snapshot_decoding(size):
+    entries = [synthetic.snapshot_entry(i + 1, i, synthetic.host_address(0), synthetic.host_address(1),
+                                        40000, 5201, i % MAX_PATHS_BY_DEST) for i in range(size)]
+    dump = synthetic.map_dump(entries)
+    return lambda: Snapshot.from_dump(dump)
+
+
+@benchmark("flowbender_snapshot_decoding")
+def flowbender_snapshot_decoding(size):
+    entries = [synthetic.flowbender_snapshot_entry(i + 1, i, synthetic.host_address(0), synthetic.host_address(1),
+                                                   40000, 5201, i % MAX_PATHS_BY_DEST) for i in range(size)]
+    dump = synthetic.map_dump(entries)
+    return lambda: FlowBenderSnapshot.from_dump(dump)
+
+
+@benchmark("short_snapshot_decoding")
+def short_snapshot_decoding(size):
+    entries = [synthetic.short_snapshot_entry(i + 1, i, synthetic.host_address(1), i % MAX_PATHS_BY_DEST)
+               for i in range(size)]
+    dump = synthetic.map_dump(entries)
+    return lambda: ShortSnapshot.from_dump(dump)
+
+
+@benchmark("extract_floats")
+def extract_floats(size):
+    rng = random.Random(size)
+    pairs = [synthetic.encode_floating(rng.uniform(10 ** -3, 10 ** 3)) for _ in range(size)]
+    return lambda: Snapshot.extract_floats(pairs)
+
+
+@benchmark("bpf_paths_parsing")
+def bpf_paths_parsing(size):
+    nbr_hosts = 100
+    net = FakeNet(nbr_hosts)
+    rng = random.Random(size)
+    chains = []
+    for i in range(size):
+        dest = ip_network(synthetic.host_address(i % nbr_hosts) + "/48", strict=False).network_address
+        paths = [[synthetic.host_address(j) for j in rng.sample(range(nbr_hosts), 3)]
+                 for _ in range(MAX_PATHS_BY_DEST // 2)]
+        chains.append(synthetic.dest_map_entry(dest, paths))
+    dump = synthetic.map_dump(chains)
+    return lambda: BPFPaths.from_dump(net, FakeNode("h0"), dump)
+
+
+@benchmark("cdf_data")
+def cdf(size):
+    rng = random.Random(size)
+    values = [rng.expovariate(1) if i % 20 else float("inf") for i in range(size)]
+    return lambda: cdf_data(values)
+
+
+@benchmark("cdf_data_by_instance")
+def cdf_by_instance(size):
+    rng = random.Random(size)
+    values = [round(rng.expovariate(1), 2) for _ in range(size)]
+    return lambda: cdf_data(values, nbr_instances=size)
+
+
+def _experiment(size):
+    nbr_connections = 10
+    db = memory_db()
+    experiment = synthetic.tcp_ebpf_experiment(db, nbr_connections, max(1, size // nbr_connections),
+                                               max(1, size // nbr_connections), seed=size)
+    return db, experiment
+
+
+@benchmark("bw_sum_through_time")
+def bw_sum_through_time(size):
+    db, experiment = _experiment(size)
+
+    def run():
+        tcp_ebpf_experiment.bw_sum_through_time.pop(experiment.id, None)  # Do not time the cache
+        return experiment.bw_sum_through_time(db)
+    return run
+
+
+@benchmark("data_related_snapshots")
+def data_related_snapshots(size):
+    db, experiment = _experiment(size)
+
+    def run():
+        db.expire_all()  # Reload the snapshots at each call
+        return experiment.data_related_snapshots()
+    return run
+
+
+@benchmark("stability_by_connection")
+def stability_by_connection(size):
+    db, experiment = _experiment(size)
+
+    def run():
+        db.expire_all()
+        return experiment.stability_by_connection()
+    return run
+
+
+@benchmark("bulk_insert_bw_samples")
+def bulk_insert_bw_samples(size):
+    db = memory_db()
+    rows = [{"connection_id": 1, "time": i, "bw": 10 ** 7} for i in range(size)]
+    return lambda: db.execute(IPerfBandwidthSample.__table__.insert(), rows)
+
+
+@benchmark("bulk_insert_ab_latencies")
+def bulk_insert_ab_latencies(size):
+    db = memory_db()
+    rows = [{"connection_id": 1, "timestamp": i * 1000, "latency": 1000} for i in range(size)]
+    return lambda: db.execute(ABLatency.__table__.insert(), rows)
+
+
+@benchmark("launch_shell_cgroup", requires=writable_cgroup)
+def launch_shell_cgroup(size):
+    """The former run_cgroup: a bash is moved into the cgroup by a shell before reading the command"""
+    cgroup = current_cgroup()
+
+    def run():
+        for _ in range(max(1, size // LAUNCHES_BY_SIZE)):
+            popen = subprocess.Popen(["bash"], stdin=subprocess.PIPE)
+            os.system("echo %d > %s/cgroup.procs" % (popen.pid, cgroup))
+            popen.stdin.write(b"true")
+            popen.stdin.close()
+            popen.wait()
+    return run
+
+
+@benchmark("launch_preexec_cgroup", requires=writable_cgroup)
+def launch_preexec_cgroup(size):
+    """The child joins the cgroup in a preexec_fn (which forbids the vfork of the Python process)"""
+    procs = os.path.join(current_cgroup(), "cgroup.procs")
+
+    def preexec():
+        with open(procs, "w") as fileobj:
+            fileobj.write("0")
+
+    def run():
+        for _ in range(max(1, size // LAUNCHES_BY_SIZE)):
+            subprocess.Popen(["true"], preexec_fn=preexec).wait()
+    return run
+
+
+@benchmark("launch_exec_cgroup", requires=writable_cgroup)
+def launch_exec_cgroup(size):
+    """The current run_cgroup: a shell joins the cgroup and executes the command"""
+    cmd = in_cgroup(["true"], current_cgroup())
+
+    def run():
+        for _ in range(max(1, size // LAUNCHES_BY_SIZE)):
+            subprocess.Popen(cmd).wait()
+    return run
+
+
+def time_function(function, repeat):
+    durations = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - start)
+    return {"min": min(durations), "median": statistics.median(durations), "repeat": repeat}
+
+
+def metadata():
+    try:
+        commit = subprocess.check_output(["git", "rev-parse", "HEAD"], stderr=subprocess.DEVNULL) \
+            .decode("utf-8").strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {"timestamp": datetime.now().isoformat(), "commit": commit,
+            "python": platform.python_version(), "machine": platform.machine(), "node": platform.node()}
+
+
+def run(names=None, sizes=DEFAULT_SIZES, repeat=DEFAULT_REPEAT):
+    """Time the benchmarks
+
+    :param names: The benchmarks to run (all those without requirements if None)
+    :return: the results in the format saved by the 'run' command
+    """
+    results = OrderedDict()
+    for name, setup in BENCHMARKS.items():
+        if names is None and name in REQUIREMENTS or names is not None and name not in names:
+            continue
+        reason = REQUIREMENTS[name]() if name in REQUIREMENTS else None
+        if reason is not None:
+            print("%-30s skipped: %s" % (name, reason))
+            continue
+        results[name] = OrderedDict()
+        for size in sizes:
+            function = setup(size)
+            function()  # Warm-up (and lazy loadings)
+            results[name][str(size)] = time_function(function, repeat)
+            print("%-30s %8d %12.6f s" % (name, size, results[name][str(size)]["median"]))
+    return {"metadata": metadata(), "results": results}
+
+
+def compare(baseline, current, threshold=REGRESSION_THRESHOLD):
+    """Compare the median times of the benchmarks present in both results
+
+    :return: The list of (name, size, baseline median, current median) that regressed
+    """
+    regressions = []
+    for name, by_size in current["results"].items():
+        for size, result in by_size.items():
+            reference = baseline["results"].get(name, {}).get(size)
+            if reference is None:
+                continue
+            ratio = result["median"] / reference["median"] if reference["median"] > 0 else float("inf")
+            regressed = ratio > 1 + threshold
+            print("%-30s %8s %12.6f s %12.6f s %7.2fx%s"
+                  % (name, size, reference["median"], result["median"], ratio,
+                     " REGRESSION" if regressed else ""))
+            if regressed:
+                regressions.append((name, int(size), reference["median"], result["median"]))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="Run the benchmarks and save the results")
+    run_parser.add_argument("-o", "--output", required=True, help="Path of the JSON results")
+    run_parser.add_argument("-s", "--sizes", type=int, nargs="+", default=DEFAULT_SIZES,
+                            help="Sizes of the inputs")
+    run_parser.add_argument("-r", "--repeat", type=int, default=DEFAULT_REPEAT,
+                            help="Number of timings of each benchmark and size")
+    run_parser.add_argument("-b", "--benchmark", action="append", choices=list(BENCHMARKS),
+                            help="Benchmark to run (can be repeated, all but the launch ones by default)")
+
+    compare_parser = subparsers.add_parser("compare", help="Flag the regressions against a baseline")
+    compare_parser.add_argument("baseline", help="Path of the JSON results of the baseline")
+    compare_parser.add_argument("current", help="Path of the JSON results to compare")
+    compare_parser.add_argument("-t", "--threshold", type=float, default=REGRESSION_THRESHOLD,
+                                help="Relative increase of the median time considered as a regression")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.command == "run":
+        results = run(args.benchmark, args.sizes, args.repeat)
+        with open(args.output, "w") as fileobj:
+            json.dump(results, fileobj, indent=4)
+        return 0
+
+    with open(args.baseline) as fileobj:
+        baseline = json.load(fileobj)
+    with open(args.current) as fileobj:
+        current = json.load(fileobj)
+    regressions = compare(baseline, current, args.threshold)
+    print("%d regression(s)" % len(regressions))
+    return 1 if len(regressions) > 0 else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
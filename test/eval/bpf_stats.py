@@ -4,16 +4,16 @@ import shlex
 import struct
 import subprocess
 from ipaddress import ip_address, ip_network
-from typing import List, Dict
+from typing import List, Dict, TYPE_CHECKING
 
 import numpy
-from ipmininet.utils import L3Router
 
-from reroutemininet.config import SRLocalCtrl
-from reroutemininet.host import ReroutingHost
-from reroutemininet.net import ReroutingNet
+if TYPE_CHECKING:  # The decoding of the snapshots does not need (ip)mininet
+    from reroutemininet.host import ReroutingHost
+    from reroutemininet.net import ReroutingNet
 
 BPFTOOL = "bpftool"
+SNAPSHOT_POLL_INTERVAL = 0.1  # Seconds between two dumps of the stat maps
 
 # struct floating_type {
 # 	__u64 mantissa;
@@ -136,6 +136,7 @@ class Snapshot:
     @classmethod
     def extract_info(cls, node):
         """Create the ordered list of valid snapshots taken a node"""
+        from reroutemininet.config import SRLocalCtrl
 
         # Find the LocalCtrl object to get the map id
         daemon = node.nconfig.daemon(SRLocalCtrl.NAME)
@@ -145,6 +146,11 @@ class Snapshot:
         cmd = "{bpftool} map -j dump id {map_id}" \
             .format(bpftool=BPFTOOL, map_id=getattr(daemon, cls.map_name))
         out = subprocess.check_output(shlex.split(cmd)).decode("utf-8")
+        return cls.from_dump(out)
+
+    @classmethod
+    def from_dump(cls, out):
+        """Create the ordered list of valid snapshots in the output of 'bpftool map -j dump'"""
         snapshots_raw = json.loads(out)
 
         snapshots = []
@@ -306,7 +312,9 @@ class ShortSnapshot(Snapshot):
 
 class BPFPaths:
 
-    def __init__(self, net: ReroutingNet, node: ReroutingHost, byte_chains):
+    def __init__(self, net: 'ReroutingNet', node: 'ReroutingHost', byte_chains):
+        from ipmininet.utils import L3Router
+
         self.src = node.name
         self.byte_chains = byte_chains
         self.paths_by_dest = {}
@@ -364,8 +372,9 @@ class BPFPaths:
         }
 
     @classmethod
-    def extract_info(cls, net: ReroutingNet, node: ReroutingHost):
+    def extract_info(cls, net: 'ReroutingNet', node: 'ReroutingHost'):
         """Create the ordered list of valid snapshots taken a node"""
+        from reroutemininet.config import SRLocalCtrl
 
         # Find the LocalCtrl object to get the map id
         daemon = node.nconfig.daemon(SRLocalCtrl.NAME)
@@ -375,6 +384,11 @@ class BPFPaths:
         cmd = "{bpftool} map -j dump id {map_id}" \
             .format(bpftool=BPFTOOL, map_id=daemon.dest_map_id)
         out = subprocess.check_output(shlex.split(cmd)).decode("utf-8")
+        return cls.from_dump(net, node, out)
+
+    @classmethod
+    def from_dump(cls, net: 'ReroutingNet', node: 'ReroutingHost', out):
+        """Parse the output of 'bpftool map -j dump' for the dest_map of the node"""
         ebpf_map_entries = json.loads(out)
         ebpf_map_entries = ["".join([byte_str[2:]
                                      for byte_str in map_raw["value"]])
@@ -0,0 +1,473 @@
+import asyncio
+import os
+import signal
+import subprocess
+import time
+from concurrent.futures import ThreadPoolExecutor
+from shlex import split
+from typing import Callable, Dict, List, Optional, Tuple
+
+from mininet.log import lg
+
+from reroutemininet.bpf import for_each_node
+from reroutemininet.clean import teardown
+from reroutemininet.config import SRLocalCtrl
+from reroutemininet.cpus import placement, TRAFFIC
+from reroutemininet.net import ReroutingNet
+from reroutemininet.resources import registry
+from reroutemininet.timing import timer
+from .bpf_stats import SNAPSHOT_POLL_INTERVAL
+from .loop_health import LoopHealth
+from .utils import get_addr
+
+PROCESS_POLL_INTERVAL = 0.05  # Only used if pidfd_open is not available
+THROUGHPUT_REPORT_INTERVAL = 10
+STOP_TIMEOUT = 10
+PROBE_TIMEOUT = 2
+PROBE_WORKERS = 32
+PROBE_BACKOFF = 0.5  # Initial delay before probing again the disconnected pairs
+PROBE_MAX_BACKOFF = 4
+CONNECTIVITY_DEADLINE = 30
+
+
+def apply_changes(seconds_since_start: float, net: ReroutingNet):
+    """Apply the pending changes due at this time as one batch
+
+    The interfaces of all the changes are resolved before sending their
+    netlink requests back to back so that the changes happen together.
+    """
+    due = [change for change in net.topo.pending_changes if change.time <= seconds_since_start]
+    requests = [(change, change.netlink_request(net)) for change in due if not change.ddos]
+    applied_time = time.monotonic()
+    for change, request in requests:
+        change.applied_time = applied_time
+        request()
+    for change in due:
+        if change.ddos:
+            change.start_ddos(net)
+        print("CHANGE APPLIED: {}".format(change))
+        net.topo.applied_changes.append(change)
+
+    net.topo.pending_changes = \
+        sorted(list(filter(lambda x: x not in net.topo.applied_changes,
+                           net.topo.pending_changes)))
+
+
+def revert_changes(net: ReroutingNet):
+    for change in net.topo.applied_changes:
+        change.revert(net)
+
+    if len(net.topo.applied_changes) > 0:
+        time.sleep(5)
+
+
+class WarmNetwork:
+    """Keep the network of a topology running between experiments
+
+    Only the state that an experiment changes is reset when the network is
+    reused: the processes of the measurement tools, the link changes and
+    the eBPF maps (except the destination maps filled by the daemons).
+    The network is started again from scratch if the reset fails.
+    """
+
+    def __init__(self):
+        self.key = None
+        self.net: Optional[ReroutingNet] = None
+
+    def get(self, key, build: Callable[[], ReroutingNet],
+            probes: Callable[[ReroutingNet], List[Tuple[str, str]]]) -> ReroutingNet:
+        """Return the running network of the key or start a new one
+
+        :param key: The identifier of the network (e.g., the path of the topology)
+        :param build: A function creating the network if it cannot be reused
+        :param probes: A function returning the (source, destination) host pairs
+         of the network that must be connected
+        """
+        if self.net is not None and self.key == key:
+            with timer.span("reset"):
+                reset = self.reset(probes(self.net))
+            if reset:
+                return self.net
+            lg.error("Cannot reset the network of %s, starting it again\n" % key)
+
+        self.stop()
+        with timer.span("build"):
+            net = build()
+        try:
+            with timer.span("start"):
+                net.start()
+        except BaseException:
+            teardown(net)
+            raise
+        self.net = net
+        self.key = key
+        return net
+
+    def reset(self, probes: List[Tuple[str, str]]) -> bool:
+        """Bring the running network back to its initial state
+
+        :return: True iff the probes succeeded after the reset
+        """
+        start = time.time()
+        # Processes left by the experiment (the daemons are not recorded)
+        for failure in registry.release(("process",)):
+            lg.error("Cannot release the %s %s: %s\n" % failure)
+
+        try:
+            self.net.topo.reset_changes(self.net)
+        except (subprocess.CalledProcessError, ValueError, KeyError) as e:
+            lg.error("Cannot reset the link changes: %s\n" % e)
+            return False
+        if self.net.topo.ebpf:
+            with timer.span("reset_maps"):
+                failures = for_each_node(self.net.hosts, lambda h: h.nconfig.daemon(SRLocalCtrl).reset_maps(),
+                                         "reset the maps")
+            for failure in failures:
+                lg.error("Cannot reset the eBPF maps of %s: %s\n" % (failure.node, failure))
+            if len(failures) > 0:
+                return False
+
+        with timer.span("connectivity"):
+            connected = probe_connectivity(self.net, probes)
+        lg.info("Network reset in %.1f seconds\n" % (time.time() - start))
+        return connected
+
+    def stop(self):
+        if self.net is not None:
+            with timer.span("teardown"):
+                teardown(self.net)
+        self.net = None
+        self.key = None
+
+
+def _ping(net: ReroutingNet, src: str, dst: str, timeout) -> bool:
+    popen = net[src].popen(split("ping6 -c 1 -W {timeout} {addr}".format(timeout=timeout, addr=get_addr(net[dst]))),
+                           stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    return popen.wait() == 0
+
+
+def probe_connectivity(net: ReroutingNet, probes: List[Tuple[str, str]], timeout=PROBE_TIMEOUT,
+                       deadline=0, workers=PROBE_WORKERS) -> bool:
+    """Ping concurrently the destination of each pair from its source
+
+    The pairs that fail are probed again with an exponential backoff
+    until they succeed or the deadline expires.
+
+    :param deadline: The number of seconds during which the failed pairs are retried (0 to probe once)
+    :param workers: The maximum number of pings running at the same time
+    :return: True iff all the pairs are connected
+    """
+    end = time.time() + deadline
+    pending = list(dict.fromkeys(probes))
+    backoff = PROBE_BACKOFF
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while len(pending) > 0:
+            connected = list(executor.map(lambda pair: _ping(net, pair[0], pair[1], timeout), pending))
+            pending = [pair for i, pair in enumerate(pending) if not connected[i]]
+            if len(pending) == 0 or time.time() + backoff > end:
+                break
+            time.sleep(backoff)
+            backoff = min(2 * backoff, PROBE_MAX_BACKOFF)
+
+    for src, dst in pending:
+        lg.error("No connectivity between %s and %s\n" % (src, dst))
+    return len(pending) == 0
+
+
+class SupervisedProcess:
+    """A process launched in the network and watched by the controller"""
+
+    def __init__(self, name: str, popen: subprocess.Popen, critical=True,
+                 stop_signal=signal.SIGTERM):
+        """
+        :param name: The name used in the logs
+        :param popen: The Popen object of the process
+        :param critical: Whether a failure of this process aborts the experiment
+        :param stop_signal: The signal sent to stop the process gracefully
+        """
+        self.name = name
+        self.popen = popen
+        self.critical = critical
+        self.stop_signal = stop_signal
+        self.exit_time = -1  # time.time() when the exit was noticed
+
+    @property
+    def returncode(self):
+        return self.popen.poll()
+
+    def running(self):
+        return self.popen.poll() is None
+
+    async def wait(self):
+        """Wait for the end of the process without blocking the event loop"""
+        loop = asyncio.get_running_loop()
+        try:
+            pidfd = os.pidfd_open(self.popen.pid)
+        except (AttributeError, OSError):  # Old kernel/python or already reaped
+            pidfd = None
+
+        if pidfd is not None:
+            exited = loop.create_future()
+            loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+            try:
+                if self.running():
+                    await exited
+            finally:
+                loop.remove_reader(pidfd)
+                os.close(pidfd)
+        while self.running():
+            await asyncio.sleep(PROCESS_POLL_INTERVAL)
+
+        if self.exit_time < 0:
+            self.exit_time = time.time()
+        return self.returncode
+
+    def __str__(self):
+        return "SupervisedProcess<{name}-{pid}>".format(name=self.name, pid=self.popen.pid)
+
+
+class ExperimentController:
+    """Drive one experiment on a network: the processes are supervised as
+    coroutines while snapshot polling and link changes are timed tasks.
+
+    It is used as a context manager wrapping the network lifecycle:
+
+        with ExperimentController(net) as controller:
+            controller.supervise("iperf", popen)
+            controller.collect_snapshots(hosts, Snapshot)
+            controller.run(measurement_time)
+
+    If a WarmNetwork is given, the network is already running and is kept
+    running at the end of the experiment (unless it fails).
+    """
+
+    def __init__(self, net: ReroutingNet, poll_interval=SNAPSHOT_POLL_INTERVAL,
+                 warm: Optional[WarmNetwork] = None):
+        self.net = net
+        self.warm = warm
+        self.poll_interval = poll_interval
+        self.processes: List[SupervisedProcess] = []
+        self.snap_class = None
+        self.snapshots: Dict[str, set] = {}
+        self.throughput_sources = []
+        self.start_time = -1
+        self.health: Optional[LoopHealth] = None  # Health of the last measurement loop
+        self.contention: Optional[dict] = None  # CPU contention during the last measurement loop
+        self.failure: Optional[str] = None
+        self._abort: Optional[asyncio.Event] = None
+
+    # Network lifecycle
+
+    def __enter__(self):
+        placement.pin_controller()
+        if self.warm is not None:
+            return self
+        try:
+            with timer.span("start"):
+                self.net.start()
+        except BaseException:
+            self.teardown()
+            placement.unpin_controller()
+            raise
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if self.warm is not None and exc_type is not None:
+            self.stop_processes()
+            self.warm.stop()  # Do not reuse a network in an unknown state
+        else:
+            self.teardown()
+        placement.unpin_controller()
+        return False
+
+    def teardown(self):
+        with timer.span("teardown"):
+            self.stop_processes()
+            if self.warm is None:
+                teardown(self.net)
+
+    # Processes
+
+    def supervise(self, name: str, popen: subprocess.Popen, critical=True,
+                  stop_signal=signal.SIGTERM, cpu_class=TRAFFIC) -> SupervisedProcess:
+        """
+        :param cpu_class: The class of CPUs on which the process is placed (see reroutemininet.cpus),
+         None if it is already placed (e.g., by ReroutingHost.run_cgroup that restricts its eBPF cgroup,
+         placing it again could move it out of this cgroup before it executes the command)
+        """
+        process = SupervisedProcess(name, registry.process(popen), critical=critical, stop_signal=stop_signal)
+        if cpu_class is not None:
+            placement.place(cpu_class, popen.pid)
+        self.processes.append(process)
+        return process
+
+    def wait_startup(self, processes: List[SupervisedProcess], delay: float) -> bool:
+        """Let the processes start during 'delay' seconds
+        but give up as soon as one of them exits
+
+        :return: True iff all the processes are still running
+        """
+        return asyncio.run(self._wait_startup(processes, delay))
+
+    async def _wait_startup(self, processes, delay):
+        if len(processes) == 0:
+            await asyncio.sleep(delay)
+            return True
+
+        waiters = [asyncio.ensure_future(p.wait()) for p in processes]
+        done, pending = await asyncio.wait(waiters, timeout=delay,
+                                           return_when=asyncio.FIRST_COMPLETED)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+        for process in processes:
+            if not process.running():
+                self.failure = "The %s exited too early with err=%s" % (process.name, process.returncode)
+                lg.error(self.failure + "\n")
+        return len(done) == 0
+
+    def stop_processes(self, processes: Optional[List[SupervisedProcess]] = None,
+                       timeout: float = STOP_TIMEOUT):
+        """Send the stop signal to all the running processes concurrently
+        and kill the ones that are still running after the timeout"""
+        processes = self.processes if processes is None else processes
+        running = [p for p in processes if p.running()]
+        if len(running) == 0:
+            return
+
+        for process in running:
+            if process.critical:
+                lg.error("The %s has not finish yet\n" % process.name)
+            process.popen.send_signal(process.stop_signal)
+        asyncio.run(self._wait_all(running, timeout))
+
+        for process in running:
+            if process.running():
+                process.popen.kill()
+                process.popen.wait()
+
+    @staticmethod
+    async def _wait_all(processes, timeout):
+        try:
+            await asyncio.wait_for(asyncio.gather(*[p.wait() for p in processes]), timeout=timeout)
+        except asyncio.TimeoutError:
+            pass
+
+    # Measurement
+
+    def collect_snapshots(self, hosts: List[str], snap_class):
+        """Poll the eBPF stat maps of the hosts during the next runs"""
+        self.snap_class = snap_class
+        for h in hosts:
+            self.snapshots.setdefault(h, set())
+
+    def sorted_snapshots(self) -> Dict[str, list]:
+        return {h: sorted(snaps) for h, snaps in self.snapshots.items()}
+
+    def follow_throughput(self, source):
+        """Report the live throughput of the source during the next runs
+
+        :param source: An object with a last_bw() method returning bps (e.g., an IPerfStream)
+        """
+        self.throughput_sources.append(source)
+
+    def throughput(self) -> float:
+        """The current throughput of all the followed sources in bps"""
+        return sum(source.last_bw() for source in self.throughput_sources)
+
+    def run(self, duration: float, link_changes=True) -> bool:
+        """Measure during 'duration' seconds, the measurement ends earlier
+        if a critical process fails
+
+        :param duration: The measurement time in seconds
+        :param link_changes: Whether the pending changes of the topology are applied
+        :return: True iff no critical process failed
+        """
+        before = placement.sample()
+        start = time.monotonic()
+        try:
+            with timer.span("measurement"):
+                return asyncio.run(self._run(duration, link_changes))
+        finally:
+            self.contention = placement.contention(before, placement.sample(), time.monotonic() - start)
+            if self.contention["contended"]:
+                lg.warning("The CPUs were contended during the measurement (busy fractions: %s)\n"
+                           % ", ".join("%s %.2f" % (cpu_class, busy)
+                                       for cpu_class, busy in self.contention["busy"].items()))
+
+    async def _run(self, duration, link_changes):
+        self._abort = asyncio.Event()
+        self.start_time = time.time()
+        self.health = LoopHealth(self.poll_interval, self.start_time)
+
+        tasks = [asyncio.ensure_future(self._watch(p)) for p in self.processes if p.running()]
+        if self.snap_class is not None:
+            tasks.append(asyncio.ensure_future(self._poll_snapshots()))
+        if link_changes:
+            tasks.append(asyncio.ensure_future(self._link_changes()))
+        if len(self.throughput_sources) > 0:
+            tasks.append(asyncio.ensure_future(self._report_throughput()))
+
+        try:
+            await asyncio.wait_for(self._abort.wait(), timeout=duration)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            self.health.stop()
+        return self.failure is None
+
+    async def _watch(self, process: SupervisedProcess):
+        returncode = await process.wait()
+        if returncode != 0 and process.critical:
+            self.failure = "The %s failed with err=%s after %.1f seconds" \
+                           % (process.name, returncode, process.exit_time - self.start_time)
+            lg.error(self.failure + "\n")
+            self._abort.set()
+
+    def _extract_snapshots(self, h):
+        start = time.monotonic()
+        nbr_snapshots = len(self.snapshots[h])
+        self.snapshots[h].update(self.snap_class.extract_info(self.net[h]))
+        self.health.extraction(h, time.monotonic() - start, len(self.snapshots[h]) - nbr_snapshots)
+
+    async def _poll_snapshots(self):
+        loop = asyncio.get_running_loop()
+        next_poll = loop.time()
+        while True:
+            poll_start = loop.time()
+            lag = poll_start - next_poll
+            next_poll = poll_start + self.poll_interval
+            # bpftool calls are blocking, so hosts are polled concurrently in threads
+            try:
+                await asyncio.gather(*[loop.run_in_executor(None, self._extract_snapshots, h)
+                                       for h in self.snapshots])
+            except Exception as e:
+                self.failure = "Cannot extract the snapshots: %s" % e
+                lg.error(self.failure + "\n")
+                self._abort.set()
+                raise
+            self.health.poll(loop.time() - poll_start, lag)
+            await asyncio.sleep(max(0.0, next_poll - loop.time()))
+
+    async def _report_throughput(self):
+        while True:
+            await asyncio.sleep(THROUGHPUT_REPORT_INTERVAL)
+            lg.info("Live throughput after %.0f seconds: %.2f Mbps\n"
+                    % (time.time() - self.start_time, self.throughput() / 10 ** 6))
+
+    async def _link_changes(self):
+        loop = asyncio.get_running_loop()
+        for change_time in sorted({change.time for change in self.net.topo.pending_changes}):
+            await asyncio.sleep(max(0.0, self.start_time + change_time - time.time()))
+            self.health.change(change_time)
+            try:
+                await loop.run_in_executor(None, apply_changes, time.time() - self.start_time, self.net)
+            except Exception as e:
+                self.failure = "Cannot apply the link changes: %s" % e
+                lg.error(self.failure + "\n")
+                self._abort.set()
+                raise
@@ -4,10 +4,15 @@ import shutil
 from sqlalchemy import create_engine
 from sqlalchemy.orm import sessionmaker, Session
 
-from eval.db.ab_results import ABResults, ABLatencyCDF, ABLatency
+from eval.db.ab_results import ABResults, ABLatencyCDF, ABLatency, ABLatencySketch
 from eval.db.base import SQLBaseModel
+from eval.db.cpu_placement import CPUPlacementDBEntry, CPUPlacementShortDBEntry
+from eval.db.fluid_reference import FluidReferenceDBEntry
+from eval.db.interactive_results import InteractiveResults, InteractiveRequest
 from eval.db.iperf_results import IPerfResults, IPerfConnections, \
     IPerfBandwidthSample
+from eval.db.loop_health import LoopHealthDBEntry, LoopHealthShortDBEntry
+from eval.db.phase_spans import PhaseSpan, PhaseSpanShort
 from eval.db.short_tcp_ebpf_experiment import ShortTCPeBPFExperiment
 from eval.db.snapshots import SnapshotDBEntry, SnapshotShortDBEntry
 from eval.db.tcp_ebpf_experiment import TCPeBPFExperiment
@@ -31,4 +36,7 @@ def get_connection(readonly=False) -> Session:
 __all__ = ["IPerfResults", "IPerfResults", "IPerfConnections",
            "IPerfBandwidthSample", "TCPeBPFExperiment", "SnapshotDBEntry",
            "get_connection", "ShortTCPeBPFExperiment", "ABLatencyCDF",
-           "ABResults", "SnapshotShortDBEntry", "ABLatency"]
+           "ABResults", "SnapshotShortDBEntry", "ABLatency", "InteractiveResults",
+           "InteractiveRequest", "PhaseSpan", "PhaseSpanShort", "LoopHealthDBEntry",
+           "LoopHealthShortDBEntry", "CPUPlacementDBEntry", "CPUPlacementShortDBEntry",
+           "FluidReferenceDBEntry", "ABLatencySketch"]
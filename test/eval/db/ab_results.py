@@ -1,8 +1,9 @@
 from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey, \
-    BigInteger
+    BigInteger, LargeBinary
 from sqlalchemy.orm import relationship
 
 from eval.db.base import SQLBaseModel
+from eval.latency_sketch import LogHistogram
 
 
 class ABResults(SQLBaseModel):
@@ -22,6 +23,7 @@ class ABResults(SQLBaseModel):
 
     ab_latency_cdf = relationship("ABLatencyCDF", backref="ab", lazy='dynamic')
     ab_latency = relationship("ABLatency", backref="ab", lazy='dynamic')
+    ab_latency_sketch = relationship("ABLatencySketch", backref="ab", lazy='dynamic')
 
     def latency_over_time(self):
         """in ms and ordered"""
@@ -34,6 +36,13 @@ class ABResults(SQLBaseModel):
                               sample.latency / 10**3))
         return latencies
 
+    def latency_sketch(self) -> LogHistogram:
+        """The sketch of the latencies in µs, built from the samples if it was not saved"""
+        entry = self.ab_latency_sketch.first()
+        if entry is not None:
+            return entry.histogram()
+        return LogHistogram.of(latency for latency, in self.ab_latency.with_entities(ABLatency.latency))
+
 
 class ABLatencyCDF(SQLBaseModel):
     __tablename__ = 'ab_latency_cdf'
@@ -51,3 +60,21 @@ class ABLatency(SQLBaseModel):
 
     timestamp = Column(Float, nullable=False)  # in µs
     latency = Column(Float, nullable=False)  # in µs
+
+
+class ABLatencySketch(SQLBaseModel):
+    """Mergeable quantile sketch of the latencies of an ABResults (see eval.latency_sketch)"""
+    __tablename__ = 'ab_latency_sketches'
+    id = Column(Integer, primary_key=True)
+    connection_id = Column(Integer, ForeignKey('ab_results.id'))
+
+    relative_accuracy = Column(Float, nullable=False)
+    count = Column(BigInteger, nullable=False)
+    sketch = Column(LargeBinary, nullable=False)  # LogHistogram.to_bytes() of the latencies in µs
+
+    def histogram(self) -> LogHistogram:
+        return LogHistogram.from_bytes(self.sketch)
+
+    @classmethod
+    def from_histogram(cls, histogram: LogHistogram):
+        return cls(relative_accuracy=histogram.alpha, count=histogram.count, sketch=histogram.to_bytes())
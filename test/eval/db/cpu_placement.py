@@ -0,0 +1,40 @@
+import json
+
+from sqlalchemy import Column, Integer, String, Float, Boolean, Text, ForeignKey
+
+from eval.db.base import SQLBaseModel
+
+
+class CPUPlacementColumns:
+    """CPU placement of the processes of an experiment and contention of its measurement
+    (see reroutemininet.cpus)"""
+    id = Column(Integer, primary_key=True)
+
+    mechanism = Column(String)  # "cgroup", "affinity" or None without placement
+    policy = Column(Text, nullable=False)  # json of the form {class: "0-2,5"}
+    busy = Column(Text, nullable=False)  # json of the form {class: busy fraction of its CPUs}
+    busy_all = Column(Float, nullable=False)  # busy fraction of all the CPUs
+    stall = Column(Float)  # fraction of the time during which a task waited for a CPU
+    contended = Column(Boolean, nullable=False)
+
+    def cpus(self):
+        return json.loads(self.policy)
+
+    def busy_by_class(self):
+        return json.loads(self.busy)
+
+    @classmethod
+    def from_contention(cls, contention: dict):
+        return cls(mechanism=contention["mechanism"], policy=json.dumps(contention["policy"]),
+                   busy=json.dumps(contention["busy"]), busy_all=contention["busy_all"],
+                   stall=contention["stall"], contended=contention["contended"])
+
+
+class CPUPlacementDBEntry(CPUPlacementColumns, SQLBaseModel):
+    __tablename__ = 'cpu_placements'
+    experience_id = Column(Integer, ForeignKey('tcp_ebpf_experiments.id'))
+
+
+class CPUPlacementShortDBEntry(CPUPlacementColumns, SQLBaseModel):
+    __tablename__ = 'cpu_placements_short'
+    experience_id = Column(Integer, ForeignKey('short_tcp_ebpf_experiments.id'))
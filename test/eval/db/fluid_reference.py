@@ -0,0 +1,27 @@
+import json
+
+from sqlalchemy import Column, Integer, String, Float, Text, ForeignKey
+
+from eval.db.base import SQLBaseModel
+
+
+class FluidReferenceDBEntry(SQLBaseModel):
+    """Throughput achievable by the bulk flows of an experiment according
+    to the fluid model of a routing (see eval.fluid)"""
+    __tablename__ = 'fluid_references'
+
+    id = Column(Integer, primary_key=True)
+    experience_id = Column(Integer, ForeignKey('tcp_ebpf_experiments.id'))
+
+    model = Column(String, nullable=False)  # "ecmp" or "sr"
+    max_min_fair = Column(Float, nullable=False)  # bps
+    max_throughput = Column(Float, nullable=False)  # bps
+    demands = Column(Text, nullable=False)  # json of the form [{"src": x, "dest": y, "max_min_fair": z, ...}]
+
+    def demand_rates(self):
+        return json.loads(self.demands)
+
+    @classmethod
+    def from_estimation(cls, model: str, estimation: dict):
+        return cls(model=model, max_min_fair=estimation["max_min_fair"],
+                   max_throughput=estimation["max_throughput"], demands=json.dumps(estimation["demands"]))
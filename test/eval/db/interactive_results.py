@@ -0,0 +1,45 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey
+from sqlalchemy.orm import relationship
+
+from eval.db.base import SQLBaseModel
+
+
+class InteractiveResults(SQLBaseModel):
+    """Short HTTP requests sent by a client while the iperf flows run"""
+    __tablename__ = 'interactive_results'
+    id = Column(Integer, primary_key=True)
+    experience_id = Column(Integer, ForeignKey('tcp_ebpf_experiments.id'))
+
+    client = Column(String, nullable=False)
+    server = Column(String, nullable=False)
+
+    rate = Column(Float, nullable=False)  # mean number of requests by second
+    sizes = Column(String, nullable=False)  # json list of the possible sizes in kB
+    zipf_alpha = Column(Float, nullable=False)
+    seed = Column(Integer)
+
+    cmd_client = Column(String)
+
+    requests = relationship("InteractiveRequest", backref="interactive", lazy='dynamic')
+
+    def completion_over_time(self):
+        """in ms and ordered"""
+        completions = []
+        start_sample = None
+        for sample in self.requests.filter(InteractiveRequest.latency >= 0) \
+                .order_by(InteractiveRequest.timestamp.asc()):
+            if start_sample is None:
+                start_sample = sample.timestamp / 10 ** 6
+            completions.append((sample.timestamp / 10 ** 6 - start_sample,
+                                sample.latency / 10 ** 3))
+        return completions
+
+
+class InteractiveRequest(SQLBaseModel):
+    __tablename__ = 'interactive_requests'
+    id = Column(Integer, primary_key=True)
+    interactive_id = Column(Integer, ForeignKey('interactive_results.id'))
+
+    timestamp = Column(Float, nullable=False)  # in µs
+    latency = Column(Float, nullable=False)  # in µs (negative if the request failed)
+    size = Column(Float, nullable=False)  # in bytes
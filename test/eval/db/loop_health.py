@@ -0,0 +1,38 @@
+import json
+
+from sqlalchemy import Column, Integer, Float, Boolean, Text, ForeignKey
+
+from eval.db.base import SQLBaseModel
+
+
+class LoopHealthColumns:
+    """Health of the measurement loop of an experiment (see eval.loop_health)"""
+    id = Column(Integer, primary_key=True)
+
+    poll_interval = Column(Float, nullable=False)  # in seconds
+    nbr_polls = Column(Integer, nullable=False)
+    poll_duration_mean = Column(Float)  # in seconds
+    poll_duration_max = Column(Float)  # in seconds
+    lag_max = Column(Float)  # in seconds behind the schedule of the polls
+    late_polls = Column(Integer, nullable=False)  # polls more than one interval behind the schedule
+    snapshot_rate = Column(Float)  # new snapshots by host by second
+    change_delay_max = Column(Float)  # in seconds between the time of a link change and its application
+    overloaded = Column(Boolean, nullable=False)
+
+    # json of the form {"polls": [[offset, duration, lag], ...],
+    #                   "extractions": {host: [[offset, duration, nbr_new_snapshots], ...]},
+    #                   "changes": [[scheduled_offset, applied_offset], ...]}
+    series = Column(Text, nullable=False)
+
+    def time_series(self):
+        return json.loads(self.series)
+
+
+class LoopHealthDBEntry(LoopHealthColumns, SQLBaseModel):
+    __tablename__ = 'loop_health'
+    experience_id = Column(Integer, ForeignKey('tcp_ebpf_experiments.id'))
+
+
+class LoopHealthShortDBEntry(LoopHealthColumns, SQLBaseModel):
+    __tablename__ = 'loop_health_short'
+    experience_id = Column(Integer, ForeignKey('short_tcp_ebpf_experiments.id'))
@@ -0,0 +1,24 @@
+from sqlalchemy import Column, Integer, String, Float, ForeignKey
+
+from eval.db.base import SQLBaseModel
+
+
+class PhaseSpanColumns:
+    """Wall time of a phase of the harness (see reroutemininet.timing)"""
+    id = Column(Integer, primary_key=True)
+
+    phase = Column(String, nullable=False)
+    parent = Column(String)  # phase of the enclosing span
+    node = Column(String)
+    start = Column(Float, nullable=False)  # in seconds since the epoch
+    duration = Column(Float, nullable=False)  # in seconds
+
+
+class PhaseSpan(PhaseSpanColumns, SQLBaseModel):
+    __tablename__ = 'phase_spans'
+    experience_id = Column(Integer, ForeignKey('tcp_ebpf_experiments.id'))
+
+
+class PhaseSpanShort(PhaseSpanColumns, SQLBaseModel):
+    __tablename__ = 'phase_spans_short'
+    experience_id = Column(Integer, ForeignKey('short_tcp_ebpf_experiments.id'))
@@ -46,6 +46,12 @@ class ShortTCPeBPFExperiment(SQLBaseModel):
     snapshots = relationship("SnapshotShortDBEntry", backref="experiment",
                              lazy='dynamic')
 
+    spans = relationship("PhaseSpanShort", backref="experiment", lazy='dynamic')
+
+    loop_health = relationship("LoopHealthShortDBEntry", backref="experiment", lazy='dynamic')
+
+    cpu_placement = relationship("CPUPlacementShortDBEntry", backref="experiment", lazy='dynamic')
+
     def stability_by_connection(self):
         snapshots = sorted([ShortSnapshot.retrieve_from_hex(s.snapshot_hex)
                             for s in self.snapshots.all()])
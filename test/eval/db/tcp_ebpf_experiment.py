@@ -45,8 +45,18 @@ class TCPeBPFExperiment(SQLBaseModel):
 
     iperfs = relationship("IPerfResults", backref="experiment", lazy='selectin')
 
+    interactives = relationship("InteractiveResults", backref="experiment", lazy='selectin')
+
     snapshots = relationship("SnapshotDBEntry", backref="experiment", lazy='selectin')
 
+    spans = relationship("PhaseSpan", backref="experiment", lazy='dynamic')
+
+    loop_health = relationship("LoopHealthDBEntry", backref="experiment", lazy='dynamic')
+
+    cpu_placement = relationship("CPUPlacementDBEntry", backref="experiment", lazy='dynamic')
+
+    fluid_references = relationship("FluidReferenceDBEntry", backref="experiment", lazy='dynamic')
+
     def snap_class(self):
         return FlowBenderSnapshot if "flowbender" in self.random_strategy else Snapshot
 
@@ -124,6 +134,14 @@ class TCPeBPFExperiment(SQLBaseModel):
         else:
             return 0
 
+    def bw_mean_ratio(self, db, model="ecmp", allocation="max_throughput", start=4, end=-1):
+        """The mean bandwidth (see bw_mean_sum) relative to the one of an allocation
+        of the fluid model of a routing or None if it was not estimated"""
+        reference = self.fluid_references.filter_by(model=model).first()
+        if reference is None or getattr(reference, allocation) <= 0:
+            return None
+        return self.bw_mean_sum(db, start=start, end=end) / getattr(reference, allocation)
+
     def bw_by_connection(self, db, start=4, end=-1):
         """Compute the mean bandwidth for each connection used but
         ignoring the first 4 samples and the last one"""
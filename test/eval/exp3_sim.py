@@ -0,0 +1,294 @@
+"""Offline replay of the EXP3 path selection of the exp3 eBPF programs
+
+A sweep over GAMMA, MAX_REWARD_FACTOR, WAIT_BEFORE_INITIAL_MOVE and
+WAIT_UNSTABLE_RTT is simulated on a delay trace for thousands of flows at
+once instead of emulating the network for each value. The trace is either
+built from the link delays and the link changes of a Repetita graph or
+replayed from the rewards recorded in the snapshots of a short experiment:
+
+    python -m eval.exp3_sim --graph ladder.graph --paths 0-1-3 0-2-3 --gamma 0.01 0.1 0.2
+    python -m eval.exp3_sim --short-experiment 42 --nbr-paths 2 --max-reward-factor 1 2
+
+With --check, the default parameters are simulated on a trace of three paths of
+10 ms, 20 ms and unreachable, and the exit code tells whether they learn it.
+
+The model of the programs is the one observed through ShortSnapshot.weights
+and Snapshot.exp3_weights:
+- each of the K paths towards the destination has a weight, initially 1;
+- a path is drawn with probability (1 - GAMMA) w_i / sum(w) + GAMMA / K;
+- once the connection is older than WAIT_BEFORE_INITIAL_MOVE and its path has
+  been stable for WAIT_UNSTABLE_RTT RTTs, each RTT rewards the current path with
+  (max_reward - srtt) / max_reward (clipped to [0, 1]) where max_reward is
+  MAX_REWARD_FACTOR times 50 ms, the maximum reward of the snapshots, the weight of the path is multiplied by
+  exp(GAMMA * reward / (p_i * K)) and a new path is drawn.
+Each step of a trace is one RTT of the flows.
+"""
+import argparse
+import itertools
+import math
+import sys
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from examples.repetita_catalog import RepetitaGraph, load_graph
+
+DEFAULT_GAMMAS = [0.01, 0.1, 0.2]
+DEFAULT_MAX_REWARD_FACTORS = [1.0]
+DEFAULT_WAITS_BEFORE_INITIAL_MOVE = [10 ** 9]  # ns, the default of the experiments
+DEFAULT_WAITS_UNSTABLE_RTT = [16]
+DEFAULT_NBR_FLOWS = 1000
+DEFAULT_STEP = 0.01  # seconds between two RTTs of the synthetic traces
+SNAPSHOT_MAX_REWARD = 50  # ms, the recorded rewards are 50 - srtt in ms
+CHECK_RTTS = [10, 20, math.inf]  # ms, the paths of the trace of --check
+CHECK_DURATION = 60
+LEARNING_MARGIN = 0.1  # Above the uniform probability for the lowest RTT path
+
+
+def link_delays(graph: RepetitaGraph) -> dict:
+    """The delay in ms of each directed link (the lowest one of parallel edges)"""
+    delays = {}
+    for _, src, dest, _, _, delay in graph.edges:
+        delays[(src, dest)] = min(delay, delays.get((src, dest), math.inf))
+    return delays
+
+
+def graph_trace(graph: RepetitaGraph, paths: List[List[int]], duration: float, step=DEFAULT_STEP) -> np.ndarray:
+    """The RTT in ms of each path at each step, with the link changes of the graph applied
+    at their time (a link without bandwidth is down, so the RTT of its paths is infinite)
+
+    :param paths: The node indexes of each path, from the source to the destination
+    :param duration: The duration of the trace in seconds
+    :return: an array of shape (steps, paths)
+    """
+    delays = link_delays(graph)
+    nbr_steps = int(duration / step)
+    trace = np.empty((nbr_steps, len(paths)))
+
+    def rtts():
+        rtt = []
+        for path in paths:
+            hops = list(zip(path[:-1], path[1:]))
+            rtt.append(sum(delays[(a, b)] + delays[(b, a)] for a, b in hops))
+        return rtt
+
+    start = 0
+    changes = sorted(graph.changes, key=lambda c: c[0]) + [(math.inf, None, None, 0, 0, 0)]
+    for time, src, dest, _, bw, delay, *_ in changes:
+        end = min(nbr_steps, int(math.ceil(time / step))) if time != math.inf else nbr_steps
+        if end > start:
+            trace[start:end] = rtts()
+            start = end
+        if src is not None:
+            delays[(src, dest)] = delay if bw > 0 else math.inf
+    return trace
+
+
+def snapshot_trace(snapshots, nbr_paths: int, max_reward=SNAPSHOT_MAX_REWARD) -> np.ndarray:
+    """The RTT in ms of each path at each snapshot, derived from the rewards recorded
+    for the chosen paths in the ShortSnapshots (the last known RTT is kept for the others)
+
+    :param snapshots: The ShortSnapshots of a destination sorted by time
+    :return: an array of shape (snapshots, paths)
+    """
+    trace = np.full((len(snapshots), nbr_paths), np.nan)
+    for i, snap in enumerate(snapshots):
+        if snap.last_srh_id_chosen < nbr_paths:
+            trace[i, snap.last_srh_id_chosen] = max_reward - snap.last_reward
+    for k in range(nbr_paths):  # Forward fill, then backward fill the start
+        column = trace[:, k]
+        known = np.where(~np.isnan(column))[0]
+        if len(known) == 0:
+            column[:] = np.inf  # Never chosen
+            continue
+        filled = known[np.maximum(0, np.searchsorted(known, np.arange(len(column)), side="right") - 1)]
+        trace[:, k] = column[filled]
+    return trace
+
+
+def probabilities(log_weights, gammas):
+    weights = np.exp(log_weights - log_weights.max(axis=-1, keepdims=True))
+    nbr_paths = log_weights.shape[-1]
+    return (1 - gammas[..., None]) * weights / weights.sum(axis=-1, keepdims=True) + gammas[..., None] / nbr_paths
+
+
+def simulate(trace: np.ndarray, gammas=DEFAULT_GAMMAS, max_reward_factors=DEFAULT_MAX_REWARD_FACTORS,
+             waits_before_initial_move=DEFAULT_WAITS_BEFORE_INITIAL_MOVE,
+             waits_unstable_rtt=DEFAULT_WAITS_UNSTABLE_RTT, nbr_flows=DEFAULT_NBR_FLOWS, step=DEFAULT_STEP,
+             starts: Optional[np.ndarray] = None, shared_weights=False, jitter=0.0, seed=0) -> List[dict]:
+    """Simulate the flows for every combination of the parameters at once
+
+    :param trace: The RTT in ms of each path at each step, of shape (steps, paths)
+    :param waits_before_initial_move: The values of WAIT_BEFORE_INITIAL_MOVE in ns
+    :param step: The duration of a step in seconds
+    :param starts: The step at which each flow starts (all at 0 by default)
+    :param shared_weights: Whether the flows of a combination share their weights
+     (like the destination weights of the short flows) instead of having their own
+    :param jitter: The standard deviation in ms of a gaussian noise added to the RTTs
+    :return: for each combination, its parameters, the mean RTT of the flows when the
+     path was reachable, the ratio of RTTs on a path with the lowest RTT, of RTTs on an
+     unreachable path, the mean number of moves by flow and the mean final probabilities
+    """
+    rng = np.random.default_rng(seed)
+    nbr_steps, nbr_paths = trace.shape
+    combinations = list(itertools.product(gammas, max_reward_factors, waits_before_initial_move, waits_unstable_rtt))
+    gamma, factor, wait_initial, wait_unstable = (np.array(values, dtype=float) for values in zip(*combinations))
+    gamma, factor = gamma[:, None], factor[:, None]
+    initial_steps = np.ceil(wait_initial / (step * 10 ** 9))[:, None]
+    unstable_steps = wait_unstable[:, None]
+    shape = (len(combinations), nbr_flows)
+
+    max_reward = factor * SNAPSHOT_MAX_REWARD
+    best = trace.min(axis=1)
+    starts = np.zeros(nbr_flows) if starts is None else np.asarray(starts)
+    paths = np.arange(nbr_paths)
+
+    log_weights = np.zeros((len(combinations), 1 if shared_weights else nbr_flows, nbr_paths))
+    path = rng.integers(nbr_paths, size=shape)
+    unstable = np.zeros(shape)
+    rtt_sum = np.zeros(shape)
+    reachable_steps = np.zeros(shape)
+    active_steps = np.zeros(shape)
+    best_steps = np.zeros(shape)
+    moves = np.zeros(shape)
+
+    for t in range(nbr_steps):
+        active = np.broadcast_to(t >= starts, shape)
+        rtt = trace[t][path]
+        if jitter > 0:
+            rtt = np.maximum(0, rtt + rng.normal(0, jitter, size=shape))
+        reachable = active & np.isfinite(rtt)
+        active_steps += active
+        reachable_steps += reachable
+        rtt_sum += np.where(reachable, rtt, 0)
+        best_steps += active & (trace[t][path] <= best[t])
+
+        eligible = active & (t - starts >= initial_steps) & (unstable == 0)
+        unstable = np.where(active & (unstable > 0), unstable - 1, unstable)
+        if not eligible.any():
+            continue
+
+        chosen = path[..., None] == paths
+        prob = probabilities(log_weights, gamma)
+        p_chosen = np.broadcast_to(prob, chosen.shape)[chosen].reshape(shape)
+        reward = np.clip((max_reward - rtt) / max_reward, 0, 1)
+        reward = np.where(np.isfinite(reward), reward, 0)
+        update = np.where(eligible, gamma * reward / (p_chosen * nbr_paths), 0)[..., None] * chosen
+        log_weights += update.sum(axis=1, keepdims=True) if shared_weights else update
+
+        cumulative = np.broadcast_to(probabilities(log_weights, gamma).cumsum(axis=-1), chosen.shape)
+        drawn = np.minimum(nbr_paths - 1, (rng.random(shape)[..., None] > cumulative).sum(axis=-1))
+        moved = eligible & (drawn != path)
+        moves += moved
+        unstable = np.where(moved, unstable_steps, unstable)
+        path = np.where(eligible, drawn, path)
+
+    final = np.broadcast_to(probabilities(log_weights, gamma), shape + (nbr_paths,)).mean(axis=1)
+    results = []
+    for c, (g, f, w, u) in enumerate(combinations):
+        active = active_steps[c].sum()
+        results.append(OrderedDict([
+            ("gamma", g), ("max_reward_factor", f), ("wait_before_initial_move", w), ("wait_unstable_rtt", u),
+            ("mean_rtt", rtt_sum[c].sum() / reachable_steps[c].sum() if reachable_steps[c].sum() > 0 else None),
+            ("best_path_ratio", best_steps[c].sum() / active if active > 0 else None),
+            ("unreachable_ratio", 1 - reachable_steps[c].sum() / active if active > 0 else None),
+            ("moves_by_flow", moves[c].mean()),
+            ("probabilities", final[c].tolist())]))
+    return results
+
+
+def check_learning(results, rtts=CHECK_RTTS) -> bool:
+    """Whether each combination ends with the lowest RTT path as the most likely one,
+    with a probability clearly above the uniform probability
+
+    :param results: The output of simulate on a constant trace of these RTTs
+    """
+    best = int(np.argmin(rtts))
+    learned = True
+    for r in results:
+        probs = r["probabilities"]
+        if probs[best] < max(probs) or probs[best] < 1 / len(rtts) + LEARNING_MARGIN:
+            print("gamma %.3f and factor %.2f do not learn the path of %s ms: probabilities %s"
+                  % (r["gamma"], r["max_reward_factor"], rtts[best], " ".join("%.2f" % p for p in probs)))
+            learned = False
+    return learned
+
+
+def print_sweep(results):
+    print("%8s %8s %14s %8s %10s %8s %11s %8s  %s"
+          % ("gamma", "factor", "initial (ns)", "unstable", "RTT (ms)", "best", "unreachable", "moves",
+             "probabilities"))
+    for r in sorted(results, key=lambda x: math.inf if x["mean_rtt"] is None else x["mean_rtt"]):
+        print("%8.3f %8.2f %14d %8d %10.2f %8.3f %11.3f %8.2f  %s"
+              % (r["gamma"], r["max_reward_factor"], r["wait_before_initial_move"], r["wait_unstable_rtt"],
+                 math.nan if r["mean_rtt"] is None else r["mean_rtt"], r["best_path_ratio"],
+                 r["unreachable_ratio"], r["moves_by_flow"], " ".join("%.2f" % p for p in r["probabilities"])))
+
+
+def short_experiment_trace(experiment_id, nbr_paths, destination=None):
+    from .bpf_stats import ShortSnapshot
+    from .db import get_connection, ShortTCPeBPFExperiment
+
+    db = get_connection(readonly=True)
+    experiment = db.query(ShortTCPeBPFExperiment).get(experiment_id)
+    if experiment is None:
+        raise ValueError("No short experiment with id %d" % experiment_id)
+    snapshots = sorted(ShortSnapshot.retrieve_from_hex(s.snapshot_hex) for s in experiment.snapshots.all())
+    if destination is not None:
+        snapshots = [s for s in snapshots if str(s.destination) == destination]
+    return snapshot_trace(snapshots, nbr_paths)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--graph", help="Path of the Repetita graph whose delays and link changes are replayed")
+    source.add_argument("--short-experiment", type=int, help="Id of the short experiment whose rewards are replayed")
+    source.add_argument("--check", action="store_true",
+                        help="Check that the parameters learn a trace of paths of %s ms"
+                             % ", ".join(str(rtt) for rtt in CHECK_RTTS))
+    parser.add_argument("--paths", nargs="+", default=[],
+                        help="Paths of the graph as node indexes separated by '-' (with --graph)")
+    parser.add_argument("--duration", type=float, default=60, help="Duration of the trace of the graph in seconds")
+    parser.add_argument("--step", type=float, default=DEFAULT_STEP, help="Duration of a step (one RTT) in seconds")
+    parser.add_argument("--nbr-paths", type=int, default=2, help="Number of paths (with --short-experiment)")
+    parser.add_argument("--destination", default=None, help="Destination of the snapshots (with --short-experiment)")
+    parser.add_argument("--gamma", type=float, nargs="+", default=DEFAULT_GAMMAS)
+    parser.add_argument("--max-reward-factor", type=float, nargs="+", default=DEFAULT_MAX_REWARD_FACTORS)
+    parser.add_argument("--wait-before-initial-move", type=int, nargs="+", default=DEFAULT_WAITS_BEFORE_INITIAL_MOVE,
+                        help="In ns")
+    parser.add_argument("--wait-unstable-rtt", type=int, nargs="+", default=DEFAULT_WAITS_UNSTABLE_RTT)
+    parser.add_argument("--flows", type=int, default=DEFAULT_NBR_FLOWS, help="Number of flows by combination")
+    parser.add_argument("--shared-weights", action="store_true",
+                        help="The flows share their weights like the short flows towards a destination")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Standard deviation of the RTTs in ms")
+    parser.add_argument("--seed", type=int, default=0)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.check:
+        trace = np.tile(CHECK_RTTS, (int(CHECK_DURATION / args.step), 1))
+        results = simulate(trace, args.gamma, args.max_reward_factor, args.wait_before_initial_move,
+                           args.wait_unstable_rtt, nbr_flows=args.flows, step=args.step,
+                           shared_weights=args.shared_weights, jitter=args.jitter, seed=args.seed)
+        print_sweep(results)
+        return 0 if check_learning(results) else 1
+    if args.graph is not None:
+        if len(args.paths) == 0:
+            print("--paths is required with --graph")
+            return 1
+        trace = graph_trace(load_graph(args.graph), [[int(n) for n in p.split("-")] for p in args.paths],
+                            args.duration, args.step)
+    else:
+        trace = short_experiment_trace(args.short_experiment, args.nbr_paths, args.destination)
+    print_sweep(simulate(trace, args.gamma, args.max_reward_factor, args.wait_before_initial_move,
+                         args.wait_unstable_rtt, nbr_flows=args.flows, step=args.step,
+                         shared_weights=args.shared_weights, jitter=args.jitter, seed=args.seed))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
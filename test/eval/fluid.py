@@ -0,0 +1,241 @@
+"""Fluid estimation of the throughput that the bulk flows of a Repetita experiment can achieve
+
+The links of the graph are merged like RepetitaTopo.build does (the lowest
+weight and the sum of the bandwidths of the parallel edges of a direction)
+and each demand is routed either on the IGP shortest paths, split evenly at
+each ECMP hop, or on the SR paths decoded from the dest_map of its source.
+Two references are computed on the initial state of the graph (the link
+changes are ignored):
+- the max-min fair allocation between the connections by progressive filling,
+  the connections of a demand being split evenly on its paths;
+- the maximal total throughput, each demand being free to split its connections
+  between its paths, as the solution of a linear program.
+Each connection of a demand is limited by the clamp of the demand if any.
+"""
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from examples.repetita_catalog import RepetitaGraph
+from .path_index import merged_links, node_indexes
+
+ECMP = "ecmp"
+SR = "sr"
+EPSILON = 10 ** -9
+
+
+class FluidNetwork:
+
+    def __init__(self, graph: RepetitaGraph, bw: Optional[int] = None):
+        """
+        :param bw: The bandwidth in Mbps overriding the one of every link (see RepetitaTopo)
+        """
+        self.nbr_nodes = len(graph.nodes)
+        merged = merged_links(graph)
+        self.links = list(merged.keys())
+        self.weights = np.array([weight for weight, _ in merged.values()], dtype=float)
+        self.capacities = np.array([edge_bw if bw is None else bw for _, edge_bw in merged.values()], dtype=float)
+        self.out_links = [[] for _ in range(self.nbr_nodes)]
+        for i, (src, _) in enumerate(self.links):
+            self.out_links[src].append(i)
+
+        # All-pairs IGP distances (Floyd-Warshall)
+        self.distances = np.full((self.nbr_nodes, self.nbr_nodes), np.inf)
+        np.fill_diagonal(self.distances, 0)
+        for i, (src, dest) in enumerate(self.links):
+            self.distances[src, dest] = min(self.distances[src, dest], self.weights[i])
+        for k in range(self.nbr_nodes):
+            np.minimum(self.distances, self.distances[:, k, None] + self.distances[None, k, :], out=self.distances)
+        self._ecmp = {}  # (src, dest) -> fraction of the traffic on each link
+
+    def ecmp_fractions(self, src: int, dest: int) -> Optional[np.ndarray]:
+        """The fraction of the traffic from src to dest crossing each link with
+        an even split between the next hops of each node (None if unreachable)"""
+        if (src, dest) in self._ecmp:
+            return self._ecmp[(src, dest)]
+        if not np.isfinite(self.distances[src, dest]):
+            self._ecmp[(src, dest)] = None
+            return None
+        fractions = np.zeros(len(self.links))
+        node_fractions = np.zeros(self.nbr_nodes)
+        node_fractions[src] = 1
+        for node in sorted(range(self.nbr_nodes), key=lambda n: -self.distances[n, dest]):
+            if node_fractions[node] == 0 or node == dest:
+                continue
+            next_hops = [i for i in self.out_links[node]
+                         if self.weights[i] + self.distances[self.links[i][1], dest] == self.distances[node, dest]]
+            for i in next_hops:
+                fractions[i] += node_fractions[node] / len(next_hops)
+                node_fractions[self.links[i][1]] += node_fractions[node] / len(next_hops)
+        self._ecmp[(src, dest)] = fractions
+        return fractions
+
+    def path_fractions(self, waypoints: List[int]) -> Optional[np.ndarray]:
+        """The fraction of the traffic crossing each link when it goes through
+        each waypoint in turn over the IGP shortest paths"""
+        fractions = np.zeros(len(self.links))
+        for src, dest in zip(waypoints[:-1], waypoints[1:]):
+            if src == dest:
+                continue
+            leg = self.ecmp_fractions(src, dest)
+            if leg is None:
+                return None
+            fractions += leg
+        return fractions
+
+
+def max_min_fair(routing: np.ndarray, capacities: np.ndarray, connections: np.ndarray, clamps: np.ndarray):
+    """Max-min fair rates of the demands by progressive filling, the connections of a demand
+    growing together until one of their links is saturated or they reach their clamp
+
+    :param routing: The fraction of the traffic of each demand on each link, of shape (links, demands)
+    :param connections: The number of connections of each demand
+    :param clamps: The rate limit of each connection (np.inf for none)
+    :return: the rate of each demand
+    """
+    rates = np.zeros(routing.shape[1])
+    crossing = routing > EPSILON
+    active = connections > 0
+    while active.any():
+        load = routing[:, active] @ connections[active]  # Growth of the links by unit of connection rate
+        residual = capacities - routing @ rates
+        loaded = load > EPSILON
+        link_step = np.min(residual[loaded] / load[loaded]) if loaded.any() else np.inf
+        clamp_step = np.min(clamps[active] - rates[active] / connections[active])
+        step = max(0.0, min(link_step, clamp_step))
+        if not np.isfinite(step):  # Neither a link nor a clamp limits them
+            rates[active] = np.inf
+            break
+        rates[active] += step * connections[active]
+        saturated = loaded & (residual - step * load <= EPSILON * np.maximum(1, capacities))
+        limited = crossing[saturated].any(axis=0) | (rates >= clamps * (1 - EPSILON) * connections)
+        active &= ~limited
+    return rates
+
+
+def _simplex(costs: np.ndarray, constraints: np.ndarray, bounds: np.ndarray, max_pivots=10000):
+    """Maximize costs . x subject to constraints x <= bounds and x >= 0 with non-negative
+    bounds (so the origin is a feasible basis) using the largest coefficient rule,
+    and Bland's rule after a degenerate pivot to avoid cycling"""
+    nbr_rows, nbr_variables = constraints.shape
+    tableau = np.zeros((nbr_rows + 1, nbr_variables + nbr_rows + 1))
+    tableau[:nbr_rows, :nbr_variables] = constraints
+    tableau[:nbr_rows, nbr_variables:-1] = np.eye(nbr_rows)
+    tableau[:nbr_rows, -1] = bounds
+    tableau[-1, :nbr_variables] = -costs
+    basis = np.arange(nbr_variables, nbr_variables + nbr_rows)
+    bland = False
+    for _ in range(max_pivots):
+        reduced = tableau[-1, :-1]
+        candidates = np.where(reduced < -EPSILON)[0]
+        if len(candidates) == 0:
+            break
+        entering = candidates[0] if bland else np.argmin(reduced)
+        column = tableau[:nbr_rows, entering]
+        positive = column > EPSILON
+        if not positive.any():
+            raise ValueError("The linear program is unbounded")
+        ratios = np.full(nbr_rows, np.inf)
+        ratios[positive] = tableau[:nbr_rows, -1][positive] / column[positive]
+        ties = np.where(ratios <= ratios.min() + EPSILON)[0]
+        leaving = ties[np.argmin(basis[ties])]
+        bland = ratios[leaving] <= EPSILON
+        tableau[leaving] /= tableau[leaving, entering]
+        rows = np.nonzero(tableau[:, entering])[0]  # The constraints are sparse
+        rows = rows[rows != leaving]
+        tableau[rows] -= tableau[rows, entering, None] * tableau[leaving]
+        basis[leaving] = entering
+    else:
+        raise ValueError("The linear program did not converge in %d pivots" % max_pivots)
+    solution = np.zeros(nbr_variables + nbr_rows)
+    solution[basis] = tableau[:nbr_rows, -1]
+    return solution[:nbr_variables]
+
+
+def max_throughput(path_routing: np.ndarray, path_demands: np.ndarray, capacities: np.ndarray,
+                   connections: np.ndarray, clamps: np.ndarray):
+    """The rates of the demands maximizing the total throughput when each demand
+    can split its traffic between its paths
+
+    :param path_routing: The fraction of the traffic of each path on each link, of shape (links, paths)
+    :param path_demands: The index of the demand of each path
+    :return: the rate of each demand
+    """
+    limits = clamps * connections
+    capped = np.where(np.isfinite(limits))[0]
+    demand_rows = (path_demands[None, :] == capped[:, None]).astype(float)
+    used = path_routing.any(axis=1)  # The other links do not constrain the paths
+    constraints = np.vstack([path_routing[used], demand_rows])
+    bounds = np.concatenate([capacities[used], limits[capped]])
+    path_rates = _simplex(np.ones(path_routing.shape[1]), constraints, bounds)
+    return np.bincount(path_demands, weights=path_rates, minlength=len(connections))
+
+
+def estimate(network: FluidNetwork, json_demands, paths_by_demand: Optional[List[List[List[int]]]] = None) -> dict:
+    """Compute the max-min fair and the maximal throughput of the demands in bps
+
+    :param json_demands: The merged demands (see parse_demands)
+    :param paths_by_demand: The waypoints of the candidate paths of each demand, from the source
+     to the destination (by default, the IGP shortest paths)
+    :return: a dict with the total of each allocation and the rates of each demand
+    """
+    columns = []
+    path_demands = []
+    routing = np.zeros((len(network.links), len(json_demands)))
+    for d, demand in enumerate(json_demands):
+        paths = paths_by_demand[d] if paths_by_demand is not None and len(paths_by_demand[d]) > 0 \
+            else [[demand["src"], demand["dest"]]]
+        for waypoints in paths:
+            fractions = network.path_fractions(waypoints)
+            if fractions is None or not fractions.any():  # Unreachable or local
+                continue
+            columns.append(fractions)
+            path_demands.append(d)
+            routing[:, d] += fractions
+        if path_demands.count(d) > 0:
+            routing[:, d] /= path_demands.count(d)
+
+    routed = np.zeros(len(json_demands), dtype=bool)
+    routed[path_demands] = True
+    connections = np.array([demand["number"] if routed[d] else 0 for d, demand in enumerate(json_demands)],
+                           dtype=float)
+    clamps = np.array([demand["volume"] // 1000 or np.inf for demand in json_demands], dtype=float)
+
+    fair = max_min_fair(routing, network.capacities, connections, clamps)
+    best = max_throughput(np.array(columns).T.reshape(len(network.links), len(columns)),
+                          np.array(path_demands, dtype=int), network.capacities, connections, clamps)
+    return {"max_min_fair": float(fair.sum()) * 10 ** 6,
+            "max_throughput": float(best.sum()) * 10 ** 6,
+            "demands": [{"src": demand["src"], "dest": demand["dest"], "nbr_paths": path_demands.count(d),
+                         "max_min_fair": float(fair[d]) * 10 ** 6, "max_throughput": float(best[d]) * 10 ** 6}
+                        for d, demand in enumerate(json_demands)]}
+
+
+def bpf_paths_by_demand(json_demands, router_indices: List[str], bpf_paths) -> List[List[List[int]]]:
+    """The waypoints of the SR paths of each demand decoded from the dest_map of its source
+
+    :param router_indices: The name of the router of each node of the graph (see RepetitaTopo)
+    :param bpf_paths: The BPFPaths of the sources
+    """
+    indexes = node_indexes(router_indices)
+    paths_by_src = {indexes[p.src]: p.paths_by_dest for p in bpf_paths if p.src in indexes}
+    paths_by_demand = []
+    for demand in json_demands:
+        paths = []
+        for segments in paths_by_src.get(demand["src"], {}).get("h" + router_indices[demand["dest"]], []):
+            paths.append([demand["src"]] + [indexes[s] for s in segments if s in indexes] + [demand["dest"]])
+        paths_by_demand.append(paths)
+    return paths_by_demand
+
+
+def references(graph: RepetitaGraph, json_demands, router_indices: List[str], bpf_paths=None,
+               bw: Optional[int] = None) -> Dict[str, dict]:
+    """The estimations of the experiment by routing model: ECMP on the IGP shortest
+    paths and, if the BPFPaths of the sources are given, their SR paths"""
+    network = FluidNetwork(graph, bw=bw)
+    estimations = OrderedDict([(ECMP, estimate(network, json_demands))])
+    if bpf_paths:
+        estimations[SR] = estimate(network, json_demands,
+                                   bpf_paths_by_demand(json_demands, router_indices, bpf_paths))
+    return estimations
@@ -0,0 +1,240 @@
+"""HTTP/1.1 load generator recording the latency of each request
+
+It is launched inside the namespace of a client and only depends on the
+standard library. It either keeps a fixed number of requests in flight
+(closed loop, like 'ab -c') or sends requests following a Poisson process
+(open loop). The requested paths can be drawn following a Zipf law.
+
+The output file is a flat array of float64 triples:
+(start of the request in µs since the epoch, completion latency in µs, body size in bytes)
+Failed requests have a negative latency. The records are written as the
+requests complete so that the file stays readable if the generator is killed.
+"""
+import argparse
+import asyncio
+import bisect
+import json
+import random
+import signal
+import sys
+import time
+from array import array
+from itertools import accumulate
+from typing import List, Tuple
+from urllib.parse import urlsplit
+
+RECORD_LENGTH = 3
+READ_CHUNK = 2 ** 16
+MIN_BACKOFF = 0.01  # Delay in seconds before retrying after a failed request (closed loop)
+MAX_BACKOFF = 1
+
+
+def read_latencies(path) -> List[Tuple[float, float, float]]:
+    """Read the (start µs, latency µs, size) records of an output file"""
+    records = array("d")
+    with open(path, "rb") as fileobj:
+        raw = fileobj.read()
+    records.frombytes(raw[:len(raw) - len(raw) % (records.itemsize * RECORD_LENGTH)])  # Ignore a partial record
+    return [tuple(records[i:i + RECORD_LENGTH]) for i in range(0, len(records), RECORD_LENGTH)]
+
+
+def zipf_cumulative_weights(nbr_items, alpha):
+    return list(accumulate(1 / (k ** alpha) for k in range(1, nbr_items + 1)))
+
+
+class HTTPLoad:
+
+    def __init__(self, url, paths=None, zipf_alpha=0.0, keep_alive=False, seed=None, output=None):
+        """
+        :param url: The URL of the server, its path is used if paths is empty
+        :param paths: The paths that can be requested
+        :param zipf_alpha: The exponent of the Zipf law used to pick the path
+         (0 means uniform, the first path is the most popular)
+        :param keep_alive: Whether a connection is reused between requests
+        :param seed: The seed of the random generator
+        :param output: An unbuffered binary file where each record is written when the request completes
+        """
+        url = urlsplit(url)
+        self.host = url.hostname
+        self.port = url.port if url.port is not None else 80
+        self.host_header = url.netloc
+        self.paths = paths if paths else [url.path or "/"]
+        self.cum_weights = zipf_cumulative_weights(len(self.paths), zipf_alpha)
+        self.keep_alive = keep_alive
+        self.random = random.Random(seed)
+        self.output = output
+        self.records = array("d")
+        self.errors = 0
+        self.dropped = 0
+        self.in_flight = 0
+
+    def pick_path(self):
+        if len(self.paths) == 1:
+            return self.paths[0]
+        x = self.random.random() * self.cum_weights[-1]
+        return self.paths[bisect.bisect(self.cum_weights, x)]
+
+    async def _request(self, path, connection=None):
+        """Send a GET request and read the complete response
+
+        :return: a tuple <body size, connection to reuse or None>
+        """
+        if connection is None:
+            connection = await asyncio.open_connection(self.host, self.port)
+        reader, writer = connection
+        writer.write(("GET {path} HTTP/1.1\r\nHost: {host}\r\nConnection: {conn}\r\n\r\n"
+                      .format(path=path, host=self.host_header,
+                              conn="keep-alive" if self.keep_alive else "close")).encode("ascii"))
+        await writer.drain()
+
+        header = await reader.readuntil(b"\r\n\r\n")
+        status_line, *header_lines = header.decode("latin-1").split("\r\n")
+        status = int(status_line.split(" ")[1])
+        length = -1
+        reusable = self.keep_alive
+        for line in header_lines:
+            key, _, value = line.partition(":")
+            key = key.strip().lower()
+            if key == "content-length":
+                length = int(value)
+            elif key == "connection" and value.strip().lower() == "close":
+                reusable = False
+
+        size = 0
+        if length >= 0:
+            while size < length:
+                chunk = await reader.read(min(READ_CHUNK, length - size))
+                if len(chunk) == 0:
+                    raise ConnectionError("Connection closed after %d/%d bytes" % (size, length))
+                size += len(chunk)
+        else:  # Read until the server closes the connection
+            reusable = False
+            chunk = await reader.read(READ_CHUNK)
+            while len(chunk) > 0:
+                size += len(chunk)
+                chunk = await reader.read(READ_CHUNK)
+
+        if status != 200:
+            raise ConnectionError("HTTP status %d" % status)
+        if not reusable:
+            writer.close()
+            connection = None
+        return size, connection
+
+    async def request(self, connection=None):
+        """Send one request and record its latency"""
+        self.in_flight += 1
+        start = time.time()
+        start_counter = time.perf_counter()
+        try:
+            size, connection = await self._request(self.pick_path(), connection)
+            latency = (time.perf_counter() - start_counter) * 10 ** 6
+        except (OSError, ConnectionError, asyncio.IncompleteReadError, ValueError, IndexError):
+            self.errors += 1
+            size, connection, latency = 0, None, -1
+        finally:
+            self.in_flight -= 1
+        record = array("d", (start * 10 ** 6, latency, size))
+        self.records.extend(record)
+        if self.output is not None:
+            self.output.write(record.tobytes())
+        return connection
+
+    async def closed_loop(self, concurrency, stop):
+        async def worker():
+            connection = None
+            backoff = MIN_BACKOFF
+            while not stop.is_set():
+                errors = self.errors
+                connection = await self.request(connection)
+                if self.errors == errors:
+                    backoff = MIN_BACKOFF
+                    continue
+                try:  # Do not spin while the server is unreachable
+                    await asyncio.wait_for(stop.wait(), timeout=backoff)
+                except asyncio.TimeoutError:
+                    pass
+                backoff = min(2 * backoff, MAX_BACKOFF)
+            if connection is not None:
+                connection[1].close()
+
+        await asyncio.gather(*[worker() for _ in range(concurrency)])
+
+    async def open_loop(self, rate, stop, max_in_flight):
+        tasks = set()
+        next_arrival = time.perf_counter()
+        while not stop.is_set():
+            next_arrival += self.random.expovariate(rate)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=max(0.0, next_arrival - time.perf_counter()))
+                break
+            except asyncio.TimeoutError:
+                pass
+            if self.in_flight >= max_in_flight:
+                self.dropped += 1
+                continue
+            task = asyncio.ensure_future(self.request())
+            tasks.add(task)
+            task.add_done_callback(tasks.discard)
+        if len(tasks) > 0:
+            await asyncio.wait(tasks)
+
+    def summary(self):
+        latencies = sorted(self.records[i + 1] for i in range(0, len(self.records), RECORD_LENGTH)
+                           if self.records[i + 1] >= 0)
+        return {
+            "requests": len(self.records) // RECORD_LENGTH,
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "median_latency_us": latencies[len(latencies) // 2] if len(latencies) > 0 else None
+        }
+
+
+async def run(load, args):
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stop.set)
+    loop.call_later(args.duration, stop.set)
+
+    if args.rate is not None:
+        await load.open_loop(args.rate, stop, args.max_in_flight)
+    else:
+        await load.closed_loop(args.concurrency, stop)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("url", help="The URL of the server, e.g., http://[::1]:8080/mock_file")
+    parser.add_argument("-o", "--output", required=True, help="Path of the latency records")
+    parser.add_argument("-t", "--duration", type=float, default=10, help="Duration in seconds")
+    parser.add_argument("-c", "--concurrency", type=int, default=1,
+                        help="Number of requests in flight (closed loop)")
+    parser.add_argument("-r", "--rate", type=float, default=None,
+                        help="Mean number of requests by second following a Poisson process (open loop)")
+    parser.add_argument("--max-in-flight", type=int, default=1000,
+                        help="Arrivals are dropped above this number of requests in flight (open loop)")
+    parser.add_argument("-p", "--path", action="append", default=[],
+                        help="Path that can be requested (can be repeated)")
+    parser.add_argument("--zipf-alpha", type=float, default=0.0,
+                        help="Exponent of the Zipf law used to pick the path")
+    parser.add_argument("-k", "--keep-alive", action="store_true", help="Reuse connections")
+    parser.add_argument("--seed", type=int, default=None, help="Seed of the random generator")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    with open(args.output, "wb", buffering=0) as fileobj:
+        load = HTTPLoad(args.url, paths=args.path, zipf_alpha=args.zipf_alpha,
+                        keep_alive=args.keep_alive, seed=args.seed, output=fileobj)
+        asyncio.run(run(load, args))
+    summary = load.summary()
+    print(json.dumps(summary))
+    # Like ab, only fail if every request failed (an open loop at a low rate can send none)
+    return 1 if summary["errors"] > 0 and summary["errors"] == summary["requests"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
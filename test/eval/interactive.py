@@ -0,0 +1,97 @@
+import json
+import os
+import signal
+import sys
+from shlex import split
+from typing import List
+
+from reroutemininet.config import Lighttpd
+from reroutemininet.net import ReroutingNet
+from . import http_load
+from .controller import ExperimentController, SupervisedProcess
+from .db import InteractiveResults, InteractiveRequest
+from .utils import get_addr
+
+INTERACTIVE_SIZES = [1, 10, 100, 1000]  # kB
+INTERACTIVE_RATE = 10  # requests by second
+INTERACTIVE_ZIPF_ALPHA = 1.0
+
+
+class InteractiveWorkload:
+    """Mice flows sent next to the iperf elephant flows
+
+    Each client sends HTTP requests to the Lighttpd daemon of its server
+    following a Poisson process. The volume of each request is drawn from
+    the list of sizes following a Zipf law (the smallest size is the most
+    popular one).
+    """
+
+    def __init__(self, rate=INTERACTIVE_RATE, sizes=None, zipf_alpha=INTERACTIVE_ZIPF_ALPHA, seed=None):
+        """
+        :param rate: The mean number of requests by second of each client
+        :param sizes: The possible volumes of a request in kB
+        :param zipf_alpha: The exponent of the Zipf law on the volumes
+        :param seed: The seed of the random generators (incremented for each client)
+        """
+        self.rate = rate
+        self.sizes = sorted(sizes if sizes else INTERACTIVE_SIZES)
+        self.zipf_alpha = zipf_alpha
+        self.seed = seed
+        self.latency_files = []
+        self.processes: List[SupervisedProcess] = []
+
+    @staticmethod
+    def path(size):
+        return "interactive_%d" % size
+
+    def prepare(self, net: ReroutingNet, servers: List[str]):
+        """Create the files served to the interactive clients"""
+        for server in set(servers):
+            web_dir = net[server].nconfig.daemon(Lighttpd).options.web_dir
+            for size in self.sizes:
+                with open(os.path.join(web_dir, self.path(size)), "w") as fileobj:
+                    fileobj.write("0" * (size * 1000))
+
+    def launch(self, net: ReroutingNet, controller: ExperimentController, clients: List[str], servers: List[str],
+               duration, cwd, db_entry: List[InteractiveResults]) -> List[SupervisedProcess]:
+        """Launch one load generator by client server pair
+
+        :param db_entry: The list where the InteractiveResults of each pair are appended
+        """
+        self.prepare(net, servers)
+        for i, client in enumerate(clients):
+            port = net[servers[i]].nconfig.daemon(Lighttpd).options.port
+            self.latency_files.append(os.path.join(cwd, "interactive_%d_%s_%s.latencies"
+                                                   % (i, client, servers[i])))
+            cmd = "{python} {script} -t {duration} -o {output} -r {rate} --zipf-alpha {alpha}" \
+                  " http://[{server_ip}]:{port}/" \
+                .format(python=sys.executable, script=os.path.abspath(http_load.__file__),
+                        duration=duration, output=self.latency_files[-1], rate=self.rate,
+                        alpha=self.zipf_alpha, server_ip=get_addr(net[servers[i]]), port=port)
+            for size in self.sizes:
+                cmd += " -p /" + self.path(size)
+            seed = self.seed + i if self.seed is not None else None
+            if seed is not None:
+                cmd += " --seed %d" % seed
+            print("%s %s" % (client, cmd))
+
+            db_entry.append(InteractiveResults(client=client, server=servers[i], rate=self.rate,
+                                               sizes=json.dumps(self.sizes), zipf_alpha=self.zipf_alpha,
+                                               seed=seed, cmd_client=cmd))
+            self.processes.append(controller.supervise("interactive (%s,%s)" % (client, servers[i]),
+                                                       net[client].popen(split(cmd)),
+                                                       stop_signal=signal.SIGINT))
+        return self.processes
+
+    def save(self, db, db_entry: List[InteractiveResults]):
+        """Bulk insert the requests recorded by each load generator"""
+        db.flush()  # Get the ids of the InteractiveResults
+
+        rows = []
+        for i, path in enumerate(self.latency_files):
+            if not os.path.exists(path):
+                continue
+            rows.extend({"interactive_id": db_entry[i].id, "timestamp": start, "latency": latency, "size": size}
+                        for start, latency, size in http_load.read_latencies(path))
+        if len(rows) > 0:
+            db.execute(InteractiveRequest.__table__.insert(), rows)
@@ -0,0 +1,150 @@
+import json
+import threading
+from abc import ABC, abstractmethod
+from array import array
+from typing import IO, List, Optional
+
+from .utils import INTERVALS
+
+
+class JSONLinesStream(ABC):
+    """Parse the JSON lines of the output of a process as it writes them
+
+    The subclasses handle each record in feed_record.
+    """
+    name = "process"  # In the error messages
+
+    def __init__(self):
+        self._thread = None
+
+    def feed(self, line):
+        if isinstance(line, bytes):
+            line = line.decode("utf-8")
+        line = line.strip()
+        if len(line) == 0:
+            return
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError:
+            print("Cannot parse %s line: %s" % (self.name, line))
+            return
+        self.feed_record(record)
+
+    @abstractmethod
+    def feed_record(self, record):
+        pass
+
+    def consume(self, pipe: IO, copy_to: Optional[IO] = None):
+        """Parse the pipe until its end
+
+        :param pipe: The stdout of the process
+        :param copy_to: A file object where the raw lines are also written
+        """
+        for line in pipe:
+            if copy_to is not None:
+                copy_to.write(line.decode("utf-8") if isinstance(line, bytes) else line)
+            self.feed(line)
+
+    def follow(self, pipe: IO, copy_to: Optional[IO] = None):
+        """Parse the pipe in a background thread"""
+        self._thread = threading.Thread(target=self.consume, args=(pipe, copy_to), daemon=True)
+        self._thread.start()
+
+    def join(self, timeout=None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+class IPerfStream(JSONLinesStream):
+    """Incremental parser of the output of 'iperf3 -J --json-stream'
+
+    Each line of the output is an event ('start', 'interval', 'end' or 'error').
+    Interval records are parsed as soon as iperf3 writes them and their
+    bandwidth samples are stored in one column per connection, along with
+    the end of their interval. The streams of an interval are matched to
+    the connections by their socket in the 'start' event.
+    """
+    name = "iperf3"
+
+    def __init__(self, nbr_flows: int, intervals=INTERVALS):
+        """
+        :param nbr_flows: The number of parallel connections of the iperf
+        :param intervals: The reporting interval of iperf in seconds
+        """
+        super().__init__()
+        self.nbr_flows = nbr_flows
+        self.intervals = intervals
+        self.start = {}
+        self.end = {}
+        self.error = None
+        self.raw_intervals = []
+        self.times = [array("d") for _ in range(nbr_flows)]  # in seconds since the start of the samples
+        self.bws = [array("d") for _ in range(nbr_flows)]  # in bps
+        self._sockets = {}  # socket -> index of the connection
+
+    def feed_record(self, record: dict):
+        event = record.get("event")
+        data = record.get("data", {})
+        if event == "start":
+            self.start = data
+            self._sockets = {connection["socket"]: j for j, connection in enumerate(data.get("connected", []))
+                             if "socket" in connection}
+        elif event == "interval":
+            self.raw_intervals.append(data)
+            end = data.get("sum", {}).get("end", len(self.raw_intervals) * self.intervals)
+            for position, stream in enumerate(data.get("streams", [])):
+                j = self._sockets.get(stream.get("socket"), position)
+                if j >= self.nbr_flows:
+                    continue
+                self.times[j].append(stream.get("end", end))
+                self.bws[j].append(stream["bits_per_second"])
+        elif event == "end":  # The traffic agents of both ends write one
+            self.end.update(data)
+        elif event == "error":
+            self.error = data
+
+    def start_time(self):
+        return self.start.get("timestamp", {}).get("timesecs")
+
+    def last_bw(self) -> float:
+        """The throughput of the last interval over all connections in bps"""
+        if len(self.raw_intervals) == 0:
+            return 0
+        return self.raw_intervals[-1].get("sum", {}).get("bits_per_second", 0)
+
+    def raw_json(self) -> str:
+        """The same document as the output of 'iperf3 -J'"""
+        results = {"start": self.start, "intervals": self.raw_intervals, "end": self.end}
+        if self.error is not None:
+            results["error"] = self.error
+        return json.dumps(results, indent=4)
+
+    def rows(self, connection_ids):
+        """The rows of IPerfBandwidthSample in a form suitable for a bulk insert
+
+        :param connection_ids: The database ids of the connections (in the order of the streams)
+        """
+        for j, connection_id in enumerate(connection_ids):
+            for t, bw in zip(self.times[j], self.bws[j]):
+                yield {"connection_id": connection_id, "time": t, "bw": bw}
+
+
+class TrafficAgentStream(JSONLinesStream):
+    """Dispatch the events of the output of a traffic agent (see eval/traffic_agent.py)
+    to the IPerfStream of their demand"""
+    name = "traffic agent"
+
+    def __init__(self, streams: List[IPerfStream]):
+        """
+        :param streams: The IPerfStream of each demand (indexed as in the agent)
+        """
+        super().__init__()
+        self.streams = streams
+
+    def feed_record(self, record):
+        try:
+            stream = self.streams[record["demand"]]
+        except (KeyError, IndexError, TypeError):
+            print("Cannot parse traffic agent line: %s" % json.dumps(record))
+            return
+        stream.feed_record(record)
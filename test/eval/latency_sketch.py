@@ -0,0 +1,136 @@
+"""Mergeable quantile sketch of the latencies: a logarithmic histogram with fixed buckets
+
+A value x falls in the bucket i such that gamma^(i-1) < x <= gamma^i with
+gamma = (1 + alpha) / (1 - alpha), and is estimated by 2 gamma^i / (gamma + 1).
+Each quantile is thus within a relative error alpha of the exact value of the
+same rank (as in DDSketch). The values below MIN_VALUE are counted as 0.
+The buckets only depend on alpha so sketches with the same alpha merge
+exactly by adding their counts, whatever the order.
+"""
+import math
+import struct
+from typing import Iterable, List
+
+import numpy as np
+
+DEFAULT_ALPHA = 0.01
+MIN_VALUE = 10 ** -3
+HEADER = struct.Struct("<dqqq")  # alpha, zero count, index of the first bucket, number of buckets
+
+
+class LogHistogram:
+
+    def __init__(self, alpha=DEFAULT_ALPHA):
+        """
+        :param alpha: The relative accuracy of the quantiles
+        """
+        if not 0 < alpha < 1:
+            raise ValueError("The relative accuracy must be in ]0, 1[")
+        self.alpha = alpha
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.zero_count = 0
+        self.offset = 0  # Index of the bucket of counts[0]
+        self.counts = np.zeros(0, dtype=np.int64)
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + int(self.counts.sum())
+
+    def _extend(self, first, last):
+        """Make room for the buckets from first to last included"""
+        if len(self.counts) == 0:
+            self.offset = first
+            self.counts = np.zeros(last - first + 1, dtype=np.int64)
+            return
+        first = min(first, self.offset)
+        last = max(last, self.offset + len(self.counts) - 1)
+        counts = np.zeros(last - first + 1, dtype=np.int64)
+        counts[self.offset - first:self.offset - first + len(self.counts)] = self.counts
+        self.offset, self.counts = first, counts
+
+    def add(self, values: Iterable[float]):
+        """
+        :param values: A numpy array or an iterable of finite non-negative values
+        """
+        if not isinstance(values, np.ndarray):
+            values = np.fromiter(values, dtype=float)
+        if not np.isfinite(values).all() or (values < 0).any():
+            raise ValueError("The sketch only holds finite non-negative values")
+        positive = values[values >= MIN_VALUE]
+        self.zero_count += len(values) - len(positive)
+        if len(positive) == 0:
+            return
+        indices = np.ceil(np.log(positive) / math.log(self.gamma)).astype(np.int64)
+        first = int(indices.min())
+        self._extend(first, int(indices.max()))
+        counts = np.bincount(indices - first)
+        self.counts[first - self.offset:first - self.offset + len(counts)] += counts
+
+    def merge(self, other: "LogHistogram"):
+        if other.alpha != self.alpha:
+            raise ValueError("Cannot merge sketches of relative accuracy %s and %s" % (self.alpha, other.alpha))
+        self.zero_count += other.zero_count
+        if len(other.counts) > 0:
+            self._extend(other.offset, other.offset + len(other.counts) - 1)
+            start = other.offset - self.offset
+            self.counts[start:start + len(other.counts)] += other.counts
+
+    def _values(self) -> np.ndarray:
+        """The estimate of the zero bucket then of each bucket"""
+        indices = np.arange(self.offset, self.offset + len(self.counts))
+        return np.concatenate([[0], 2 * self.gamma ** indices / (self.gamma + 1)])
+
+    def quantiles(self, percentages: Iterable[float]) -> List[float]:
+        """Nearest-rank percentiles (see latency_percentile in eval.repetita_eval)
+
+        :param percentages: The percentages between 0 and 100
+        """
+        count = self.count
+        if count == 0:
+            raise ValueError("The sketch is empty")
+        ranks = np.maximum(np.ceil(np.asarray(list(percentages), dtype=float) / 100 * count), 1)
+        cumulative = np.cumsum(np.concatenate([[self.zero_count], self.counts]))
+        return self._values()[np.searchsorted(cumulative, ranks)].tolist()
+
+    def quantile(self, percentage: float) -> float:
+        return self.quantiles([percentage])[0]
+
+    def cdf(self, scale=1.0):
+        """The bin edges and the CDF values in the format of eval.utils.cdf_data
+
+        :param scale: The factor applied to the values (e.g., 10 ** -3 from µs to ms)
+        """
+        if self.count == 0:
+            return None, None
+        counts = np.concatenate([[self.zero_count], self.counts])
+        used = counts > 0
+        cdf = np.cumsum(counts[used]) / self.count
+        return [0] + (self._values()[used] * scale).tolist(), [0] + cdf.tolist()
+
+    def to_bytes(self) -> bytes:
+        used = np.nonzero(self.counts)[0]
+        counts = self.counts[used[0]:used[-1] + 1] if len(used) > 0 else self.counts[:0]
+        offset = self.offset + int(used[0]) if len(used) > 0 else 0
+        return HEADER.pack(self.alpha, self.zero_count, offset, len(counts)) + counts.astype("<i8").tobytes()
+
+    @classmethod
+    def from_bytes(cls, raw: bytes) -> "LogHistogram":
+        alpha, zero_count, offset, nbr_buckets = HEADER.unpack_from(raw)
+        sketch = cls(alpha)
+        sketch.zero_count = zero_count
+        sketch.offset = offset
+        sketch.counts = np.frombuffer(raw, dtype="<i8", count=nbr_buckets, offset=HEADER.size).astype(np.int64)
+        return sketch
+
+    @classmethod
+    def of(cls, values: Iterable[float], alpha=DEFAULT_ALPHA) -> "LogHistogram":
+        sketch = cls(alpha)
+        sketch.add(values)
+        return sketch
+
+    @classmethod
+    def merged(cls, sketches: Iterable["LogHistogram"], alpha=DEFAULT_ALPHA) -> "LogHistogram":
+        merged = cls(alpha)
+        for sketch in sketches:
+            merged.merge(sketch)
+        return merged
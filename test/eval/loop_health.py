@@ -0,0 +1,109 @@
+import json
+import threading
+import time
+
+from mininet.log import lg
+
+LAG_WARNING = 0.5  # Lag of the polls (in intervals) above which a warning is logged
+WARNING_INTERVAL = 5  # Minimum number of seconds between two warnings
+OVERLOAD_LATE_POLLS = 0.05  # Ratio of late polls above which the controller is considered overloaded
+OVERLOAD_CHANGE_DELAY = 1  # Delay in seconds of a link change above which the controller is considered overloaded
+
+
+class LoopHealth:
+    """Time series describing whether the measurement loop kept its schedule
+
+    For each poll of the eBPF maps, its duration and its lag behind the
+    schedule are recorded, for each host, the duration of the extraction
+    of its snapshots and the number of new ones, and for each link change,
+    the time when it was applied. The offsets are in seconds since the start
+    of the measurement.
+    """
+
+    def __init__(self, poll_interval: float, start_time: float):
+        """
+        :param poll_interval: The expected time between two polls in seconds
+        :param start_time: The time.time() at the start of the measurement
+        """
+        self.poll_interval = poll_interval
+        self.start_time = start_time
+        self.polls = []
+        self.extractions = {}
+        self.changes = []
+        self.duration = None  # in seconds, set when the measurement stops
+        self._lock = threading.Lock()  # Extractions are recorded from several threads
+        self._last_warnings = {}  # Offset of the last warning of each kind
+
+    def offset(self):
+        return time.time() - self.start_time
+
+    def _warn(self, kind, offset, message):
+        if offset - self._last_warnings.get(kind, -WARNING_INTERVAL) >= WARNING_INTERVAL:
+            self._last_warnings[kind] = offset
+            lg.warning(message)
+
+    def poll(self, duration: float, lag: float):
+        """Record a poll of all the hosts
+
+        :param duration: The time taken by the poll in seconds
+        :param lag: The time between the scheduled and actual start of the poll in seconds
+        """
+        offset = self.offset()
+        self.polls.append((offset - duration, duration, lag))
+        if lag > LAG_WARNING * self.poll_interval:
+            self._warn("poll", offset, "The measurement loop is %.0f ms late after %.1f seconds"
+                                       " (the last poll took %.0f ms for an interval of %.0f ms)\n"
+                       % (lag * 1000, offset, duration * 1000, self.poll_interval * 1000))
+
+    def extraction(self, host: str, duration: float, nbr_snapshots: int):
+        """Record the extraction of the snapshots of a host
+
+        :param duration: The time taken by the extraction in seconds
+        :param nbr_snapshots: The number of new snapshots
+        """
+        offset = self.offset()
+        with self._lock:
+            self.extractions.setdefault(host, []).append((offset - duration, duration, nbr_snapshots))
+
+    def change(self, scheduled: float):
+        """Record the application of the link changes scheduled at this offset"""
+        offset = self.offset()
+        self.changes.append((scheduled, offset))
+        if offset - scheduled > OVERLOAD_CHANGE_DELAY:
+            self._warn("change", offset, "The link changes scheduled after %.1f seconds"
+                                         " were applied %.1f seconds late\n"
+                       % (scheduled, offset - scheduled))
+
+    def stop(self):
+        """Record the end of the measurement (the rates are computed over its duration)"""
+        self.duration = self.offset()
+
+    def summary(self) -> dict:
+        durations = [duration for _, duration, _ in self.polls]
+        late_polls = len([lag for _, _, lag in self.polls if lag > self.poll_interval])
+        elapsed = self.duration if self.duration is not None else self.offset()
+        nbr_snapshots = sum(n for extractions in self.extractions.values() for _, _, n in extractions)
+        change_delays = [applied - scheduled for scheduled, applied in self.changes]
+
+        summary = {
+            "poll_interval": self.poll_interval,
+            "nbr_polls": len(self.polls),
+            "poll_duration_mean": sum(durations) / len(durations) if durations else None,
+            "poll_duration_max": max(durations) if durations else None,
+            "lag_max": max(lag for _, _, lag in self.polls) if self.polls else None,
+            "late_polls": late_polls,
+            "snapshot_rate": nbr_snapshots / len(self.extractions) / elapsed
+            if self.extractions and elapsed > 0 else None,
+            "change_delay_max": max(change_delays) if change_delays else None,
+        }
+        summary["overloaded"] = (len(self.polls) > 0 and late_polls / len(self.polls) > OVERLOAD_LATE_POLLS) \
+            or (len(change_delays) > 0 and max(change_delays) > OVERLOAD_CHANGE_DELAY)
+        return summary
+
+    def db_entry(self, entry_class):
+        """Build the database entry of the health of this loop
+
+        :param entry_class: LoopHealthDBEntry or LoopHealthShortDBEntry
+        """
+        series = {"polls": self.polls, "extractions": self.extractions, "changes": self.changes}
+        return entry_class(series=json.dumps(series), **self.summary())
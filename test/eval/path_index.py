@@ -0,0 +1,308 @@
+"""Index of the candidate SR paths of the demand pairs of a Repetita graph
+
+The merged directed links of the graph (the lowest weight and the sum of the
+bandwidths of the parallel edges, like RepetitaTopo.build) are kept in
+compressed sparse rows. For each pair of nodes, the index holds its k
+shortest loopless paths (Yen's algorithm) and greedily link-disjoint paths
+with the IGP weights. It is computed once by graph and pickled next to the
+parsed graphs so that the paths decoded from the dest_map of the hosts can
+be checked after each experiment:
+
+    python -m eval.path_index ladder.graph ladder.flows -k 4
+"""
+import argparse
+import hashlib
+import heapq
+import json
+import os
+import pickle
+import sys
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from examples.repetita_catalog import CACHE_DIR, CACHE_VERSION, RepetitaGraph, load_graph
+
+DEFAULT_K = 4
+
+Path = Tuple[float, List[int]]  # (IGP cost, node indexes)
+
+
+def merged_links(graph: RepetitaGraph) -> Dict[Tuple[int, int], list]:
+    """The [weight, bw in Mbps] of each directed link with the parallel edges merged"""
+    merged = OrderedDict()
+    for _, src, dest, weight, bw, _ in graph.edges:
+        bw = int(bw / 10 ** 3)  # Mbps as emulated
+        if (src, dest) in merged:
+            merged[(src, dest)][0] = min(merged[(src, dest)][0], weight)
+            merged[(src, dest)][1] += bw
+        else:
+            merged[(src, dest)] = [weight, bw]
+    return merged
+
+
+def node_indexes(router_indices: List[str]) -> Dict[str, int]:
+    """The index of the node of each router and host name (see RepetitaTopo.router_indices)"""
+    indexes = {}
+    for i, name in enumerate(router_indices):
+        indexes[name] = i
+        indexes["h" + name] = i
+    return indexes
+
+
+class CSRGraph:
+
+    def __init__(self, graph: RepetitaGraph):
+        links = merged_links(graph)
+        keys = sorted(links)
+        self.nbr_nodes = len(graph.nodes)
+        self.indices = np.array([dest for _, dest in keys], dtype=int)
+        self.weights = np.array([links[key][0] for key in keys], dtype=float)
+        self.capacities = np.array([links[key][1] for key in keys], dtype=float)
+        self.indptr = np.searchsorted([src for src, _ in keys], np.arange(self.nbr_nodes + 1))
+
+    def link(self, src: int, dest: int) -> int:
+        """The index of the link from src to dest or -1"""
+        start, end = self.indptr[src], self.indptr[src + 1]
+        i = start + np.searchsorted(self.indices[start:end], dest)
+        return int(i) if i < end and self.indices[i] == dest else -1
+
+    def path_cost(self, nodes: List[int]) -> float:
+        links = [self.link(a, b) for a, b in zip(nodes[:-1], nodes[1:])]
+        return float(np.inf) if -1 in links else float(self.weights[links].sum())
+
+    def path_links(self, nodes: List[int]) -> List[int]:
+        return [self.link(a, b) for a, b in zip(nodes[:-1], nodes[1:])]
+
+    def shortest_path(self, src: int, dest: int, removed_links=frozenset(), removed_nodes=frozenset()) \
+            -> Optional[Path]:
+        """Dijkstra on the IGP weights without some links and nodes (the ties
+        are broken by the lowest node indexes so that the result is stable)"""
+        distances = {src: 0.0}
+        queue = [(0.0, [src])]
+        visited = set()
+        while len(queue) > 0:
+            cost, nodes = heapq.heappop(queue)
+            node = nodes[-1]
+            if node in visited:
+                continue
+            visited.add(node)
+            if node == dest:
+                return cost, nodes
+            for i in range(self.indptr[node], self.indptr[node + 1]):
+                neighbor = int(self.indices[i])
+                if i in removed_links or neighbor in removed_nodes or neighbor in visited:
+                    continue
+                neighbor_cost = cost + self.weights[i]
+                if neighbor_cost <= distances.get(neighbor, np.inf):
+                    distances[neighbor] = neighbor_cost
+                    heapq.heappush(queue, (float(neighbor_cost), nodes + [neighbor]))
+        return None
+
+    def k_shortest_paths(self, src: int, dest: int, k=DEFAULT_K) -> List[Path]:
+        """The k shortest loopless paths (Yen's algorithm)"""
+        first = self.shortest_path(src, dest)
+        if first is None:
+            return []
+        paths = [first]
+        candidates = []
+        seen = {tuple(first[1])}
+        while len(paths) < k:
+            _, last = paths[-1]
+            for i in range(len(last) - 1):
+                root = last[:i + 1]
+                removed_links = {self.link(nodes[i], nodes[i + 1]) for _, nodes in paths
+                                 if len(nodes) > i + 1 and nodes[:i + 1] == root}
+                spur = self.shortest_path(last[i], dest, removed_links, frozenset(root[:-1]))
+                if spur is None:
+                    continue
+                nodes = root[:-1] + spur[1]
+                if tuple(nodes) not in seen:
+                    seen.add(tuple(nodes))
+                    heapq.heappush(candidates, (self.path_cost(nodes), nodes))
+            if len(candidates) == 0:
+                break
+            paths.append(heapq.heappop(candidates))
+        return paths
+
+    def disjoint_paths(self, src: int, dest: int, k=DEFAULT_K) -> List[Path]:
+        """Up to k link-disjoint paths found greedily, each being the shortest one
+        without the links (in both directions) of the previous ones"""
+        paths = []
+        removed = set()
+        while len(paths) < k:
+            path = self.shortest_path(src, dest, removed_links=removed)
+            if path is None:
+                break
+            paths.append(path)
+            for a, b in zip(path[1][:-1], path[1][1:]):
+                removed.update(i for i in (self.link(a, b), self.link(b, a)) if i >= 0)
+        return paths
+
+    def expand(self, waypoints: List[int]) -> Optional[Path]:
+        """The path going through each waypoint in turn over the IGP shortest paths"""
+        cost = 0.0
+        nodes = waypoints[:1]
+        for src, dest in zip(waypoints[:-1], waypoints[1:]):
+            if src == dest:
+                continue
+            leg = self.shortest_path(src, dest)
+            if leg is None:
+                return None
+            cost += leg[0]
+            nodes += leg[1][1:]
+        return cost, nodes
+
+
+class PathIndex:
+
+    def __init__(self, path, k=DEFAULT_K):
+        """
+        :param path: The path of the Repetita graph
+        :param k: The number of shortest and disjoint paths by pair
+        """
+        self.path = os.path.abspath(path)
+        self.k = k
+        self.csr = CSRGraph(load_graph(self.path))
+        stat = os.stat(self.path)
+        digest = hashlib.sha1(repr((CACHE_VERSION, self.path, stat.st_mtime_ns, stat.st_size, k))
+                              .encode("utf-8")).hexdigest()
+        self.cache_path = os.path.join(CACHE_DIR, "%s_paths_%s.pickle" % (os.path.basename(self.path), digest))
+        self._pairs = {}  # (src, dest) -> {"shortest": [Path], "disjoint": [Path]}
+        self._dirty = False
+        try:
+            with open(self.cache_path, "rb") as fileobj:
+                self._pairs = pickle.load(fileobj)
+        except (OSError, pickle.UnpicklingError, EOFError):
+            pass
+
+    @property
+    def pairs(self) -> dict:
+        return self._pairs
+
+    def pair(self, src: int, dest: int) -> dict:
+        if (src, dest) not in self._pairs:
+            self._pairs[(src, dest)] = {"shortest": self.csr.k_shortest_paths(src, dest, self.k),
+                                        "disjoint": self.csr.disjoint_paths(src, dest, self.k)}
+            self._dirty = True
+        return self._pairs[(src, dest)]
+
+    def add_demands(self, json_demands):
+        for demand in json_demands:
+            self.pair(demand["src"], demand["dest"])
+        self.save()
+
+    def save(self):
+        if not self._dirty:
+            return
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Atomic replacement since several runners can share the cache
+            tmp_path = "%s.%d.tmp" % (self.cache_path, os.getpid())
+            with open(tmp_path, "wb") as fileobj:
+                pickle.dump(self._pairs, fileobj, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, self.cache_path)
+            self._dirty = False
+        except OSError as e:
+            print("Cannot cache the path index of %s: %s" % (self.path, e))
+
+
+_indexes = {}  # (path, k) -> PathIndex
+
+
+def path_index(path, k=DEFAULT_K) -> PathIndex:
+    """Return the index of the graph, computed once by process"""
+    key = (os.path.abspath(path), k)
+    if key not in _indexes:
+        _indexes[key] = PathIndex(path, k=k)
+    return _indexes[key]
+
+
+def compare_bpf_paths(index: PathIndex, router_indices: List[str], bpf_paths) -> List[dict]:
+    """Check the SR paths decoded from the dest_map of the hosts against the index
+
+    :param router_indices: The name of the router of each node of the graph (see RepetitaTopo)
+    :param bpf_paths: The BPFPaths of the hosts
+    :return: for each source and destination, the number of decoded paths, of their segments
+     that are not routers of the graph, of the paths that cannot be routed, that loop or that
+     are duplicates, the stretch of each path relative to the shortest one, the number of paths
+     among the k shortest ones, whether the paths are link-disjoint and the number of disjoint
+     paths of the pair
+    """
+    indexes = node_indexes(router_indices)
+    results = []
+    for paths in bpf_paths:
+        if paths.src not in indexes:
+            continue
+        src = indexes[paths.src]
+        for dest_name, decoded in paths.paths_by_dest.items():
+            if dest_name not in indexes:
+                continue
+            dest = indexes[dest_name]
+            pair = index.pair(src, dest)
+            shortest = {tuple(nodes) for _, nodes in pair["shortest"]}
+            result = OrderedDict([("src", paths.src), ("dest", dest_name), ("nbr_paths", len(decoded)),
+                                  ("unknown_segments", 0), ("unreachable", 0), ("loops", 0),
+                                  ("duplicates", len(decoded) - len({tuple(s) for s in decoded})),
+                                  ("stretch", []), ("in_k_shortest", 0), ("disjoint", True),
+                                  ("max_disjoint", len(pair["disjoint"])), ("k", index.k)])
+            used_links = set()
+            for segments in decoded:
+                known = [indexes[s] for s in segments if s in indexes]
+                result["unknown_segments"] += len([s for s in segments if s not in indexes and s != "::"])
+                expanded = index.csr.expand([src] + known + [dest])
+                if expanded is None:
+                    result["unreachable"] += 1
+                    continue
+                cost, nodes = expanded
+                if len(set(nodes)) < len(nodes):
+                    result["loops"] += 1
+                if len(pair["shortest"]) > 0 and pair["shortest"][0][0] > 0:
+                    result["stretch"].append(cost / pair["shortest"][0][0])
+                result["in_k_shortest"] += tuple(nodes) in shortest
+                links = set(index.csr.path_links(nodes))
+                result["disjoint"] &= len(links & used_links) == 0
+                used_links |= links
+            result["valid"] = result["unknown_segments"] == result["unreachable"] == result["loops"] \
+                == result["duplicates"] == 0
+            results.append(result)
+    index.save()
+    return results
+
+
+def print_comparison(lg, results: List[dict]):
+    for r in results:
+        log = lg.info if r["valid"] else lg.warning
+        errors = "" if r["valid"] else ", %d unknown segments, %d unreachable, %d loops, %d duplicates" \
+            % (r["unknown_segments"], r["unreachable"], r["loops"], r["duplicates"])
+        log("*** dest_map of %s towards %s: %d paths (%d in the %d shortest), stretch %s, %sdisjoint"
+            " (%d disjoint paths exist)%s\n"
+            % (r["src"], r["dest"], r["nbr_paths"], r["in_k_shortest"], r["k"],
+               " ".join("%.2f" % s for s in r["stretch"]) or "-", "" if r["disjoint"] else "not ",
+               r["max_disjoint"], errors))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("graph", help="Path of the Repetita graph")
+    parser.add_argument("demands", nargs="*", help="Flow files whose pairs are indexed")
+    parser.add_argument("-k", type=int, default=DEFAULT_K, help="Number of paths by pair")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    index = path_index(args.graph, k=args.k)
+    for demands in args.demands:
+        with open(demands) as fileobj:
+            index.add_demands(json.load(fileobj))
+    for (src, dest), pair in sorted(index.pairs.items()):
+        print("%d -> %d: %d shortest paths (costs %s), %d disjoint paths"
+              % (src, dest, len(pair["shortest"]), " ".join("%g" % cost for cost, _ in pair["shortest"]),
+                 len(pair["disjoint"])))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,85 @@
+"""Summary of the time spent in each phase of the harness over a campaign
+
+    python -m eval.phases [--short] [--topology NAME] [--since 2021-01-31]
+
+The phases nested in another one are indented below it and their share
+is relative to the total of the top-level phases.
+"""
+import argparse
+import sys
+from collections import OrderedDict
+from datetime import datetime
+
+from sqlalchemy import func
+
+from .db import get_connection, TCPeBPFExperiment, ShortTCPeBPFExperiment, PhaseSpan, PhaseSpanShort
+
+
+def phase_summary(db, short=False, topology=None, since=None):
+    """Aggregate the spans of the experiments matching the filters
+
+    :param short: Whether to consider the short flow experiments instead of the iperf ones
+    :param topology: A substring of the path of the topologies to consider
+    :param since: The datetime of the oldest experiment to consider
+    :return: the number of experiments and an OrderedDict mapping (parent, phase) to
+     a dict with the number of spans, their total, mean and maximum durations
+    """
+    experiment_class, span_class = (ShortTCPeBPFExperiment, PhaseSpanShort) if short \
+        else (TCPeBPFExperiment, PhaseSpan)
+    query = db.query(span_class.parent, span_class.phase, func.count(span_class.id),
+                     func.sum(span_class.duration), func.max(span_class.duration),
+                     func.count(span_class.experience_id.distinct())) \
+        .join(experiment_class, span_class.experience_id == experiment_class.id)
+    if topology is not None:
+        query = query.filter(experiment_class.topology.contains(topology))
+    if since is not None:
+        query = query.filter(experiment_class.timestamp >= since)
+
+    nbr_experiments = 0
+    phases = OrderedDict()
+    for parent, phase, count, total, maximum, experiments in \
+            query.group_by(span_class.parent, span_class.phase).order_by(func.sum(span_class.duration).desc()):
+        phases[(parent, phase)] = {"count": count, "total": total, "mean": total / count, "max": maximum}
+        if parent is None:
+            nbr_experiments = max(nbr_experiments, experiments)
+    return nbr_experiments, phases
+
+
+def print_summary(nbr_experiments, phases):
+    top_level_total = sum(stats["total"] for (parent, _), stats in phases.items() if parent is None)
+    print("%d experiments, %.1f seconds in the timed phases" % (nbr_experiments, top_level_total))
+    print("%-32s %8s %12s %10s %10s %7s" % ("phase", "spans", "total (s)", "mean (s)", "max (s)", "share"))
+
+    def print_phase(parent, depth):
+        for (phase_parent, phase), stats in phases.items():
+            if phase_parent != parent:
+                continue
+            share = stats["total"] / top_level_total * 100 if top_level_total > 0 else 0
+            print("%-32s %8d %12.1f %10.2f %10.2f %6.1f%%"
+                  % ("  " * depth + phase, stats["count"], stats["total"], stats["mean"], stats["max"], share))
+            if depth < 10:  # A phase can be its own ancestor in different experiments
+                print_phase(phase, depth + 1)
+
+    print_phase(None, 0)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--short", action="store_true",
+                        help="Summarize the short flow experiments instead of the iperf ones")
+    parser.add_argument("--topology", help="Only consider the topologies whose path contains this string")
+    parser.add_argument("--since", type=datetime.fromisoformat,
+                        help="Only consider the experiments run since this date (ISO format)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    nbr_experiments, phases = phase_summary(get_connection(readonly=True), short=args.short,
+                                            topology=args.topology, since=args.since)
+    print_summary(nbr_experiments, phases)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
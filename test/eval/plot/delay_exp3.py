@@ -9,6 +9,7 @@ from mininet.log import lg
 
 from eval.bpf_stats import MAX_PATHS_BY_DEST, ShortSnapshot
 from eval.db import ShortTCPeBPFExperiment
+from eval.latency_sketch import LogHistogram
 from eval.plot.utils import plot_time, subplot_time, plot_cdf
 from eval.utils import FONTSIZE, LINE_WIDTH, cdf_data
 
@@ -243,7 +244,8 @@ def plot_aggregated_ab_cdfs(delay_experiments: List[ShortTCPeBPFExperiment], out
 
     to_aggregate = {}
     if use_cache:
-        to_aggregate = {key: list(range(len(value["latencies"]))) for key, value in cache.items()}
+        to_aggregate = {key: list(range(value.get("nbr_experiments", len(value.get("latencies", [])))))
+                        for key, value in cache.items()}
     else:
         for exp in delay_experiments:
             if "test_" in exp.topology:  # TODO Remove
@@ -273,7 +275,7 @@ def plot_aggregated_ab_cdfs(delay_experiments: List[ShortTCPeBPFExperiment], out
 
     print("Key produced")
 
-    latencies = {}
+    latency_sketches = {}
     failure_time = {}
     weights_over_time = {}
     first_convergence_data = {}
@@ -282,17 +284,21 @@ def plot_aggregated_ab_cdfs(delay_experiments: List[ShortTCPeBPFExperiment], out
     second_convergence_tries_data = {}
     for key, exp_list in to_aggregate.items():
         # Plot Latencies
-        latencies.setdefault(key, [])
-        if use_cache:
-            latencies[key] = cache.get(key, {}).get("latencies", [])
-            print("CACHE ", len(latencies[key]))
-        if len(latencies[key]) == 0:
-            for exp in exp_list:
-                for latency in exp.abs.first().ab_latency:
-                    latencies[key].append(latency.latency / 10 ** 3)  # ms
-            cache.setdefault(key, {})["latencies"] = latencies[key]
+        if use_cache and "latency_sketch" in cache.get(key, {}):
+            latency_sketches[key] = LogHistogram.from_bytes(bytes.fromhex(cache[key]["latency_sketch"]))
+            print("CACHE ", latency_sketches[key].count)
+        elif use_cache:  # Cache of the latencies in ms
+            latency_sketches[key] = LogHistogram.of(latency * 10 ** 3 for latency in cache[key].get("latencies", []))
+        else:
+            # The merge of the sketches of the experiments does not load their samples
+            latency_sketches[key] = LogHistogram.merged(exp.abs.first().latency_sketch() for exp in exp_list)
+            cache.setdefault(key, {})["latency_sketch"] = latency_sketches[key].to_bytes().hex()
+            cache[key]["nbr_experiments"] = len(exp_list)
         print(key)
-        print(len(latencies[key]))
+        print(latency_sketches[key].count)
+        if latency_sketches[key].count > 0:
+            print("p50 %.2f ms, p99 %.2f ms, p99.9 %.2f ms"
+                  % tuple(q / 10 ** 3 for q in latency_sketches[key].quantiles([50, 99, 99.9])))
 
         for exp in exp_list:
             weights_over_time.setdefault(key, [])
@@ -424,9 +430,9 @@ def plot_aggregated_ab_cdfs(delay_experiments: List[ShortTCPeBPFExperiment], out
     print("\tTODO ", len(to_aggregate.items()))
     for key, exp_list in to_aggregate.items():
         # Plot Latencies
-        bins, cdf = cdf_data(latencies[key])
+        bins, cdf = latency_sketches[key].cdf(scale=10 ** -3)  # ms
         for group, subplot in subplots.items():
-            if groups[group](key):  # Filter experiences
+            if groups[group](key) and bins is not None:  # Filter experiences
                 # TODO Change color
                 subplot.step(bins, cdf, linewidth=LINE_WIDTH,
                              linestyle=all_styles[subplots_line_style_index[group] % len(all_styles)],
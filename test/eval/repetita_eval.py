@@ -1,29 +1,43 @@
 import copy
 import csv
 import json
+import math
 import os
 import signal
 import subprocess
+import sys
 import time
 from datetime import datetime
 from shlex import split
 from typing import List
 
-from ipmininet.tests.utils import assert_connectivity
-
+from examples.repetita_catalog import index_directory, graph_flows, load_graph
 from examples.repetita_network import RepetitaTopo
 from reroutemininet.clean import cleanup
 from reroutemininet.config import Lighttpd, SRLocalCtrl
+from reroutemininet.cpus import CAPTURE, TRAFFIC
 from reroutemininet.net import ReroutingNet
-from .bpf_stats import Snapshot, BPFPaths, ShortSnapshot, FlowBenderSnapshot
+from reroutemininet.timing import timer
+from .bpf_stats import BPFPaths, ShortSnapshot, FlowBenderSnapshot
+from . import fluid, http_load, traffic_agent
+from .controller import ExperimentController, SupervisedProcess, WarmNetwork, revert_changes, \
+    probe_connectivity, CONNECTIVITY_DEADLINE
+from .interactive import InteractiveWorkload
+from .iperf_stream import IPerfStream, TrafficAgentStream
+from .latency_sketch import LogHistogram
+from .path_index import compare_bpf_paths, path_index, print_comparison
 from .db import get_connection, TCPeBPFExperiment, IPerfResults, \
     IPerfConnections, SnapshotShortDBEntry, ABLatencyCDF, ABResults, \
-    ABLatency, ShortTCPeBPFExperiment, IPerfBandwidthSample, SnapshotDBEntry
+    ABLatency, ShortTCPeBPFExperiment, IPerfBandwidthSample, SnapshotDBEntry, PhaseSpan, PhaseSpanShort, \
+    LoopHealthDBEntry, LoopHealthShortDBEntry, CPUPlacementDBEntry, CPUPlacementShortDBEntry, FluidReferenceDBEntry, \
+    ABLatencySketch
 from .utils import get_addr, MEASUREMENT_TIME, INTERVALS, TEST_DIR, FLOWBENDER_MEASUREMENT_TIME, \
     LOAD_BALANCER_MEASUREMENT_TIME, TRACEROUTE_MEASUREMENT_TIME
 
 
 # LINK_BANDWIDTH = 100
+TRAFFIC_AGENT_PORT = 5201
+TRAFFIC_AGENT_STARTUP = 15  # Seconds for the connections of all the demands to be established
 
 
 def get_current_congestion_control():
@@ -65,11 +79,12 @@ def get_wait_unstable_rtt():
     return int(get_current_parameter("WAIT_UNSTABLE_RTT"))
 
 
-def launch_iperf(lg, net, clients, servers, result_files, nbr_flows, clamp,
+def launch_iperf(lg, net, controller, clients, servers, result_files, nbr_flows, clamp,
                  iperfs_db, ebpf=True, measurement_time=MEASUREMENT_TIME,
-                 client_program=None, server_program=None):
+                 client_program=None, server_program=None, streams=None):
     """
     :param net: The Network object
+    :param controller: The ExperimentController supervising the processes
     :param clients: The list of client node names
     :param servers: The list of server node names
      (same size as the client list and it means that clients[i] will have a connection to servers[i])
@@ -77,38 +92,35 @@ def launch_iperf(lg, net, clients, servers, result_files, nbr_flows, clamp,
      (same size as the client list and it means that clients[i] will have its output written to result_files[i])
     :param nbr_flows: The number of connections for each client server pair
     :param ebpf: Whether there is eBPF and ccgroup activated
-    :return: a tuple <list of popen objects of servers, list of popen objects of clients>
+    :param streams: The list of IPerfStream parsing the output of each server while it runs
+     (if None, the output is only written to result_files)
+    :return: a tuple <list of supervised processes of servers, list of supervised processes of clients>
     """
-    try:
-        subprocess.check_call(split("pkill iperf3"))
-    except subprocess.CalledProcessError:
-        pass
-
     pid_servers = []
     ports = [5201 + i for i in range(len(servers))]
     for i, server in enumerate(servers):
         cmd = "iperf3 -s -J -p %d --one-off" % ports[i]
+        if streams is not None:
+            cmd += " --json-stream"
         # 2>&1 > log_%s.log &"
         iperfs_db[i].cmd_server = cmd
         print("%s %s" % (server, cmd))
+        stdout = result_files[i] if streams is None else subprocess.PIPE
         if ebpf:
-            pid_servers.append(net[server].run_cgroup(cmd, stdout=result_files[i], program=server_program))
+            popen = net[server].run_cgroup(cmd, stdout=stdout, program=server_program)
         else:
-            pid_servers.append(net[server].popen(cmd, stdout=result_files[i]))
-    time.sleep(15)
-
-    for pid in pid_servers:
-        if pid.poll() is not None:
-            lg.error("The server exited too early with err=%s\n" % pid.poll())
-            for pid in pid_servers:
-                if pid.poll() is None:
-                    pid.kill()
-            return [], []
-
-    # Wait for connectivity
-    assert_connectivity(net, v6=True)
-    time.sleep(1)
-    assert_connectivity(net, v6=True)
+            popen = net[server].popen(cmd, stdout=stdout)
+        if streams is not None:
+            streams[i].follow(popen.stdout, copy_to=result_files[i])
+            controller.follow_throughput(streams[i])
+        pid_servers.append(controller.supervise("iperf server (%s,%s)" % (clients[i], server), popen,
+                                                cpu_class=None if ebpf else TRAFFIC))
+
+    if not controller.wait_startup(pid_servers, 15):
+        controller.stop_processes(pid_servers)
+        return [], []
+
+    wait_connectivity(net, clients, servers)
 
     pid_clients = []
     for i, client in enumerate(clients):
@@ -122,28 +134,92 @@ def launch_iperf(lg, net, clients, servers, result_files, nbr_flows, clamp,
         print("%s %s" % (client, cmd))
         iperfs_db[i].cmd_client = cmd
         if ebpf:
-            pid_clients.append(
-                net[client].run_cgroup(cmd, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
-                                       program=client_program))
+            popen = net[client].run_cgroup(cmd, stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL,
+                                           program=client_program)
         else:
-            pid_clients.append(net[client].popen(split(cmd),
-                                                 stderr=subprocess.DEVNULL,
-                                                 stdout=subprocess.DEVNULL))
-    time.sleep(5)
-
-    for pid in pid_clients:
-        if pid.poll() is not None:
-            lg.error("The client exited too early with err=%s\n" % pid.poll())
-            for pid in pid_clients + pid_servers:
-                if pid.poll() is None:
-                    pid.kill()
-            return [], []
+            popen = net[client].popen(split(cmd), stderr=subprocess.DEVNULL, stdout=subprocess.DEVNULL)
+        pid_clients.append(controller.supervise("iperf client (%s,%s)" % (client, servers[i]), popen,
+                                                cpu_class=None if ebpf else TRAFFIC))
+
+    if not controller.wait_startup(pid_clients, 5):
+        controller.stop_processes(pid_clients + pid_servers)
+        return [], []
 
     time.sleep(10)  # TODO Should be replaced by a check on the netstate to check that connections are established
 
     return pid_servers, pid_clients
 
 
+def launch_traffic_agents(lg, net, controller, clients, servers, nbr_flows, clamp, iperfs_db, streams,
+                          result_files, cwd, ebpf=True, measurement_time=MEASUREMENT_TIME,
+                          client_program=None, server_program=None):
+    """Launch one traffic agent of eval/traffic_agent.py by host instead of one iperf3 server and client by demand
+
+    With eBPF, the sending and receiving roles of a host run in the cgroups of client_program and
+    server_program, so a host that is both a client and a server has two agents if these programs differ.
+
+    :param clients: The list of client node names
+    :param servers: The list of server node names (clients[i] will send the flows of demand i to servers[i])
+    :param nbr_flows: The number of connections of each demand
+    :param clamp: The rate of each connection of each demand in Mbps (0 for no clamp)
+    :param streams: The IPerfStream of each demand, fed by the agents while they run
+    :param result_files: The list where the file object of the raw output of each agent is appended
+    :return: a tuple <list of supervised agents, list of TrafficAgentStream reading their outputs>,
+     the list of agents is empty if the flows of a demand did not start
+    """
+    wait_connectivity(net, clients, servers)
+
+    roles = {}  # (host, program) -> (whether it receives flows, indexes of the demands it sends)
+    for i in range(len(clients)):
+        roles.setdefault((servers[i], server_program if ebpf else None), [False, []])[0] = True
+        roles.setdefault((clients[i], client_program if ebpf else None), [False, []])[1].append(i)
+
+    agents = []
+    readers = []
+    for (host, program), (receiving, demands) in roles.items():
+        cmd = "{python} {script} -t {duration} -i {intervals}" \
+            .format(python=sys.executable, script=os.path.abspath(traffic_agent.__file__),
+                    duration=measurement_time, intervals=INTERVALS)
+        if receiving:
+            cmd += " -l %d" % TRAFFIC_AGENT_PORT
+        if len(demands) > 0:
+            cmd += " -B %s" % get_addr(net[host])
+        for i in demands:
+            cmd += " -f %d,%s,%d,%d,%d" % (i, get_addr(net[servers[i]]), TRAFFIC_AGENT_PORT, nbr_flows[i], clamp[i])
+            iperfs_db[i].cmd_client = cmd
+        if receiving:
+            for i in range(len(servers)):
+                if servers[i] == host:
+                    iperfs_db[i].cmd_server = cmd
+        print("%s %s" % (host, cmd))
+
+        result_files.append(open(os.path.join(cwd, "%d_agent_%s.json" % (len(agents), host)), "w"))
+        if ebpf:
+            popen = net[host].run_cgroup(cmd, stdout=subprocess.PIPE, program=program)
+        else:
+            popen = net[host].popen(split(cmd), stdout=subprocess.PIPE)
+        readers.append(TrafficAgentStream(streams))
+        readers[-1].follow(popen.stdout, copy_to=result_files[-1])
+        agents.append(controller.supervise("traffic agent (%s)" % host, popen, cpu_class=None if ebpf else TRAFFIC))
+
+    for stream in streams:
+        controller.follow_throughput(stream)
+
+    # The agents report the flow tuples of a demand once all its connections are established
+    deadline = time.monotonic() + TRAFFIC_AGENT_STARTUP
+    while any(len(stream.start) == 0 and stream.error is None for stream in streams) \
+            and time.monotonic() < deadline:
+        if not controller.wait_startup(agents, 0.1):
+            break
+    missing = [i for i, stream in enumerate(streams) if len(stream.start) == 0]
+    if len(missing) > 0:
+        lg.error("The flows of the demands %s did not start\n" % missing)
+        controller.stop_processes(agents)
+        return [], readers
+
+    return agents, readers
+
+
 def parse_demands(json_demands):
     """Fuse demands with the same destination, source and volume"""
 
@@ -159,50 +235,64 @@ def parse_demands(json_demands):
     return [x for x in merged_demands.values()]
 
 
+def load_all_demands(demands_list):
+    """Concatenate the demands of all the flow files of a topology
+    so that a warm network has the hosts of each of them"""
+    all_demands = []
+    for demands in demands_list:
+        with open(demands) as fileobj:
+            all_demands.extend(json.load(fileobj))
+    return all_demands
+
+
+def demand_hosts(net: ReroutingNet, json_demands):
+    return [("h" + net.topo.getFromIndex(d["src"]), "h" + net.topo.getFromIndex(d["dest"]))
+            for d in json_demands]
+
+
+def connectivity_probes(net: ReroutingNet, clients, servers):
+    """The pairs of nodes that must be connected for an experiment: each client
+    with its server and, with eBPF, each of them with the SR controller"""
+    probes = list(zip(clients, servers))
+    if net.topo.ebpf:
+        probes.extend((h, "controller") for h in dict.fromkeys(clients + servers))
+    return probes
+
+
+def wait_connectivity(net: ReroutingNet, clients, servers, deadline=CONNECTIVITY_DEADLINE):
+    """Wait until the nodes of the experiment are connected
+    (the other pairs of nodes of the network are not checked)"""
+    with timer.span("connectivity"):
+        if not probe_connectivity(net, connectivity_probes(net, clients, servers), deadline=deadline):
+            raise ValueError("No connectivity between the nodes of the experiment after %d seconds" % deadline)
+
+
 def get_repetita_topos(args):
     topos = {}
     if args.repetita_topo is None and args.repetita_dir is None:
         return
     if args.repetita_dir is not None:
-        for root, directories, files in os.walk(args.repetita_dir):
-            for f in files:
-                if ".graph" in f:
-                    # Identify related flow files
-                    for flow_name in files:
-                        if ".flows" in flow_name and f.split(".")[0] \
-                                in flow_name:
-                            topos.setdefault(os.path.join(root, f), []).append(
-                                os.path.join(root, flow_name))
+        for graph, flows in index_directory(args.repetita_dir).items():
+            topos.setdefault(graph, []).extend(flows)
 
     if args.repetita_topo is not None:
         repetita_topo = os.path.abspath(args.repetita_topo)
-        topo_name = os.path.basename(args.repetita_topo)
         print(args.repetita_topo)
 
         if args.repetita_demand is None:
             # Demands are to be derived from the topo name
-            for root, directories, files in os.walk(os.path.dirname(repetita_topo)):
-                for f in files:
-                    if ".flows" in f and topo_name.split(".graph")[0] in f:
-                        topos.setdefault(repetita_topo, []).append(os.path.join(root, f))
+            flows = graph_flows(repetita_topo)
+            if len(flows) > 0:
+                topos.setdefault(repetita_topo, []).extend(flows)
         else:
             # Allow to specify both topo AND demand
             topos.setdefault(repetita_topo, []).append(args.repetita_demand)
     return topos
 
 
-def launch_ab(lg, net, clients, servers, nbr_flows, db_entry, csv_files,
-              ebpf=True, measurement_time=MEASUREMENT_TIME) -> List[subprocess.Popen]:
-    try:
-        subprocess.check_call(split("pkill iperf3"))
-        subprocess.check_call(split("pkill ab"))
-    except subprocess.CalledProcessError:
-        pass
-
-    # Wait for connectivity
-    assert_connectivity(net, v6=True)
-    time.sleep(1)
-    assert_connectivity(net, v6=True)
+def launch_ab(lg, net, controller, clients, servers, nbr_flows, db_entry, csv_files,
+              ebpf=True, measurement_time=MEASUREMENT_TIME) -> List[SupervisedProcess]:
+    wait_connectivity(net, clients, servers)
 
     time.sleep(30)
 
@@ -217,11 +307,90 @@ def launch_ab(lg, net, clients, servers, nbr_flows, db_entry, csv_files,
         print(cmd)
         # Always run outside of the eBPF (use case where we only control
         # servers)
-        pid_clients.append(net[client].popen(split(cmd)))
+        pid_clients.append(controller.supervise("ab (%s,%s)" % (client, servers[i]),
+                                                net[client].popen(split(cmd)),
+                                                stop_signal=signal.SIGINT))
 
     return pid_clients
 
 
+def launch_http_load(lg, net, controller, clients, servers, nbr_flows, db_entry, latency_files,
+                     measurement_time=MEASUREMENT_TIME, rate=None, seed=None) -> List[SupervisedProcess]:
+    """Launch the asyncio HTTP load generator of eval/http_load.py on each client
+
+    :param latency_files: The paths where each client writes its latency records
+    :param rate: The mean number of requests by second of each client (open loop),
+     if None, nbr_flows[i] requests are kept in flight by clients[i] (closed loop)
+    :param seed: The seed of the random generators (incremented for each client)
+    """
+    wait_connectivity(net, clients, servers)
+
+    time.sleep(30)
+
+    pid_clients = []
+    for i, client in enumerate(clients):
+        cmd = "{python} {script} -t {duration} -o {output} http://[{server_ip}]:8080/mock_file" \
+            .format(python=sys.executable, script=os.path.abspath(http_load.__file__),
+                    duration=measurement_time, output=latency_files[i],
+                    server_ip=get_addr(net[servers[i]]))
+        if rate is not None:
+            cmd += " -r {rate}".format(rate=rate)
+        else:
+            cmd += " -c {nbr_connections}".format(nbr_connections=nbr_flows[i])
+        if seed is not None:
+            cmd += " --seed {seed}".format(seed=seed + i)
+        db_entry[i].cmd_client = cmd
+        print(client)
+        print(cmd)
+        # Always run outside of the eBPF (use case where we only control
+        # servers)
+        pid_clients.append(controller.supervise("http load (%s,%s)" % (client, servers[i]),
+                                                net[client].popen(split(cmd)),
+                                                stop_signal=signal.SIGINT))
+
+    return pid_clients
+
+
+def latency_percentile(sorted_latencies, percentage):
+    """Nearest-rank percentile of a sorted list"""
+    rank = int(math.ceil(percentage / 100 * len(sorted_latencies)))
+    return sorted_latencies[max(0, rank - 1)]
+
+
+def parse_http_load_output(lg, db, latency_files, db_entry: List[ABResults]) -> bool:
+    """Save the records of the HTTP load generator as ab results
+
+    :return: False if the output of a generator is missing
+    """
+    db.flush()  # Get the ids of the ABResults
+
+    rows = []
+    complete = True
+    for i, path in enumerate(latency_files):
+        if not os.path.exists(path):
+            lg.error("The output of the http load (%s,%s) is missing\n" % (db_entry[i].client, db_entry[i].server))
+            complete = False
+            continue
+        records = [(start, latency) for start, latency, _ in http_load.read_latencies(path) if latency >= 0]
+        rows.extend({"connection_id": db_entry[i].id, "timestamp": start, "latency": latency}
+                    for start, latency in records)
+        db_entry[i].ab_latency_sketch.append(
+            ABLatencySketch.from_histogram(LogHistogram.of(latency for _, latency in records)))
+
+        # Same percentages as 'ab -e'
+        latencies = sorted(latency for _, latency in records)
+        if len(latencies) == 0:
+            continue
+        for percentage in range(1, 101):
+            db_entry[i].ab_latency_cdf.append(
+                ABLatencyCDF(percentage_served=percentage,
+                             time=latency_percentile(latencies, percentage) / 10 ** 3))
+
+    if len(rows) > 0:
+        db.execute(ABLatency.__table__.insert(), rows)
+    return complete
+
+
 def trace_analysis(db_entry: ABResults, cwd: str):
     path = os.path.join(TEST_DIR, "report_throughput_latency/target/"
                                   "debug/report_throughput_latency")
@@ -237,6 +406,8 @@ def trace_analysis(db_entry: ABResults, cwd: str):
         db_entry.ab_latency.append(
             ABLatency(timestamp=conn_data["time_micro"],
                       latency=conn_data["request_duration_micro"]))
+    db_entry.ab_latency_sketch.append(ABLatencySketch.from_histogram(
+        LogHistogram.of(conn_data["request_duration_micro"] for conn_data in data)))
 
 
 def parse_ab_output(csv_files, db_entry: List[ABResults], cwd: str):
@@ -273,29 +444,6 @@ def short_flows_completion(lg, args, ovsschema):
     short_flows(lg, args, ovsschema, completion_ebpf=True)
 
 
-def apply_changes(seconds_since_start: float, net: ReroutingNet):
-    for change in net.topo.pending_changes:
-        if change.time <= seconds_since_start:
-            change.apply(net)
-            print("CHANGE APPLIED: {}".format(change))
-            net.topo.applied_changes.append(change)
-
-    net.topo.pending_changes = \
-        sorted(list(filter(lambda x: x not in net.topo.applied_changes,
-                           net.topo.pending_changes)))
-
-    # if len(applied_changes) >= 1:
-    #     IPCLI(net)  # TODO Remove
-
-
-def revert_changes(net: ReroutingNet):
-    for change in net.topo.applied_changes:
-        change.revert(net)
-
-    if len(net.topo.applied_changes) > 0:
-        time.sleep(5)
-
-
 def short_flows(lg, args, ovsschema, completion_ebpf=False):
     topos = get_repetita_topos(args)
     os.mkdir(args.log_dir)
@@ -303,16 +451,19 @@ def short_flows(lg, args, ovsschema, completion_ebpf=False):
     lg.info("******* %d Topologies to test *******\n" % len(topos))
     db = get_connection()
     params = get_xp_params()
-    subprocess.check_call(split("cargo build"),
-                          cwd=os.path.join(TEST_DIR,
-                                           "report_throughput_latency"))
+    if not args.http_load:
+        subprocess.check_call(split("cargo build"),
+                              cwd=os.path.join(TEST_DIR,
+                                               "report_throughput_latency"))
 
+    warm = WarmNetwork() if args.warm_network else None
     i = 0
     for topo, demands_list in topos.items():
         i += 1
         lg.info("******* [topo %d/%d] %d flow files to test in topo '%s' "
                 "*******\n"
                 % (i, len(topos), len(demands_list), os.path.basename(topo)))
+        all_demands = load_all_demands(demands_list) if warm is not None else None
         for demands in demands_list:
             cwd = os.path.join(args.log_dir, os.path.basename(topo) + '_' +
                                os.path.basename(demands))
@@ -320,7 +471,9 @@ def short_flows(lg, args, ovsschema, completion_ebpf=False):
                 os.makedirs(cwd)
             except OSError as e:
                 print("OSError %s" % e)
-            cleanup()
+            timer.collect()  # Forget the spans that do not belong to an experiment
+            if warm is None and args.global_cleanup:
+                cleanup()
             lg.info("******* Processing topo '%s' demands '%s' *******\n" % (
                 os.path.basename(topo),
                 os.path.basename(demands)))
@@ -337,8 +490,8 @@ def short_flows(lg, args, ovsschema, completion_ebpf=False):
             topo_args = {"schema_tables": ovsschema["tables"], "cwd": cwd,
                          "always_redirect": True,
                          "maxseg": -1, "repetita_graph": topo,
-                         "ebpf": args.ebpf,
-                         "json_demands": json_demands,
+                         "ebpf": args.ebpf, "switch_free": args.switch_free_links,
+                         "json_demands": all_demands if warm is not None else json_demands,
                          "localctrl_opts": {
                              "short_ebpf_program":
                                  SRLocalCtrl.EXP3_LOWEST_COMPLETION_EBPF_PROGRAM
@@ -346,18 +499,20 @@ def short_flows(lg, args, ovsschema, completion_ebpf=False):
                                  else SRLocalCtrl.EXP3_LOWEST_DELAY_EBPF_PROGRAM
                          }}
 
-            net = ReroutingNet(topo=RepetitaTopo(**topo_args),
-                               static_routing=True)
+            if warm is not None:
+                net = warm.get(topo, lambda: ReroutingNet(topo=RepetitaTopo(**topo_args), static_routing=True),
+                               lambda n: demand_hosts(n, json_demands))
+            else:
+                with timer.span("build"):
+                    net = ReroutingNet(topo=RepetitaTopo(**topo_args),
+                                       static_routing=True)
 
-            subprocess.call("pkill -9 iperf".split(" "))
-            subprocess.call("pkill -9 curl".split(" "))
-            subprocess.call("pkill -9 ab".split(" "))
             err = False
             csv_files = []
-            tcpdumps = []
+            latency_files = []
+            pcap_files = []
             measurement_time = net.topo.stopping_time if net.topo.stopping_time > 0 else MEASUREMENT_TIME
-            try:
-                net.start()
+            with ExperimentController(net, warm=warm) as controller:
 
                 # Read flow file to retrieve the clients and servers
                 json_demands = parse_demands(json_demands)
@@ -371,6 +526,7 @@ def short_flows(lg, args, ovsschema, completion_ebpf=False):
                     servers.append("h" + net.topo.getFromIndex(d["dest"]))
                     nbr_flows.append(d["number"])
                     csv_files.append("%s-%s" % (clients[-1], servers[-1]))
+                    latency_files.append(os.path.join(cwd, "%s-%s.latencies" % (clients[-1], servers[-1])))
                     flow_sizes.append(d["volume"])  # kB
                     tcp_ebpf_experiment.abs.append(
                         ABResults(client=clients[-1], server=servers[-1],
@@ -388,106 +544,80 @@ def short_flows(lg, args, ovsschema, completion_ebpf=False):
                 print(servers)
                 print(nbr_flows)
 
-                # IPCLI(net)  # TODO Remove
-
-                # Launch tcpdump on client
-                tcpdump_hosts = copy.deepcopy(clients)
-                pcap_files = []
+                # Launch tcpdump on client (only needed to get the latencies of ab)
+                tcpdump_hosts = copy.deepcopy(clients) if not args.http_load else []
                 if args.tcpdump:
                     tcpdump_hosts += servers + [r.name for r in net.routers]
                 for n in tcpdump_hosts:
                     pcap_file = os.path.join(cwd, n) + ".pcapng"
                     cmd = "tshark -F pcapng -w {} ip6".format(pcap_file)
                     pcap_files.append(pcap_file)
-                    tcpdumps.append(net[n].popen(cmd))
-
-                pid_abs = launch_ab(lg, net, clients, servers, nbr_flows,
-                                    db_entry=tcp_ebpf_experiment.abs,
-                                    csv_files=csv_files, ebpf=args.ebpf,
-                                    measurement_time=measurement_time)
+                    controller.supervise("tshark on %s" % n, net[n].popen(cmd),
+                                         critical=False, stop_signal=signal.SIGINT, cpu_class=CAPTURE)
+
+                if args.http_load:
+                    pid_abs = launch_http_load(lg, net, controller, clients, servers, nbr_flows,
+                                               db_entry=tcp_ebpf_experiment.abs,
+                                               latency_files=latency_files,
+                                               measurement_time=measurement_time,
+                                               rate=args.http_load_rate)
+                else:
+                    pid_abs = launch_ab(lg, net, controller, clients, servers, nbr_flows,
+                                        db_entry=tcp_ebpf_experiment.abs,
+                                        csv_files=csv_files, ebpf=args.ebpf,
+                                        measurement_time=measurement_time)
                 if len(pid_abs) == 0:
+                    if warm is not None:
+                        warm.stop()
                     return
 
-                # IPCLI(net)  # TODO Remove
+                # Extract snapshot info from eBPF and apply changes to the network if any
+                if args.ebpf:
+                    controller.collect_snapshots(clients + servers, ShortSnapshot)
+                if not controller.run(measurement_time):
+                    err = True
 
-                # Measure load on each interface
-                start_time = time.time()
-                snapshots = {h: [] for h in clients + servers}
-                while time.time() - start_time < measurement_time:
-                    # Extract snapshot info from eBPF
-                    if args.ebpf:
-                        for h in snapshots.keys():
-                            snapshots[h].extend(
-                                ShortSnapshot.extract_info(net[h]))
-                            snapshots[h] = sorted(list(set(snapshots[h])))
-                    # Apply changes to the network if any
-                    apply_changes(time.time() - start_time, net)
-                    time.sleep(0.1)
-
-                # IPCLI(net)  # TODO Remove
                 time.sleep(5)
 
-                for h, snaps in snapshots.items():
+                for h, snaps in controller.sorted_snapshots().items():
                     for snap in snaps:
                         tcp_ebpf_experiment.snapshots.append(
                             SnapshotShortDBEntry(snapshot_hex=snap.export(),
                                                  host=h)
                         )
 
-                for i, pid in enumerate(pid_abs):
-                    if pid.poll() is None:
-                        lg.error("The ab (%s,%s) has not finish yet\n" % (
-                            clients[i], servers[i]))
-                        pid.send_signal(signal.SIGINT)
-                        pid.wait()
-                    if pid.poll() != 0:
-                        lg.error("The ab (%s,%s) returned with error code %d\n"
-                                 % (clients[i], servers[i], pid.poll()))
+                controller.stop_processes(pid_abs)
+                for pid in pid_abs:
+                    if pid.returncode != 0:
+                        lg.error("The %s returned with error code %d\n"
+                                 % (pid.name, pid.returncode))
                         err = True
-                    print("OUTPUT ab")
-                    print("HHHHHHHHHHHHHHHHHHHHHHhhhh out")
-                    for n in pid.stdout.readlines():
+                    print("OUTPUT %s" % pid.name)
+                    for n in pid.popen.stdout.readlines():
                         print(n)
-                    print("HHHHHHHHHHHHHHHHHHHHHHhhhh errr")
-                    for n in pid.stderr.readlines():
+                    for n in pid.popen.stderr.readlines():
                         print(n)
 
-            finally:
-                for pid in tcpdumps:
-                    pid.send_signal(signal.SIGINT)
-                    pid.wait()
-                    print("TCPDUMP")
-                    print(pid.stdout.read())
-                    print(pid.stderr.read())
-                net.stop()
-                cleanup()
-                subprocess.call("pkill -9 ab".split(" "))
-
             if not err:
-                # try:
                 lg.info("******* Saving results '%s' *******\n" %
                         os.path.basename(topo))
 
                 # Parse and save csv file
-                parse_ab_output(csv_files, tcp_ebpf_experiment.abs, cwd)
+                complete = True
+                with timer.span("parsing"):
+                    if args.http_load:
+                        complete = parse_http_load_output(lg, db, latency_files, tcp_ebpf_experiment.abs)
+                    else:
+                        parse_ab_output(csv_files, tcp_ebpf_experiment.abs, cwd)
                 tcp_ebpf_experiment.failed = False
-                tcp_ebpf_experiment.valid = True
+                tcp_ebpf_experiment.valid = complete
 
-                tc_changes = []
-                for change in net.topo.applied_changes:
-                    change.clean()
-                    if change.applied_time >= 0:
-                        tc_changes.append([change.applied_time, change.serialize()])
-                tcp_ebpf_experiment.tc_changes = json.dumps(tc_changes)
+                tcp_ebpf_experiment.tc_changes = serialize_changes(net)
 
+                save_harness_stats(tcp_ebpf_experiment, controller, short=True)
                 db.commit()  # Commit
-
-                # except Exception as e:
-                #    lg.error("Exception %s in the graph generation...
-                #    Skipping...\n" % e)
-                #    lg.error(str(e))
-                #    continue
             else:
+                save_harness_stats(tcp_ebpf_experiment, controller, short=True)
                 db.commit()  # Commit even if catastrophic results
                 lg.error("******* Error %s processing graphs '%s' *******\n" % (
                     err, os.path.basename(topo)))
@@ -495,43 +625,98 @@ def short_flows(lg, args, ovsschema, completion_ebpf=False):
             for pcap in pcap_files:
                 if os.path.exists(pcap):
                     os.unlink(pcap)
+        if warm is not None:
+            warm.stop()
 
 
-def eval_flowbender_timer(lg, args, ovsschema):
-    return eval_repetita(lg, args, ovsschema, flowbender_timer=True)
-
+def save_harness_stats(experiment, controller: ExperimentController, short=False):
+    """Move the spans recorded by the timer since the start of the experiment, the health
+    of the measurement loop and the CPU contention to the database entry of the experiment
 
-def eval_flowbender(lg, args, ovsschema):
-    return eval_repetita(lg, args, ovsschema, flowbender=True)
+    :param experiment: The TCPeBPFExperiment or ShortTCPeBPFExperiment entry
+    :param short: Whether the experiment is a ShortTCPeBPFExperiment
+    """
+    if short:
+        span_class, health_class, placement_class = PhaseSpanShort, LoopHealthShortDBEntry, CPUPlacementShortDBEntry
+    else:
+        span_class, health_class, placement_class = PhaseSpan, LoopHealthDBEntry, CPUPlacementDBEntry
+    for span in timer.collect():
+        experiment.spans.append(span_class(**span._asdict()))
+    if controller.health is not None:
+        experiment.loop_health.append(controller.health.db_entry(health_class))
+    if controller.contention is not None:
+        experiment.cpu_placement.append(placement_class.from_contention(controller.contention))
 
 
-def eval_repetita(lg, args, ovsschema, flowbender=False, flowbender_timer=False):
+def serialize_changes(net: ReroutingNet) -> str:
+    tc_changes = []
+    for change in net.topo.applied_changes:
+        change.clean()
+        if change.applied_time >= 0:
+            tc_changes.append([change.applied_time, change.serialize()])
+    return json.dumps(tc_changes)
+
+
+def parse_iperf_results(cwd, clients, servers, nbr_flows, iperfs: List[IPerfResults]):
+    for i in range(len(clients)):
+        with open(os.path.join(cwd, "%d_results_%s_%s.json" % (i, clients[i], servers[i])), "r") as fileobj:
+            results = json.load(fileobj)
+            iperf_db = iperfs[i]
+            iperf_db.raw_json = json.dumps(results, indent=4)
+            for j in range(nbr_flows[i]):
+                connection_db = iperf_db.connections[j]
+                connection_db.start_samples = \
+                    results["start"]["timestamp"]["timesecs"]
+                for t, interval in enumerate(results["intervals"]):
+                    connection_db.bw_samples.append(
+                        IPerfBandwidthSample(time=(t + 1) * INTERVALS,
+                                             bw=interval["streams"][j]["bits_per_second"]))
+
+
+def save_iperf_streams(db, streams: List[IPerfStream], iperfs: List[IPerfResults]):
+    """Save the samples parsed during the run with one bulk insert"""
+    for i, stream in enumerate(streams):
+        stream.join(timeout=10)
+        iperf_db = iperfs[i]
+        iperf_db.raw_json = stream.raw_json()
+        for connection_db in iperf_db.connections:
+            connection_db.start_samples = stream.start_time()
+    db.flush()  # Get the ids of the connections
+
+    rows = []
+    for i, stream in enumerate(streams):
+        rows.extend(stream.rows([connection_db.id for connection_db in iperfs[i].connections]))
+    if len(rows) > 0:
+        db.execute(IPerfBandwidthSample.__table__.insert(), rows)
+
+
+def iperf_experiments(lg, args, ovsschema, params, localctrl_opts, measurement_time,
+                      snap_class=None, client_program=None, server_program=None,
+                      link_changes=True, after_measurement=None):
+    """Run iperf between the demands of each Repetita topology and save the results
+
+    :param params: The parameters of the TCPeBPFExperiment rows
+    :param localctrl_opts: The options of the sr-localctrl daemons
+    :param measurement_time: The duration of the iperf flows in seconds
+    :param snap_class: The class of the snapshots polled from the eBPF maps (None to disable)
+    :param link_changes: Whether the link changes of the topology are applied during the measurement
+    :param after_measurement: Function called with the network once the measurement is over
+    """
     topos = get_repetita_topos(args)
     os.mkdir(args.log_dir)
 
     lg.info("******* %d Topologies to test *******\n" % len(topos))
 
-    measurement_time = MEASUREMENT_TIME
-
     db = get_connection()
-    params = get_xp_params()
-    if flowbender:
-        params["random_strategy"] = "flowbender"
-        program = SRLocalCtrl.N_RTO_CHANGER_EBPF_PROGRAM
-        measurement_time = FLOWBENDER_MEASUREMENT_TIME
-    elif flowbender_timer:
-        params["random_strategy"] = "flowbender_timer"
-        program = SRLocalCtrl.TIMEOUT_CHANGER_EBPF_PROGRAM
-        measurement_time = FLOWBENDER_MEASUREMENT_TIME
-    else:
-        raise ValueError("Invalid combination of parameter")
 
+    warm = WarmNetwork() if args.warm_network else None
     i = 0
     for topo, demands_list in topos.items():
         i += 1
         lg.info("******* [topo %d/%d] %d flow files to test in topo '%s' "
                 "*******\n"
                 % (i, len(topos), len(demands_list), os.path.basename(topo)))
+        all_demands = load_all_demands(demands_list) if warm is not None else None
         for demands in demands_list:
             cwd = os.path.join(args.log_dir, os.path.basename(topo) + '_' +
                                os.path.basename(demands))
@@ -539,7 +724,9 @@ def eval_repetita(lg, args, ovsschema, flowbender=False, flowbender_timer=False)
                 os.makedirs(cwd)
             except OSError as e:
                 print("OSError %s" % e)
-            cleanup()
+            timer.collect()  # Forget the spans that do not belong to an experiment
+            if warm is None and args.global_cleanup:
+                cleanup()
             lg.info("******* Processing topo '%s' demands '%s' *******\n" % (
                 os.path.basename(topo),
                 os.path.basename(demands)))
@@ -551,846 +738,248 @@ def eval_repetita(lg, args, ovsschema, flowbender=False, flowbender_timer=False)
 
             with open(demands) as fileobj:
                 json_demands = json.load(fileobj)
-            print("HHHHHHHHHHHHHHHHHHHH" + cwd)
             topo_args = {"schema_tables": ovsschema["tables"], "cwd": cwd,
-                         "enable_ecn": not flowbender and not flowbender_timer,
+                         "enable_ecn": False,
                          "maxseg": -1, "repetita_graph": topo,
-                         "ebpf": args.ebpf,
-                         "json_demands": json_demands,
-                         "localctrl_opts": {
-                             "long_ebpf_program": program
-                         }}
+                         "ebpf": args.ebpf, "switch_free": args.switch_free_links,
+                         "json_demands": all_demands if warm is not None else json_demands,
+                         "localctrl_opts": localctrl_opts}
 
-            net = ReroutingNet(topo=RepetitaTopo(**topo_args),
-                               static_routing=True)
+            if warm is not None:
+                net = warm.get(topo, lambda: ReroutingNet(topo=RepetitaTopo(**topo_args), static_routing=True),
+                               lambda n: demand_hosts(n, json_demands))
+            else:
+                with timer.span("build"):
+                    net = ReroutingNet(topo=RepetitaTopo(**topo_args),
+                                       static_routing=True)
             result_files = []
-            tcpdumps = []
+            streams = None
+            agent_readers = []
+            interactive = None
+            bpf_paths = []
 
-            subprocess.call("pkill -9 iperf".split(" "))
-            subprocess.call("pkill -9 curl".split(" "))
-            subprocess.call("pkill -9 ab".split(" "))
             err = False
             try:
-                net.start()
-
-                # Read flow file to retrieve the clients and servers
-                json_demands = parse_demands(json_demands)
-                print(json_demands)
-                clients = []
-                servers = []
-                nbr_flows = []
-                clamp = []
-                for d in json_demands:
-                    clients.append("h" + net.topo.getFromIndex(d["src"]))
-                    servers.append("h" + net.topo.getFromIndex(d["dest"]))
-                    nbr_flows.append(d["number"])
-                    clamp.append(d["volume"] // 1000)  # Mbps
-
-                    connections = [IPerfConnections(connection_id=conn,
-                                                    max_volume=clamp[-1])
-                                   for conn in range(nbr_flows[-1])]
-                    tcp_ebpf_experiment.iperfs.append(
-                        IPerfResults(client=clients[-1], server=servers[-1],
-                                     connections=connections))
-                print(clients)
-                print(servers)
-
-                # IPCLI(net)  # TODO Remove
-                time.sleep(1)
-
-                # Recover eBPF maps
-                if args.ebpf:
-                    for node in clients + servers:
-                        # TODO Do something with the info ?
-                        print(BPFPaths.extract_info(net, net[node]))
-                        break
+                with ExperimentController(net, warm=warm) as controller:
+
+                    # Read flow file to retrieve the clients and servers
+                    json_demands = parse_demands(json_demands)
+                    print(json_demands)
+                    clients = []
+                    servers = []
+                    nbr_flows = []
+                    clamp = []
+                    for d in json_demands:
+                        clients.append("h" + net.topo.getFromIndex(d["src"]))
+                        servers.append("h" + net.topo.getFromIndex(d["dest"]))
+                        nbr_flows.append(d["number"])
+                        clamp.append(d["volume"] // 1000)  # Mbps
+
+                        connections = [IPerfConnections(connection_id=conn,
+                                                        max_volume=clamp[-1])
+                                       for conn in range(nbr_flows[-1])]
+                        tcp_ebpf_experiment.iperfs.append(
+                            IPerfResults(client=clients[-1], server=servers[-1],
+                                         connections=connections))
+                    print(clients)
+                    print(servers)
+
+                    time.sleep(1)
+
+                    # Recover eBPF maps
+                    if args.ebpf:
+                        for node in clients + servers:
+                            # TODO Do something with the info ?
+                            print(BPFPaths.extract_info(net, net[node]))
+                            break
+
+                    # Launch tcpdump on all clients, servers and routers
+                    if args.tcpdump:
+                        for n in clients + servers + [r.name for r in net.routers]:
+                            cmd = "tshark -F pcapng -w {}.pcapng ip6".format(os.path.join(cwd, n))
+                            controller.supervise("tshark on %s" % n, net[n].popen(cmd),
+                                                 critical=False, stop_signal=signal.SIGKILL, cpu_class=CAPTURE)
+
+                    if args.traffic_agent:
+                        streams = [IPerfStream(nbr_flows[i]) for i in range(len(clients))]
+                        # The agents both receive and send the flows of their host
+                        pid_clients, agent_readers = \
+                            launch_traffic_agents(lg, net, controller, clients, servers, nbr_flows, clamp,
+                                                  tcp_ebpf_experiment.iperfs, streams, result_files, cwd,
+                                                  ebpf=args.ebpf, measurement_time=measurement_time,
+                                                  client_program=client_program, server_program=server_program)
+                        pid_servers = []
+                    else:
+                        result_files = [open(os.path.join(cwd, "%d_results_%s_%s.json")
+                                             % (i, clients[i], servers[i]), "w")
+                                        for i in range(len(clients))]
+                        if args.iperf_json_stream:
+                            streams = [IPerfStream(nbr_flows[i]) for i in range(len(clients))]
+                        pid_servers, pid_clients = \
+                            launch_iperf(lg, net, controller, clients, servers, result_files,
+                                         nbr_flows, clamp, tcp_ebpf_experiment.iperfs,
+                                         ebpf=args.ebpf, measurement_time=measurement_time,
+                                         client_program=client_program, server_program=server_program,
+                                         streams=streams)
+                    if len(pid_servers + pid_clients) == 0:
+                        if warm is not None:
+                            warm.stop()
+                        return
+
+                    if args.with_interactive:
+                        interactive = InteractiveWorkload(rate=args.interactive_rate,
+                                                          sizes=args.interactive_sizes,
+                                                          zipf_alpha=args.interactive_zipf_alpha,
+                                                          seed=args.interactive_seed)
+                        interactive.launch(net, controller, clients, servers, measurement_time, cwd,
+                                           tcp_ebpf_experiment.interactives)
+
+                    # Measure load on each interface
+                    if snap_class is not None and args.ebpf:
+                        controller.collect_snapshots(clients + servers, snap_class)
+                    if not controller.run(measurement_time, link_changes=link_changes):
+                        err = True
 
-                # Launch tcpdump on all clients, servers and routers
-                if args.tcpdump:
-                    for n in clients + servers + [r.name for r in net.routers]:
-                        cmd = "tshark -F pcapng -w {}.pcapng ip6".format(os.path.join(cwd, n))
-                        tcpdumps.append(net[n].popen(cmd))
-
-                result_files = [open(os.path.join(cwd, "%d_results_%s_%s.json")
-                                     % (i, clients[i], servers[i]), "w")
-                                for i in range(len(clients))]
-                pid_servers, pid_clients = \
-                    launch_iperf(lg, net, clients, servers, result_files,
-                                 nbr_flows, clamp, tcp_ebpf_experiment.iperfs,
-                                 ebpf=args.ebpf, measurement_time=measurement_time)
-                if len(pid_servers) == 0:
-                    return
+                    if link_changes:
+                        # Allow iperf control connection to recover fast
+                        revert_changes(net)
 
-                # IPCLI(net)  # TODO Remove
+                    print("Check iperf ending")
+                    controller.stop_processes(pid_servers + pid_clients)
+                    if interactive is not None:
+                        controller.stop_processes(interactive.processes)
 
-                # Measure load on each interface
-                start_time = time.time()
-                snapshots = {h: [] for h in clients + servers}
-                snap_class = FlowBenderSnapshot if flowbender or flowbender_timer else Snapshot
-                while time.time() - start_time < measurement_time:
-                    # Extract snapshot info from eBPF
+                    # Recover eBPF maps
                     if args.ebpf:
-                        for h in snapshots.keys():
-                            snapshots[h].extend(snap_class.extract_info(net[h]))
-                            snapshots[h] = sorted(list(set(snapshots[h])))
-                    # for pid in pid_servers:
-                    #    print("ANOTHER SERVER")
-                    #    print(pid.stdout.readlines())
-                    apply_changes(time.time() - start_time, net)
-                    time.sleep(0.1)
-
-                # IPCLI(net)  # TODO Remove
-
-                # Allow iperf control connection to recover fast
-                revert_changes(net)
-
-                # IPCLI(net)  # TODO Remove
-
-                print("Check servers ending")
-                for i, pid in enumerate(pid_servers):
-                    if pid.poll() is None:
-                        lg.error("The iperf (%s,%s) has not finish yet\n" % (clients[i], servers[i]))
-                        print("ERROR 0")
-                        pid.send_signal(signal.SIGTERM)
-                        pid.wait(10)
-                        print("ERROR 1")
-                        pid.kill()
-
-                print("Check clients ending")
-                for i, pid in enumerate(pid_clients):
-                    if pid.poll() is None:
-                        lg.error("The iperf (%s,%s) has not finish yet\n" % (clients[i], servers[i]))
-                        pid.kill()
-
-                # Recover eBPF maps
-                if args.ebpf:
-                    for node in clients + servers:
-                        # TODO Do something with the info ?
-                        print(BPFPaths.extract_info(net, net[node]))
-                        break
-
-                for pid in tcpdumps:
-                    pid.kill()
-            # except Exception as e:
-            #    lg.error("Exception %s in the topo emulation... Skipping...\n"
-            #             % e)
-            #    ipmininet.DEBUG_FLAG = True  # Do not clear daemon logs
-            #    continue
-            finally:
-
-                for pid in tcpdumps:
-                    pid.kill()
+                        bpf_paths = [BPFPaths.extract_info(net, net[node]) for node in dict.fromkeys(clients)]
+                        print_comparison(lg, compare_bpf_paths(path_index(topo), net.topo.router_indices, bpf_paths))
 
-                # IPCLI(net)  # TODO Remove
-                net.stop()
-                cleanup()
+                    if after_measurement is not None:
+                        after_measurement(net)
+            finally:
+                for reader in agent_readers:
+                    reader.join(timeout=10)
+                for stream in streams or []:
+                    stream.join(timeout=10)
                 for fileobj in result_files:
                     if fileobj is not None:
                         fileobj.close()
-                subprocess.call("pkill -9 iperf".split(" "))
 
             db.commit()  # Commit even if catastrophic results
 
             if not err:
-                # try:
                 lg.info("******* Saving results '%s' *******\n" %
                         os.path.basename(topo))
-                for i in range(len(clients)):
-                    with open(os.path.join(cwd, "%d_results_%s_%s.json" % (i, clients[i], servers[i])), "r") as fileobj:
-                        results = json.load(fileobj)
-                        iperf_db = tcp_ebpf_experiment.iperfs[i]
-                        iperf_db.raw_json = json.dumps(results, indent=4)
-                        for j in range(nbr_flows[i]):
-                            connection_db = iperf_db.connections[j]
-                            connection_db.start_samples = \
-                                results["start"]["timestamp"]["timesecs"]
-                        for t, interval in enumerate(results["intervals"]):
-                            connection_db.bw_samples.append(
-                                IPerfBandwidthSample(time=(t + 1) * INTERVALS,
-                                                     bw=interval["streams"][j]["bits_per_second"]))
-
-                for h, snaps in snapshots.items():
-                    for snap in snaps:
-                        tcp_ebpf_experiment.snapshots.append(
-                            SnapshotDBEntry(snapshot_hex=snap.export(), host=h)
-                        )
-
-                print(len(list(tcp_ebpf_experiment.snapshots)))
-                print("JJJJJJJJJJJJJJJJJJJJJJJJ")
-                for snap_entry in tcp_ebpf_experiment.data_related_snapshots():
-                    snap = tcp_ebpf_experiment.snap_class().retrieve_from_hex(snap_entry.snapshot_hex)
-                    print(snap.time, snap.operation)
-                print("JJJJJJJJJJJJJJJJJJJJJJJJ")
+                with timer.span("parsing"):
+                    if streams is not None:
+                        save_iperf_streams(db, streams, tcp_ebpf_experiment.iperfs)
+                    else:
+                        parse_iperf_results(cwd, clients, servers, nbr_flows, tcp_ebpf_experiment.iperfs)
+                    if interactive is not None:
+                        interactive.save(db, tcp_ebpf_experiment.interactives)
+
+                    for h, snaps in controller.sorted_snapshots().items():
+                        for snap in snaps:
+                            tcp_ebpf_experiment.snapshots.append(
+                                SnapshotDBEntry(snapshot_hex=snap.export(), host=h)
+                            )
+                with timer.span("fluid"):
+                    try:
+                        estimations = fluid.references(load_graph(topo), json_demands, net.topo.router_indices,
+                                                       bpf_paths, bw=net.topo.bw)
+                    except ValueError as e:
+                        lg.error("Cannot estimate the fluid throughput: %s\n" % e)
+                        estimations = {}
+                    for model, estimation in estimations.items():
+                        tcp_ebpf_experiment.fluid_references.append(
+                            FluidReferenceDBEntry.from_estimation(model, estimation))
                 tcp_ebpf_experiment.failed = False
                 tcp_ebpf_experiment.valid = True
 
                 # The delta is an approximation valid at 0.1 ms, so negligible for our use cases
                 tcp_ebpf_experiment.monotonic_realtime_delta = time.time() - time.monotonic()
 
-                tc_changes = []
-                for change in net.topo.applied_changes:
-                    change.clean()
-                    if change.applied_time >= 0:
-                        tc_changes.append([change.applied_time, change.serialize()])
-                tcp_ebpf_experiment.tc_changes = json.dumps(tc_changes)
+                if link_changes:
+                    tcp_ebpf_experiment.tc_changes = serialize_changes(net)
 
+                save_harness_stats(tcp_ebpf_experiment, controller)
                 db.commit()
-                # except Exception as e:
-                #    lg.error("Exception %s in the graph generation...
-                #    Skipping...\n" % e)
-                #    lg.error(str(e))
-                #    continue
             else:
                 lg.error("******* Error %s processing graphs '%s' *******\n" % (
                     err, os.path.basename(topo)))
+                save_harness_stats(tcp_ebpf_experiment, controller)
                 db.commit()  # Commit even if catastrophic results
+        if warm is not None:
+            warm.stop()
 
 
-def reverse_srh_failure(lg, args, ovsschema, flowbender_timer=False):
-    topos = get_repetita_topos(args)
-    os.mkdir(args.log_dir)
+def eval_flowbender_timer(lg, args, ovsschema):
+    return eval_repetita(lg, args, ovsschema, flowbender_timer=True)
 
-    lg.info("******* %d Topologies to test *******\n" % len(topos))
 
-    db = get_connection()
+def eval_flowbender(lg, args, ovsschema):
+    return eval_repetita(lg, args, ovsschema, flowbender=True)
+
+
+def eval_repetita(lg, args, ovsschema, flowbender=False, flowbender_timer=False):
+    params = get_xp_params()
+    if flowbender:
+        params["random_strategy"] = "flowbender"
+        program = SRLocalCtrl.N_RTO_CHANGER_EBPF_PROGRAM
+    elif flowbender_timer:
+        params["random_strategy"] = "flowbender_timer"
+        program = SRLocalCtrl.TIMEOUT_CHANGER_EBPF_PROGRAM
+    else:
+        raise ValueError("Invalid combination of parameter")
+
+    iperf_experiments(lg, args, ovsschema, params,
+                      localctrl_opts={"long_ebpf_program": program},
+                      measurement_time=FLOWBENDER_MEASUREMENT_TIME,
+                      snap_class=FlowBenderSnapshot)
+
+
+def reverse_srh_failure(lg, args, ovsschema, flowbender_timer=False):
     params = get_xp_params()
     params["random_strategy"] = "reverse_srh_flowbender"
     server_program = SRLocalCtrl.REVERSE_SRH_PROGRAM
     client_program = SRLocalCtrl.N_RTO_CHANGER_EBPF_PROGRAM
-    measurement_time = FLOWBENDER_MEASUREMENT_TIME
     if flowbender_timer:
         params["random_strategy"] = "reverse_srh_flowbender_timer"
         client_program = SRLocalCtrl.TIMEOUT_CHANGER_EBPF_PROGRAM
-        measurement_time = FLOWBENDER_MEASUREMENT_TIME
 
-    i = 0
-    for topo, demands_list in topos.items():
-        i += 1
-        lg.info("******* [topo %d/%d] %d flow files to test in topo '%s' "
-                "*******\n"
-                % (i, len(topos), len(demands_list), os.path.basename(topo)))
-        for demands in demands_list:
-            cwd = os.path.join(args.log_dir, os.path.basename(topo) + '_' +
-                               os.path.basename(demands))
-            try:
-                os.makedirs(cwd)
-            except OSError as e:
-                print("OSError %s" % e)
-            cleanup()
-            lg.info("******* Processing topo '%s' demands '%s' *******\n" % (
-                os.path.basename(topo),
-                os.path.basename(demands)))
-
-            tcp_ebpf_experiment = \
-                TCPeBPFExperiment(timestamp=datetime.now(), topology=topo,
-                                  demands=demands, ebpf=args.ebpf, **params)
-            db.add(tcp_ebpf_experiment)
-
-            with open(demands) as fileobj:
-                json_demands = json.load(fileobj)
-            print("HHHHHHHHHHHHHHHHHHHH" + cwd)
-            topo_args = {"schema_tables": ovsschema["tables"], "cwd": cwd,
-                         "enable_ecn": False,
-                         "maxseg": -1, "repetita_graph": topo,
-                         "ebpf": args.ebpf,
-                         "json_demands": json_demands,
-                         "localctrl_opts": {
-                             "long_ebpf_program": client_program
-                         }}
-
-            net = ReroutingNet(topo=RepetitaTopo(**topo_args),
-                               static_routing=True)
-            result_files = []
-            tcpdumps = []
-
-            subprocess.call("pkill -9 iperf".split(" "))
-            subprocess.call("pkill -9 curl".split(" "))
-            subprocess.call("pkill -9 ab".split(" "))
-            err = False
-            try:
-                net.start()
-
-                # Read flow file to retrieve the clients and servers
-                json_demands = parse_demands(json_demands)
-                print(json_demands)
-                clients = []
-                servers = []
-                nbr_flows = []
-                clamp = []
-                for d in json_demands:
-                    clients.append("h" + net.topo.getFromIndex(d["src"]))
-                    servers.append("h" + net.topo.getFromIndex(d["dest"]))
-                    nbr_flows.append(d["number"])
-                    clamp.append(d["volume"] // 1000)  # Mbps
-
-                    connections = [IPerfConnections(connection_id=conn,
-                                                    max_volume=clamp[-1])
-                                   for conn in range(nbr_flows[-1])]
-                    tcp_ebpf_experiment.iperfs.append(
-                        IPerfResults(client=clients[-1], server=servers[-1],
-                                     connections=connections))
-                print(clients)
-                print(servers)
-
-                # IPCLI(net)  # TODO Remove
-                time.sleep(1)
-
-                # Recover eBPF maps
-                if args.ebpf:
-                    for node in clients + servers:
-                        # TODO Do something with the info ?
-                        print(BPFPaths.extract_info(net, net[node]))
-                        break
-
-                # Launch tcpdump on all clients, servers and routers
-                if args.tcpdump:
-                    for n in clients + servers + [r.name for r in net.routers]:
-                        cmd = "tshark -F pcapng -w {}.pcapng ip6".format(os.path.join(cwd, n))
-                        tcpdumps.append(net[n].popen(cmd))
-
-                result_files = [open(os.path.join(cwd, "%d_results_%s_%s.json")
-                                     % (i, clients[i], servers[i]), "w")
-                                for i in range(len(clients))]
-                pid_servers, pid_clients = \
-                    launch_iperf(lg, net, clients, servers, result_files,
-                                 nbr_flows, clamp, tcp_ebpf_experiment.iperfs,
-                                 ebpf=args.ebpf, measurement_time=measurement_time,
-                                 client_program=client_program, server_program=server_program)
-                if len(pid_servers) == 0:
-                    return
-
-                # IPCLI(net)  # TODO Remove
-
-                # Measure load on each interface
-                start_time = time.time()
-                snapshots = {h: [] for h in clients + servers}
-                snap_class = FlowBenderSnapshot
-                while time.time() - start_time < measurement_time:
-                    # Extract snapshot info from eBPF
-                    if args.ebpf:
-                        for h in snapshots.keys():
-                            snapshots[h].extend(snap_class.extract_info(net[h]))
-                            snapshots[h] = sorted(list(set(snapshots[h])))
-                    # for pid in pid_servers:
-                    #    print("ANOTHER SERVER")
-                    #    print(pid.stdout.readlines())
-                    apply_changes(time.time() - start_time, net)
-                    time.sleep(0.1)
-
-                # IPCLI(net)  # TODO Remove
-
-                # Allow iperf control connection to recover fast
-                revert_changes(net)
-
-                # IPCLI(net)  # TODO Remove
-
-                print("Check servers ending")
-                for i, pid in enumerate(pid_servers):
-                    if pid.poll() is None:
-                        lg.error("The iperf (%s,%s) has not finish yet\n" % (clients[i], servers[i]))
-                        print("ERROR 0")
-                        pid.send_signal(signal.SIGTERM)
-                        pid.wait(10)
-                        print("ERROR 1")
-                        pid.kill()
-
-                print("Check clients ending")
-                for i, pid in enumerate(pid_clients):
-                    if pid.poll() is None:
-                        lg.error("The iperf (%s,%s) has not finish yet\n" % (clients[i], servers[i]))
-                        pid.kill()
-
-                # Recover eBPF maps
-                if args.ebpf:
-                    for node in clients + servers:
-                        # TODO Do something with the info ?
-                        print(BPFPaths.extract_info(net, net[node]))
-                        break
-
-                for pid in tcpdumps:
-                    pid.kill()
-            # except Exception as e:
-            #    lg.error("Exception %s in the topo emulation... Skipping...\n"
-            #             % e)
-            #    ipmininet.DEBUG_FLAG = True  # Do not clear daemon logs
-            #    continue
-            finally:
-
-                for pid in tcpdumps:
-                    pid.kill()
-
-                # IPCLI(net)  # TODO Remove
-                net.stop()
-                cleanup()
-                for fileobj in result_files:
-                    if fileobj is not None:
-                        fileobj.close()
-                subprocess.call("pkill -9 iperf".split(" "))
-
-            db.commit()  # Commit even if catastrophic results
-
-            if not err:
-                # try:
-                lg.info("******* Saving results '%s' *******\n" %
-                        os.path.basename(topo))
-                for i in range(len(clients)):
-                    with open(os.path.join(cwd, "%d_results_%s_%s.json" % (i, clients[i], servers[i])), "r") as fileobj:
-                        results = json.load(fileobj)
-                        iperf_db = tcp_ebpf_experiment.iperfs[i]
-                        iperf_db.raw_json = json.dumps(results, indent=4)
-                        for j in range(nbr_flows[i]):
-                            connection_db = iperf_db.connections[j]
-                            connection_db.start_samples = \
-                                results["start"]["timestamp"]["timesecs"]
-                        for t, interval in enumerate(results["intervals"]):
-                            connection_db.bw_samples.append(
-                                IPerfBandwidthSample(time=(t + 1) * INTERVALS,
-                                                     bw=interval["streams"][j]["bits_per_second"]))
-
-                for h, snaps in snapshots.items():
-                    for snap in snaps:
-                        tcp_ebpf_experiment.snapshots.append(
-                            SnapshotDBEntry(snapshot_hex=snap.export(), host=h)
-                        )
-
-                print(len(list(tcp_ebpf_experiment.snapshots)))
-                print("JJJJJJJJJJJJJJJJJJJJJJJJ")
-                for snap_entry in tcp_ebpf_experiment.data_related_snapshots():
-                    snap = tcp_ebpf_experiment.snap_class().retrieve_from_hex(snap_entry.snapshot_hex)
-                    print(snap.time, snap.operation)
-                print("JJJJJJJJJJJJJJJJJJJJJJJJ")
-                tcp_ebpf_experiment.failed = False
-                tcp_ebpf_experiment.valid = True
-
-                # The delta is an approximation valid at 0.1 ms, so negligible for our use cases
-                tcp_ebpf_experiment.monotonic_realtime_delta = time.time() - time.monotonic()
-
-                tc_changes = []
-                for change in net.topo.applied_changes:
-                    change.clean()
-                    if change.applied_time >= 0:
-                        tc_changes.append([change.applied_time, change.serialize()])
-                tcp_ebpf_experiment.tc_changes = json.dumps(tc_changes)
-
-                db.commit()
-                # except Exception as e:
-                #    lg.error("Exception %s in the graph generation...
-                #    Skipping...\n" % e)
-                #    lg.error(str(e))
-                #    continue
-            else:
-                lg.error("******* Error %s processing graphs '%s' *******\n" % (
-                    err, os.path.basename(topo)))
-                db.commit()  # Commit even if catastrophic results
+    iperf_experiments(lg, args, ovsschema, params,
+                      localctrl_opts={"long_ebpf_program": client_program},
+                      measurement_time=FLOWBENDER_MEASUREMENT_TIME,
+                      snap_class=FlowBenderSnapshot,
+                      client_program=client_program, server_program=server_program)
 
 
 def reverse_srh_load_balancer(lg, args, ovsschema):
-    topos = get_repetita_topos(args)
-    os.mkdir(args.log_dir)
-
-    lg.info("******* %d Topologies to test *******\n" % len(topos))
-
-    db = get_connection()
     params = get_xp_params()
     params["random_strategy"] = "reverse_srh_load_balancer"
     server_program = SRLocalCtrl.USE_SECOND_PROGRAM
     client_program = SRLocalCtrl.REVERSE_SRH_PROGRAM
-    measurement_time = LOAD_BALANCER_MEASUREMENT_TIME
 
-    i = 0
-    for topo, demands_list in topos.items():
-        i += 1
-        lg.info("******* [topo %d/%d] %d flow files to test in topo '%s' "
-                "*******\n"
-                % (i, len(topos), len(demands_list), os.path.basename(topo)))
-        for demands in demands_list:
-            cwd = os.path.join(args.log_dir, os.path.basename(topo) + '_' +
-                               os.path.basename(demands))
-            try:
-                os.makedirs(cwd)
-            except OSError as e:
-                print("OSError %s" % e)
-            cleanup()
-            lg.info("******* Processing topo '%s' demands '%s' *******\n" % (
-                os.path.basename(topo),
-                os.path.basename(demands)))
-
-            tcp_ebpf_experiment = \
-                TCPeBPFExperiment(timestamp=datetime.now(), topology=topo,
-                                  demands=demands, ebpf=args.ebpf, **params)
-            db.add(tcp_ebpf_experiment)
-
-            with open(demands) as fileobj:
-                json_demands = json.load(fileobj)
-            print("HHHHHHHHHHHHHHHHHHHH" + cwd)
-            topo_args = {"schema_tables": ovsschema["tables"], "cwd": cwd,
-                         "enable_ecn": False,
-                         "maxseg": -1, "repetita_graph": topo,
-                         "ebpf": args.ebpf,
-                         "json_demands": json_demands,
-                         "localctrl_opts": {
-                             "long_ebpf_program": server_program
-                         }}
-
-            net = ReroutingNet(topo=RepetitaTopo(**topo_args),
-                               static_routing=True)
-            result_files = []
-            tcpdumps = []
-
-            subprocess.call("pkill -9 iperf".split(" "))
-            subprocess.call("pkill -9 curl".split(" "))
-            subprocess.call("pkill -9 ab".split(" "))
-            err = False
-            try:
-                net.start()
-
-                # Read flow file to retrieve the clients and servers
-                json_demands = parse_demands(json_demands)
-                print(json_demands)
-                clients = []
-                servers = []
-                nbr_flows = []
-                clamp = []
-                for d in json_demands:
-                    clients.append("h" + net.topo.getFromIndex(d["src"]))
-                    servers.append("h" + net.topo.getFromIndex(d["dest"]))
-                    nbr_flows.append(d["number"])
-                    clamp.append(d["volume"] // 1000)  # Mbps
-
-                    connections = [IPerfConnections(connection_id=conn,
-                                                    max_volume=clamp[-1])
-                                   for conn in range(nbr_flows[-1])]
-                    tcp_ebpf_experiment.iperfs.append(
-                        IPerfResults(client=clients[-1], server=servers[-1],
-                                     connections=connections))
-                print(clients)
-                print(servers)
+    iperf_experiments(lg, args, ovsschema, params,
+                      localctrl_opts={"long_ebpf_program": server_program},
+                      measurement_time=LOAD_BALANCER_MEASUREMENT_TIME,
+                      client_program=client_program, server_program=server_program)
 
-                # IPCLI(net)  # TODO Remove
-                time.sleep(1)
 
-                # Recover eBPF maps
-                if args.ebpf:
-                    for node in clients + servers:
-                        # TODO Do something with the info ?
-                        print(BPFPaths.extract_info(net, net[node]))
-                        break
-
-                # Launch tcpdump on all clients, servers and routers
-                if args.tcpdump:
-                    for n in clients + servers + [r.name for r in net.routers]:
-                        cmd = "tshark -F pcapng -w {}.pcapng ip6".format(os.path.join(cwd, n))
-                        tcpdumps.append(net[n].popen(cmd))
-
-                result_files = [open(os.path.join(cwd, "%d_results_%s_%s.json")
-                                     % (i, clients[i], servers[i]), "w")
-                                for i in range(len(clients))]
-                pid_servers, pid_clients = \
-                    launch_iperf(lg, net, clients, servers, result_files,
-                                 nbr_flows, clamp, tcp_ebpf_experiment.iperfs,
-                                 ebpf=args.ebpf, measurement_time=measurement_time,
-                                 client_program=client_program, server_program=server_program)
-                if len(pid_servers) == 0:
-                    return
-
-                # IPCLI(net)  # TODO Remove
-
-                # Measure load on each interface
-                start_time = time.time()
-                while time.time() - start_time < measurement_time:
-                    # for pid in pid_servers:
-                    #    print("ANOTHER SERVER")
-                    #    print(pid.stdout.readlines())
-                    apply_changes(time.time() - start_time, net)
-                    time.sleep(0.1)
-
-                # IPCLI(net)  # TODO Remove
-
-                # Allow iperf control connection to recover fast
-                revert_changes(net)
-
-                # IPCLI(net)  # TODO Remove
-
-                print("Check servers ending")
-                for i, pid in enumerate(pid_servers):
-                    if pid.poll() is None:
-                        lg.error("The iperf (%s,%s) has not finish yet\n" % (clients[i], servers[i]))
-                        print("ERROR 0")
-                        pid.send_signal(signal.SIGTERM)
-                        pid.wait(10)
-                        print("ERROR 1")
-                        pid.kill()
-
-                print("Check clients ending")
-                for i, pid in enumerate(pid_clients):
-                    if pid.poll() is None:
-                        lg.error("The iperf (%s,%s) has not finish yet\n" % (clients[i], servers[i]))
-                        pid.kill()
-
-                # Recover eBPF maps
-                if args.ebpf:
-                    for node in clients + servers:
-                        # TODO Do something with the info ?
-                        print(BPFPaths.extract_info(net, net[node]))
-                        break
-
-                for pid in tcpdumps:
-                    pid.kill()
-            # except Exception as e:
-            #    lg.error("Exception %s in the topo emulation... Skipping...\n"
-            #             % e)
-            #    ipmininet.DEBUG_FLAG = True  # Do not clear daemon logs
-            #    continue
-            finally:
-
-                for pid in tcpdumps:
-                    pid.kill()
-
-                # IPCLI(net)  # TODO Remove
-                net.stop()
-                cleanup()
-                for fileobj in result_files:
-                    if fileobj is not None:
-                        fileobj.close()
-                subprocess.call("pkill -9 iperf".split(" "))
-
-            db.commit()  # Commit even if catastrophic results
-
-            if not err:
-                # try:
-                lg.info("******* Saving results '%s' *******\n" %
-                        os.path.basename(topo))
-                for i in range(len(clients)):
-                    with open(os.path.join(cwd, "%d_results_%s_%s.json" % (i, clients[i], servers[i])), "r") as fileobj:
-                        results = json.load(fileobj)
-                        iperf_db = tcp_ebpf_experiment.iperfs[i]
-                        iperf_db.raw_json = json.dumps(results, indent=4)
-                        for j in range(nbr_flows[i]):
-                            connection_db = iperf_db.connections[j]
-                            connection_db.start_samples = \
-                                results["start"]["timestamp"]["timesecs"]
-                        for t, interval in enumerate(results["intervals"]):
-                            connection_db.bw_samples.append(
-                                IPerfBandwidthSample(time=(t + 1) * INTERVALS,
-                                                     bw=interval["streams"][j]["bits_per_second"]))
-                tcp_ebpf_experiment.failed = False
-                tcp_ebpf_experiment.valid = True
-
-                # The delta is an approximation valid at 0.1 ms, so negligible for our use cases
-                tcp_ebpf_experiment.monotonic_realtime_delta = time.time() - time.monotonic()
-
-                tc_changes = []
-                for change in net.topo.applied_changes:
-                    change.clean()
-                    if change.applied_time >= 0:
-                        tc_changes.append([change.applied_time, change.serialize()])
-                tcp_ebpf_experiment.tc_changes = json.dumps(tc_changes)
-
-                db.commit()
-                # except Exception as e:
-                #    lg.error("Exception %s in the graph generation...
-                #    Skipping...\n" % e)
-                #    lg.error(str(e))
-                #    continue
-            else:
-                lg.error("******* Error %s processing graphs '%s' *******\n" % (
-                    err, os.path.basename(topo)))
-                db.commit()  # Commit even if catastrophic results
+def print_router_addresses(net: ReroutingNet):
+    for node in net.routers:
+        print(node.name)
+        for itf in node.intfList():
+            for ip6 in itf.ip6s(exclude_lls=True):
+                print(ip6.ip.compressed)
 
 
 def traceroute(lg, args, ovsschema):
-    topos = get_repetita_topos(args)
-    os.mkdir(args.log_dir)
-
-    lg.info("******* %d Topologies to test *******\n" % len(topos))
-
-    db = get_connection()
     params = get_xp_params()
     params["random_strategy"] = "traceroute"
-    server_program = SRLocalCtrl.TRACEROUTE
-    client_program = SRLocalCtrl.TRACEROUTE
-    measurement_time = TRACEROUTE_MEASUREMENT_TIME
-
-    i = 0
-    for topo, demands_list in topos.items():
-        i += 1
-        lg.info("******* [topo %d/%d] %d flow files to test in topo '%s' "
-                "*******\n"
-                % (i, len(topos), len(demands_list), os.path.basename(topo)))
-        for demands in demands_list:
-            cwd = os.path.join(args.log_dir, os.path.basename(topo) + '_' +
-                               os.path.basename(demands))
-            try:
-                os.makedirs(cwd)
-            except OSError as e:
-                print("OSError %s" % e)
-            cleanup()
-            lg.info("******* Processing topo '%s' demands '%s' *******\n" % (
-                os.path.basename(topo),
-                os.path.basename(demands)))
-
-            tcp_ebpf_experiment = \
-                TCPeBPFExperiment(timestamp=datetime.now(), topology=topo,
-                                  demands=demands, ebpf=args.ebpf, **params)
-            db.add(tcp_ebpf_experiment)
-
-            with open(demands) as fileobj:
-                json_demands = json.load(fileobj)
-            print("HHHHHHHHHHHHHHHHHHHH" + cwd)
-            topo_args = {"schema_tables": ovsschema["tables"], "cwd": cwd,
-                         "enable_ecn": False,
-                         "maxseg": -1, "repetita_graph": topo,
-                         "ebpf": args.ebpf,
-                         "json_demands": json_demands,
-                         "localctrl_opts": {
-                             "reverse_srh_ebpf_program": SRLocalCtrl.TRACEROUTE
-                         }}
 
-            net = ReroutingNet(topo=RepetitaTopo(**topo_args),
-                               static_routing=True)
-            result_files = []
-            tcpdumps = []
-
-            subprocess.call("pkill -9 iperf".split(" "))
-            subprocess.call("pkill -9 curl".split(" "))
-            subprocess.call("pkill -9 ab".split(" "))
-            err = False
-            try:
-                net.start()
-
-                # Read flow file to retrieve the clients and servers
-                json_demands = parse_demands(json_demands)
-                print(json_demands)
-                clients = []
-                servers = []
-                nbr_flows = []
-                clamp = []
-                for d in json_demands:
-                    clients.append("h" + net.topo.getFromIndex(d["src"]))
-                    servers.append("h" + net.topo.getFromIndex(d["dest"]))
-                    nbr_flows.append(d["number"])
-                    clamp.append(d["volume"] // 1000)  # Mbps
-
-                    connections = [IPerfConnections(connection_id=conn,
-                                                    max_volume=clamp[-1])
-                                   for conn in range(nbr_flows[-1])]
-                    tcp_ebpf_experiment.iperfs.append(
-                        IPerfResults(client=clients[-1], server=servers[-1],
-                                     connections=connections))
-                print(clients)
-                print(servers)
-
-                # IPCLI(net)  # TODO Remove
-                time.sleep(1)
-
-                # Recover eBPF maps
-                if args.ebpf:
-                    for node in clients + servers:
-                        # TODO Do something with the info ?
-                        print(BPFPaths.extract_info(net, net[node]))
-                        break
-
-                # Launch tcpdump on all clients, servers and routers
-                if args.tcpdump:
-                    for n in clients + servers + [r.name for r in net.routers]:
-                        cmd = "tshark -F pcapng -w {}.pcapng ip6".format(os.path.join(cwd, n))
-                        tcpdumps.append(net[n].popen(cmd))
-
-                result_files = [open(os.path.join(cwd, "%d_results_%s_%s.json")
-                                     % (i, clients[i], servers[i]), "w")
-                                for i in range(len(clients))]
-                pid_servers, pid_clients = \
-                    launch_iperf(lg, net, clients, servers, result_files,
-                                 nbr_flows, clamp, tcp_ebpf_experiment.iperfs,
-                                 ebpf=args.ebpf, measurement_time=measurement_time,
-                                 client_program=client_program, server_program=server_program)
-                if len(pid_servers) == 0:
-                    return
-
-                time.sleep(measurement_time)
-
-                print("Check servers ending")
-                for i, pid in enumerate(pid_servers):
-                    if pid.poll() is None:
-                        lg.error("The iperf (%s,%s) has not finish yet\n" % (clients[i], servers[i]))
-                        print("ERROR 0")
-                        pid.send_signal(signal.SIGTERM)
-                        pid.wait(10)
-                        print("ERROR 1")
-                        pid.kill()
-
-                print("Check clients ending")
-                for i, pid in enumerate(pid_clients):
-                    if pid.poll() is None:
-                        lg.error("The iperf (%s,%s) has not finish yet\n" % (clients[i], servers[i]))
-                        pid.kill()
-
-                # Recover eBPF maps
-                if args.ebpf:
-                    for node in clients + servers:
-                        # TODO Do something with the info ?
-                        print(BPFPaths.extract_info(net, net[node]))
-                        break
-
-                for pid in tcpdumps:
-                    pid.kill()
-
-                for node in net.routers:
-                    print(node.name)
-                    for itf in node.intfList():
-                        for ip6 in itf.ip6s(exclude_lls=True):
-                            print(ip6.ip.compressed)
-            # except Exception as e:
-            #    lg.error("Exception %s in the topo emulation... Skipping...\n"
-            #             % e)
-            #    ipmininet.DEBUG_FLAG = True  # Do not clear daemon logs
-            #    continue
-            finally:
-
-                for pid in tcpdumps:
-                    pid.kill()
-
-                # IPCLI(net)  # TODO Remove
-                net.stop()
-                cleanup()
-                for fileobj in result_files:
-                    if fileobj is not None:
-                        fileobj.close()
-                subprocess.call("pkill -9 iperf".split(" "))
-
-            db.commit()  # Commit even if catastrophic results
-
-            if not err:
-                # try:
-                lg.info("******* Saving results '%s' *******\n" %
-                        os.path.basename(topo))
-                for i in range(len(clients)):
-                    with open(os.path.join(cwd, "%d_results_%s_%s.json" % (i, clients[i], servers[i])), "r") as fileobj:
-                        results = json.load(fileobj)
-                        iperf_db = tcp_ebpf_experiment.iperfs[i]
-                        iperf_db.raw_json = json.dumps(results, indent=4)
-                        for j in range(nbr_flows[i]):
-                            connection_db = iperf_db.connections[j]
-                            connection_db.start_samples = \
-                                results["start"]["timestamp"]["timesecs"]
-                        for t, interval in enumerate(results["intervals"]):
-                            connection_db.bw_samples.append(
-                                IPerfBandwidthSample(time=(t + 1) * INTERVALS,
-                                                     bw=interval["streams"][j]["bits_per_second"]))
-                tcp_ebpf_experiment.failed = False
-                tcp_ebpf_experiment.valid = True
-
-                # The delta is an approximation valid at 0.1 ms, so negligible for our use cases
-                tcp_ebpf_experiment.monotonic_realtime_delta = time.time() - time.monotonic()
-
-                db.commit()
-
-                # except Exception as e:
-                #    lg.error("Exception %s in the graph generation...
-                #    Skipping...\n" % e)
-                #    lg.error(str(e))
-                #    continue
-            else:
-                lg.error("******* Error %s processing graphs '%s' *******\n" % (
-                    err, os.path.basename(topo)))
-                db.commit()  # Commit even if catastrophic results
+    iperf_experiments(lg, args, ovsschema, params,
+                      localctrl_opts={"reverse_srh_ebpf_program": SRLocalCtrl.TRACEROUTE},
+                      measurement_time=TRACEROUTE_MEASUREMENT_TIME,
+                      client_program=SRLocalCtrl.TRACEROUTE, server_program=SRLocalCtrl.TRACEROUTE,
+                      link_changes=False, after_measurement=print_router_addresses)
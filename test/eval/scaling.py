@@ -0,0 +1,152 @@
+"""Scaling of the emulation startup and teardown with the topology size
+
+For each size, a synthetic Repetita topology is emulated and the wall time
+of each phase, the memory and the number of kernel objects are recorded
+in a report to know which topologies fit on a single emulation host.
+"""
+import json
+import os
+import resource
+import subprocess
+import time
+from collections import OrderedDict
+
+from examples.repetita_network import RepetitaTopo
+from reroutemininet.clean import cleanup, teardown
+from reroutemininet.config import SRLocalCtrl
+from reroutemininet.net import ReroutingNet
+from . import synthetic
+
+SCALING_SIZES = [5, 10, 20, 40]  # Number of routers
+SCALING_DEMANDS_BY_NODE = 0.5  # Number of demands (thus of hosts) by router
+SCALING_SEED = 0
+LINK_MODES = ["switch", "switch-free"]  # See the switch_free parameter of RepetitaTopo
+
+
+def network_namespaces() -> int:
+    """Number of network namespaces used by a process of the machine (including the root one)"""
+    namespaces = set()
+    for pid in os.listdir("/proc"):
+        if not pid.isdigit():
+            continue
+        try:
+            namespaces.add(os.readlink(os.path.join("/proc", pid, "ns", "net")))
+        except OSError:
+            pass  # The process exited
+    return len(namespaces)
+
+
+def _count_lines(cmd, node=None):
+    out = node.cmd(cmd) if node is not None else subprocess.check_output(cmd, shell=True, universal_newlines=True)
+    return len([line for line in out.splitlines() if len(line.strip()) > 0])
+
+
+def kernel_objects(net=None) -> dict:
+    """Count the namespaces of the machine and the veths and qdiscs of the root namespace
+    and of the namespaces of the network nodes (if the network is given)"""
+    nodes = [None]
+    if net is not None:
+        nodes += [n for n in net.hosts + net.routers if n.inNamespace and n.shell is not None]
+    return {"namespaces": network_namespaces(),
+            "veths": sum(_count_lines("ip -o link show type veth", n) for n in nodes),
+            "qdiscs": sum(_count_lines("tc qdisc show", n) for n in nodes)}
+
+
+def memory_used() -> int:
+    """Memory used on the machine in kB"""
+    meminfo = {}
+    with open("/proc/meminfo") as fileobj:
+        for line in fileobj:
+            key, value = line.split(":")
+            meminfo[key] = int(value.split()[0])
+    return meminfo["MemTotal"] - meminfo["MemAvailable"]
+
+
+def peak_rss() -> dict:
+    """Peak resident set sizes in kB of the experiment and of its largest terminated child"""
+    return {"self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+            "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss}
+
+
+def emulate(lg, size, ovsschema, cwd, ebpf, link_mode="switch"):
+    """Start and stop the network of a synthetic topology of 'size' routers
+
+    :param link_mode: One of LINK_MODES
+    :return: the measurements of this size
+    """
+    os.makedirs(cwd, exist_ok=True)
+    graph = os.path.join(cwd, "synthetic_%d.graph" % size)
+    with open(graph, "w") as fileobj:
+        fileobj.write(synthetic.repetita_graph(size, seed=SCALING_SEED))
+    json_demands = synthetic.repetita_demands(size, max(1, int(size * SCALING_DEMANDS_BY_NODE)),
+                                              seed=SCALING_SEED)
+
+    report = OrderedDict([("size", size), ("link_mode", link_mode), ("phases", OrderedDict())])
+    phases = report["phases"]
+    memory_before = memory_used()
+    report["objects_before"] = kernel_objects()
+
+    start = time.monotonic()
+    topo = RepetitaTopo(schema_tables=ovsschema["tables"], cwd=cwd, repetita_graph=graph, ebpf=ebpf,
+                        json_demands=json_demands, switch_free=link_mode == "switch-free",
+                        localctrl_opts={"short_ebpf_program": SRLocalCtrl.EXP3_LOWEST_DELAY_EBPF_PROGRAM})
+    phases["topology"] = time.monotonic() - start
+    report["routers"] = len(topo.routers())
+    report["hosts"] = len(topo.hosts())
+    report["switches"] = len(topo.switches())
+    report["links"] = len(topo.links())
+
+    net = None
+    try:
+        start = time.monotonic()
+        net = ReroutingNet(topo=topo, static_routing=True)  # Creates the nodes and links
+        phases["build"] = time.monotonic() - start
+
+        start = time.monotonic()
+        net.start()  # Starts the daemons and loads the eBPF programs
+        phases["start"] = time.monotonic() - start
+
+        report["objects_started"] = kernel_objects(net)
+        report["memory_started"] = memory_used() - memory_before
+    finally:
+        start = time.monotonic()
+        teardown(net)
+        phases["teardown"] = time.monotonic() - start
+
+    report["objects_after"] = kernel_objects()
+    report["memory_after"] = memory_used() - memory_before
+    report["peak_rss"] = peak_rss()
+    lg.info("Size %d with %s links: %s\n"
+            % (size, link_mode, ", ".join("%s %.2fs" % (phase, duration) for phase, duration in phases.items())))
+    return report
+
+
+def print_report(reports):
+    print("%-12s %6s %6s %8s %6s %9s %9s %9s %9s %6s %6s %7s %10s %8s"
+          % ("mode", "size", "links", "switches", "hosts", "topology", "build", "start", "teardown",
+             "netns", "veths", "qdiscs", "mem (MB)", "leaked"))
+    for r in reports:
+        objects = r["objects_started"]
+        leaked = sum(max(0, r["objects_after"][k] - r["objects_before"][k]) for k in r["objects_after"])
+        print("%-12s %6d %6d %8d %6d %9.2f %9.2f %9.2f %9.2f %6d %6d %7d %10.1f %8d"
+              % (r["link_mode"], r["size"], r["links"], r["switches"], r["hosts"], r["phases"]["topology"],
+                 r["phases"]["build"], r["phases"]["start"], r["phases"]["teardown"], objects["namespaces"],
+                 objects["veths"], objects["qdiscs"], r["memory_started"] / 1000, leaked))
+
+
+def startup_scaling(lg, args, ovsschema):
+    os.mkdir(args.log_dir)
+    cleanup()
+
+    reports = []
+    for size in sorted(args.scaling_sizes):
+        for link_mode in args.scaling_link_modes:
+            lg.info("******* Emulating a synthetic topology of %d routers with %s links *******\n"
+                    % (size, link_mode))
+            reports.append(emulate(lg, size, ovsschema, os.path.join(args.log_dir, "size_%d_%s" % (size, link_mode)),
+                                   args.ebpf, link_mode))
+
+            # Written after each run to keep the results if a larger one exhausts the machine
+            with open(os.path.join(args.log_dir, "scaling.json"), "w") as fileobj:
+                json.dump(reports, fileobj, indent=4)
+    print_report(reports)
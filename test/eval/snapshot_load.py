@@ -0,0 +1,300 @@
+"""Load test of the snapshot pipeline with synthetic stat maps
+
+A producer writes byte-exact snapshots of the long flow, short flow or
+FlowBender programs at a configurable rate into a stat map while the
+pipeline of the experiments polls it: dump in the format of
+'bpftool map -j dump', decoding, deduplication like the controller and
+storage in a database. The map is either a file-backed fake map, usable on
+any Linux machine, or a real BPF (per-cpu) array map when running as root:
+
+    python -m eval.snapshot_load --kind long --rate 100000 --cpus 4 --duration 10
+    sudo python -m eval.snapshot_load --kind short --bpf --first-seq 4294960000
+
+Like the programs, each CPU numbers its snapshots and replaces the slot of
+its lowest sequence number, so the slots of a CPU are used in turn. The
+sequence numbers are 32 bits and skip 0 (an unused slot) when they wrap.
+"""
+import argparse
+import itertools
+import mmap
+import os
+import shlex
+import struct
+import subprocess
+import sys
+import threading
+import time
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from reroutemininet.bpf import get_backend, possible_cpus
+from . import synthetic
+from .bpf_stats import BPFTOOL, FlowBenderSnapshot, MAX_EXPERTS, MAX_PATHS_BY_DEST, ShortSnapshot, Snapshot, \
+    SNAPSHOT_POLL_INTERVAL
+from .db import SnapshotDBEntry, SnapshotShortDBEntry
+from .db.base import SQLBaseModel
+
+LONG = "long"
+SHORT = "short"
+FLOWBENDER = "flowbender"
+KINDS = {LONG: Snapshot, SHORT: ShortSnapshot, FLOWBENDER: FlowBenderSnapshot}
+DEFAULT_ENTRIES = 4096
+DEFAULT_FLOWS = 64
+MAX_SEQUENCE = 2 ** 32 - 1
+MOVE_OFFSET = 60  # Offset of last_move_time in the long flow and FlowBender snapshots
+PACING_INTERVAL = 0.001  # The producer writes at most the snapshots of this duration at once
+
+
+class ArrayMap(ABC):
+    """An array map of snapshots whose values have the layout returned by a lookup:
+    with a per-cpu map, the value of each CPU is aligned on 8 bytes"""
+
+    def __init__(self, value_size, max_entries, nbr_cpus=0):
+        """
+        :param nbr_cpus: The number of CPUs of a per-cpu map (0 for a regular map)
+        """
+        self.value_size = value_size
+        self.max_entries = max_entries
+        self.nbr_cpus = nbr_cpus
+        self.stride = (value_size + 7) // 8 * 8 if nbr_cpus > 0 else value_size
+        self.slot_size = self.stride * max(1, nbr_cpus)
+
+    @abstractmethod
+    def write(self, key: int, cpu: int, value: bytes):
+        pass
+
+    @abstractmethod
+    def dump(self) -> str:
+        """The content of the map in the format of 'bpftool map -j dump'"""
+
+    def close(self):
+        pass
+
+
+class FileMap(ArrayMap):
+    """An array map backed by a memory-mapped file"""
+
+    def __init__(self, path, value_size, max_entries, nbr_cpus=0):
+        super().__init__(value_size, max_entries, nbr_cpus)
+        self.path = path
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o600)
+        os.ftruncate(self._fd, self.slot_size * max_entries)
+        self._mmap = mmap.mmap(self._fd, self.slot_size * max_entries)
+
+    def write(self, key, cpu, value):
+        offset = key * self.slot_size + max(0, cpu) * self.stride
+        self._mmap[offset:offset + len(value)] = value
+
+    def dump(self):
+        raw = self._mmap[:]
+        if self.nbr_cpus == 0:
+            return synthetic.map_dump([raw[key * self.slot_size:(key + 1) * self.slot_size]
+                                       for key in range(self.max_entries)])
+        return synthetic.percpu_map_dump([[raw[key * self.slot_size + cpu * self.stride:
+                                               key * self.slot_size + cpu * self.stride + self.value_size]
+                                           for cpu in range(self.nbr_cpus)] for key in range(self.max_entries)])
+
+    def close(self):
+        self._mmap.close()
+        os.close(self._fd)
+        os.unlink(self.path)
+
+
+class BPFMap(ArrayMap):
+    """A real array map created with bpf() and pinned until the end of the test (needs root)"""
+
+    def __init__(self, path, value_size, max_entries, percpu=False):
+        from reroutemininet.resources import registry  # Needs mininet, only available on the test machines
+
+        super().__init__(value_size, max_entries, possible_cpus() if percpu else 0)
+        self.path = registry.pin(path)
+        self.info = get_backend().map_create(path, "stat_map", "percpu_array" if percpu else "array",
+                                             4, value_size, max_entries)
+        self._slots = bytearray(self.slot_size * max_entries)  # An update writes the values of all the CPUs
+
+    def write(self, key, cpu, value):
+        offset = key * self.slot_size + max(0, cpu) * self.stride
+        self._slots[offset:offset + len(value)] = value
+        get_backend().map_update(self.info.id, struct.pack("=I", key),
+                                 bytes(self._slots[key * self.slot_size:(key + 1) * self.slot_size]))
+
+    def dump(self):
+        cmd = "{bpftool} map -j dump id {map_id}".format(bpftool=BPFTOOL, map_id=self.info.id)
+        return subprocess.check_output(shlex.split(cmd)).decode("utf-8")
+
+    def close(self):
+        get_backend().unpin(self.path)
+
+
+def value_size(kind) -> int:
+    return len(SnapshotProducer(kind, None).entry(1, 0, 0))
+
+
+class SnapshotProducer:
+
+    def __init__(self, kind, stat_map: Optional[ArrayMap], nbr_flows=DEFAULT_FLOWS, first_seq=1):
+        """
+        :param kind: LONG, SHORT or FLOWBENDER
+        :param nbr_flows: The number of connections (or destinations for SHORT) of the snapshots
+        :param first_seq: The first sequence number of each CPU (e.g., close to 2^32 to test the wraparound)
+        """
+        self.kind = kind
+        self.map = stat_map
+        self.nbr_flows = nbr_flows
+        nbr_cpus = max(1, stat_map.nbr_cpus) if stat_map is not None else 1
+        self.sequences = [first_seq] * nbr_cpus  # Next sequence number of each CPU
+        self.slots = [0] * nbr_cpus  # Next slot of each CPU
+        self.produced = 0
+        self.wraparounds = 0
+        self._cpus = itertools.cycle(range(nbr_cpus))
+        self._templates = {}  # (flow, path) -> entry
+
+    def _template(self, flow, path) -> bytearray:
+        """The entry of a flow on a path with the sequence number and time left at 0"""
+        if (flow, path) in self._templates:
+            return self._templates[(flow, path)]
+        weights = [1.0 + (path + i) % MAX_PATHS_BY_DEST for i in range(MAX_EXPERTS)]
+        if self.kind == SHORT:
+            entry = synthetic.short_snapshot_entry(0, 0, synthetic.host_address(flow), path, reward=10 * path,
+                                                   weights=weights)
+        else:
+            src, dst = synthetic.host_address(2 * flow), synthetic.host_address(2 * flow + 1)
+            if self.kind == FLOWBENDER:
+                entry = synthetic.flowbender_snapshot_entry(0, 0, src, dst, 40000 + flow, 5201, path,
+                                                            operation=path % 3)
+            else:
+                entry = synthetic.snapshot_entry(0, 0, src, dst, 40000 + flow, 5201, path,
+                                                 last_prob=1 / MAX_PATHS_BY_DEST, weights=weights[:MAX_PATHS_BY_DEST])
+        self._templates[(flow, path)] = bytearray(entry)
+        return self._templates[(flow, path)]
+
+    def entry(self, seq, timestamp, flow) -> bytes:
+        entry = self._template(flow, seq % MAX_PATHS_BY_DEST)
+        struct.pack_into("<IQ", entry, 0, seq, timestamp)
+        if self.kind != SHORT:
+            struct.pack_into("<2Q", entry, MOVE_OFFSET, timestamp, seq)  # last_move_time and rtt_count
+        return bytes(entry)
+
+    def produce(self, count):
+        """Write count snapshots, the CPUs taking turns"""
+        for _ in range(count):
+            cpu = next(self._cpus)
+            seq = self.sequences[cpu]
+            self.map.write(self.slots[cpu], cpu if self.map.nbr_cpus > 0 else -1,
+                           self.entry(seq, time.monotonic_ns(), self.produced % self.nbr_flows))
+            self.slots[cpu] = (self.slots[cpu] + 1) % self.map.max_entries
+            if seq == MAX_SEQUENCE:
+                self.wraparounds += 1
+            self.sequences[cpu] = seq % MAX_SEQUENCE + 1
+            self.produced += 1
+
+    def run(self, rate, stop: threading.Event):
+        """Produce 'rate' snapshots by second until stop is set"""
+        start = time.monotonic()
+        while not stop.is_set():
+            due = int((time.monotonic() - start) * rate) - self.produced
+            if due > 0:
+                self.produce(min(due, max(1, int(rate * PACING_INTERVAL))))
+            else:
+                time.sleep(PACING_INTERVAL)
+
+
+def load_test(kind, stat_map: ArrayMap, rate, duration, nbr_flows=DEFAULT_FLOWS, first_seq=1,
+              poll_interval=SNAPSHOT_POLL_INTERVAL, db=None) -> dict:
+    """Poll the map like the controller while the producer writes in it
+
+    :param db: The session where the snapshots are stored (an in-memory database by default)
+    :return: the numbers of produced, collected and lost snapshots, of sequence wraparounds
+     and the mean time of each step of a poll
+    """
+    snap_class = KINDS[kind]
+    producer = SnapshotProducer(kind, stat_map, nbr_flows=nbr_flows, first_seq=first_seq)
+    stop = threading.Event()
+    thread = threading.Thread(target=producer.run, args=(rate, stop), daemon=True)
+    collected = set()
+    times = {"dump": [], "decode": []}
+
+    def poll():
+        poll_start = time.monotonic()
+        out = stat_map.dump()
+        times["dump"].append(time.monotonic() - poll_start)
+        decode_start = time.monotonic()
+        collected.update(snap_class.from_dump(out))
+        times["decode"].append(time.monotonic() - decode_start)
+        return poll_start
+
+    thread.start()
+    end = time.monotonic() + duration
+    try:
+        while time.monotonic() < end:
+            poll_start = poll()
+            time.sleep(max(0.0, poll_interval - (time.monotonic() - poll_start)))
+    finally:
+        stop.set()
+        thread.join()
+    poll()  # The snapshots written since the last poll are not lost
+
+    if db is None:
+        engine = create_engine("sqlite://", echo=False)
+        SQLBaseModel.metadata.create_all(engine)
+        db = sessionmaker(bind=engine)()
+    entry_class = SnapshotShortDBEntry if kind == SHORT else SnapshotDBEntry
+    store_start = time.monotonic()
+    db.execute(entry_class.__table__.insert(),
+               [{"host": "h0", "snapshot_hex": snap.export()} for snap in sorted(collected)])
+    db.commit()
+
+    def mean(values: List[float]):
+        return sum(values) / len(values) if len(values) > 0 else 0
+
+    return {"produced": producer.produced, "collected": len(collected),
+            "lost": producer.produced - len(collected), "wraparounds": producer.wraparounds,
+            "polls": len(times["dump"]), "dump": mean(times["dump"]), "decode": mean(times["decode"]),
+            "store": time.monotonic() - store_start}
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--kind", choices=sorted(KINDS), default=LONG, help="Layout of the snapshots")
+    parser.add_argument("--rate", type=float, default=10000, help="Snapshots written by second")
+    parser.add_argument("--duration", type=float, default=10, help="Duration of the test in seconds")
+    parser.add_argument("--entries", type=int, default=DEFAULT_ENTRIES, help="Number of slots of the map")
+    parser.add_argument("--cpus", type=int, default=0,
+                        help="Number of CPUs of the per-cpu file map (0 for a regular map)")
+    parser.add_argument("--flows", type=int, default=DEFAULT_FLOWS, help="Number of connections or destinations")
+    parser.add_argument("--first-seq", type=int, default=1, help="First sequence number of each CPU")
+    parser.add_argument("--poll-interval", type=float, default=SNAPSHOT_POLL_INTERVAL)
+    parser.add_argument("--bpf", action="store_true",
+                        help="Write in a real BPF array map (per-cpu on all the possible CPUs with --cpus)"
+                             " instead of a file (needs root)")
+    parser.add_argument("--path", default=None,
+                        help="Path of the file map or of the pin of the BPF map (by default in /tmp or /sys/fs/bpf)")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    size = value_size(args.kind)
+    if args.bpf:
+        stat_map = BPFMap(args.path or "/sys/fs/bpf/snapshot_load_%d" % os.getpid(), size, args.entries,
+                          percpu=args.cpus > 0)
+    else:
+        stat_map = FileMap(args.path or "/tmp/snapshot_load_%d.map" % os.getpid(), size, args.entries,
+                           nbr_cpus=args.cpus)
+    try:
+        results = load_test(args.kind, stat_map, args.rate, args.duration, nbr_flows=args.flows,
+                            first_seq=args.first_seq, poll_interval=args.poll_interval)
+    finally:
+        stat_map.close()
+    print("%d snapshots produced, %d collected, %d lost, %d sequence wraparounds"
+          % (results["produced"], results["collected"], results["lost"], results["wraparounds"]))
+    print("%d polls: %.2f ms to dump, %.2f ms to decode, %.2f s to store"
+          % (results["polls"], results["dump"] * 1000, results["decode"] * 1000, results["store"]))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
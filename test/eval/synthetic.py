@@ -0,0 +1,190 @@
+"""Synthetic inputs with the same layout as the ones of real experiments
+
+They allow to exercise the processing of the results (e.g., in benchmarks)
+without running the emulation.
+"""
+import json
+import math
+import random
+import struct
+from datetime import datetime
+from ipaddress import ip_address
+from typing import List, Tuple
+
+from .bpf_stats import MAX_EXPERTS, MAX_PATHS_BY_DEST, MAX_SEGMENTS_BY_SRH
+from .db import TCPeBPFExperiment, IPerfResults, IPerfConnections, SnapshotDBEntry, IPerfBandwidthSample
+
+FLOAT_EXPONENT_BIAS = 1024
+SRH_FIXED_SIZE = 8 + MAX_SEGMENTS_BY_SRH * 16
+SRH_RECORD_SIZE = 24
+
+
+def encode_floating(value: float) -> Tuple[int, int]:
+    """Encode a positive float in the (mantissa, exponent) of 'struct floating_type'"""
+    if value <= 0:
+        return 0, 0
+    unbiased_exponent = math.floor(math.log2(value))
+    mantissa = min(int(round(value * 2 ** (63 - unbiased_exponent))), 2 ** 64 - 1)
+    return mantissa, unbiased_exponent + FLOAT_EXPONENT_BIAS
+
+
+def host_address(i: int) -> str:
+    return "fc00:%x::1" % (i + 1)
+
+
+def _flow_tuple(src, dst, src_port, dst_port) -> bytes:
+    return struct.pack("<I", 10) + ip_address(src).packed + ip_address(dst).packed \
+        + struct.pack("<2I", src_port, dst_port)
+
+
+def snapshot_entry(seq, time, src, dst, src_port, dst_port, srh_id, last_prob=0.5,
+                   weights=(1.0,) * MAX_PATHS_BY_DEST) -> bytes:
+    """A value of the 'stat_map' of the long flow programs (see Snapshot)"""
+    entry = struct.pack("<IQ", seq, time) + _flow_tuple(src, dst, src_port, dst_port)
+    entry += struct.pack("<I2Q3IQ", srh_id, time, seq, MAX_PATHS_BY_DEST, 0, 0, 0)
+    entry += struct.pack("<QI", *encode_floating(last_prob))
+    for weight in weights:
+        entry += struct.pack("<QI", *encode_floating(weight))
+    return entry
+
+
+def flowbender_snapshot_entry(seq, time, src, dst, src_port, dst_port, srh_id, operation=0) -> bytes:
+    """A value of the 'stat_map' of the FlowBender programs (see FlowBenderSnapshot)"""
+    entry = struct.pack("<IQ", seq, time) + _flow_tuple(src, dst, src_port, dst_port)
+    entry += struct.pack("<I2QI2Q", srh_id, time, seq, 0, 0, 0)
+    return entry + struct.pack("<I", operation)
+
+
+def short_snapshot_entry(seq, time, destination, srh_id, reward=1, weights=(1.0,) * MAX_EXPERTS) -> bytes:
+    """A value of the 'short_stat_map' of the short flow programs (see ShortSnapshot)"""
+    entry = struct.pack("<IQIi", seq, time, srh_id, reward) + ip_address(destination).packed
+    for weight in weights:
+        entry += struct.pack("<QI", *encode_floating(weight))
+    return entry
+
+
+def dest_map_entry(destination, paths: List[List[str]]) -> bytes:
+    """A value of the 'dest_map' (see BPFPaths)
+
+    :param destination: The address of the destination
+    :param paths: The segments of each path (at most MAX_PATHS_BY_DEST)
+    """
+    entry = ip_address(destination).packed + struct.pack("<I", 0)
+    for i in range(MAX_PATHS_BY_DEST):
+        entry += struct.pack("<2I2Q", i, i < len(paths), 0, 0)
+        if i >= len(paths):
+            entry += bytes(SRH_FIXED_SIZE)
+            continue
+        segments = list(reversed(paths[i]))
+        srh = struct.pack("<6BH", 43, 2 * len(segments), 4, len(segments) - 1, len(segments) - 1, 0, 0)
+        for segment in segments:
+            srh += ip_address(segment).packed
+        entry += srh + bytes(SRH_FIXED_SIZE - len(srh))
+    return entry
+
+
+def map_dump(values: List[bytes], nbr_cpus=0) -> str:
+    """The output of 'bpftool map -j dump' for a map containing these values
+
+    :param nbr_cpus: The number of CPUs of a per-cpu map (0 for a regular map)
+    """
+    def hex_bytes(raw):
+        return ["0x%02x" % byte for byte in raw]
+
+    dump = []
+    for key, value in enumerate(values):
+        entry = {"key": hex_bytes(struct.pack("<I", key))}
+        if nbr_cpus > 0:
+            entry["values"] = [{"cpu": cpu, "value": hex_bytes(value)} for cpu in range(nbr_cpus)]
+        else:
+            entry["value"] = hex_bytes(value)
+        dump.append(entry)
+    return json.dumps(dump)
+
+
+def percpu_map_dump(values: List[List[bytes]]) -> str:
+    """The output of 'bpftool map -j dump' for a per-cpu map whose CPUs hold different values
+
+    :param values: The value of each CPU for each key
+    """
+    def hex_bytes(raw):
+        return ["0x%02x" % byte for byte in raw]
+
+    return json.dumps([{"key": hex_bytes(struct.pack("<I", key)),
+                        "values": [{"cpu": cpu, "value": hex_bytes(value)} for cpu, value in enumerate(by_cpu)]}
+                       for key, by_cpu in enumerate(values)])
+
+
+def repetita_graph(nbr_nodes, degree=3, seed=None, bw=100000, delay=1) -> str:
+    """A connected Repetita topology: a ring with random chords
+
+    :param degree: The mean number of neighbors of a node
+    :param bw: The bandwidth of the links in kbps
+    :param delay: The delay of the links in ms
+    """
+    rng = random.Random(seed)
+    links = set()
+    for i in range(nbr_nodes):
+        links.add((min(i, (i + 1) % nbr_nodes), max(i, (i + 1) % nbr_nodes)))
+    nbr_links = min(nbr_nodes * degree // 2, nbr_nodes * (nbr_nodes - 1) // 2)
+    while len(links) < nbr_links:
+        src, dest = rng.sample(range(nbr_nodes), 2)
+        links.add((min(src, dest), max(src, dest)))
+
+    lines = ["NODES %d" % nbr_nodes, "label x y"]
+    lines.extend("N%d 0 0" % i for i in range(nbr_nodes))
+    lines.extend(["", "EDGES %d" % (2 * len(links)), "label src dest weight bw delay"])
+    for src, dest in sorted(links):
+        lines.append("edge_%d %d %d 10 %d %d" % (len(lines), src, dest, bw, delay))
+        lines.append("edge_%d %d %d 10 %d %d" % (len(lines), dest, src, bw, delay))
+    lines.extend(["", "CHANGES 0", ""])
+    return "\n".join(lines)
+
+
+def repetita_demands(nbr_nodes, nbr_demands, seed=None, volume=100000) -> list:
+    """Demands between random pairs of nodes (the content of a .flows file)"""
+    rng = random.Random(seed)
+    demands = []
+    for i in range(nbr_demands):
+        src, dest = rng.sample(range(nbr_nodes), 2)
+        demands.append({"label": "flow_%d" % i, "src": src, "dest": dest, "volume": volume})
+    return demands
+
+
+def tcp_ebpf_experiment(db, nbr_connections, nbr_samples, nbr_snapshots, seed=None) -> TCPeBPFExperiment:
+    """Insert an experiment with its iperf samples and snapshots
+
+    :param nbr_connections: The number of iperf connections (one client server pair each)
+    :param nbr_samples: The number of bandwidth samples of each connection
+    :param nbr_snapshots: The number of snapshots of each connection
+    """
+    rng = random.Random(seed)
+    experiment = TCPeBPFExperiment(timestamp=datetime.now(), topology="synthetic.graph",
+                                   demands="synthetic.flows", ebpf=True, congestion_control="cubic",
+                                   gamma_value=0.1, random_strategy="exp3", max_reward_factor=1.0,
+                                   valid=True, failed=False)
+    db.add(experiment)
+
+    for i in range(nbr_connections):
+        src, dst = host_address(2 * i), host_address(2 * i + 1)
+        src_port, dst_port = 40000 + i, 5201 + i
+        flow_tuple = {"local_host": src, "remote_host": dst, "local_port": src_port, "remote_port": dst_port}
+        iperf = IPerfResults(client="h%d" % (2 * i), server="h%d" % (2 * i + 1),
+                             raw_json=json.dumps({"start": {"connected": [flow_tuple]}}),
+                             connections=[IPerfConnections(connection_id=0, start_samples=rng.uniform(0, 1))])
+        experiment.iperfs.append(iperf)
+        for seq in range(nbr_snapshots):
+            entry = snapshot_entry(i * nbr_snapshots + seq + 1, seq * 10 ** 6, src, dst, src_port, dst_port,
+                                   srh_id=rng.randrange(MAX_PATHS_BY_DEST), last_prob=rng.random())
+            experiment.snapshots.append(SnapshotDBEntry(snapshot_hex=entry.hex(), host=iperf.client))
+    db.flush()
+
+    rows = []
+    for iperf in experiment.iperfs:
+        connection_id = iperf.connections[0].id
+        rows.extend({"connection_id": connection_id, "time": t + 1, "bw": rng.uniform(10 ** 6, 10 ** 8)}
+                    for t in range(nbr_samples))
+    if len(rows) > 0:
+        db.execute(IPerfBandwidthSample.__table__.insert(), rows)
+    db.commit()
+    return experiment
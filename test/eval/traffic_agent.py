@@ -0,0 +1,259 @@
+"""Traffic agent opening all the bulk TCP flows of a host from one event loop
+
+It is launched inside the namespace of a host and only depends on the
+standard library. It replaces the iperf3 server and client of each demand:
+the agent of a server host receives the flows of all its demands on a
+single port and the agent of a client host sends the flows of all its
+demands, each connection being clamped to a rate.
+
+Each connection starts with the header line "<demand> <socket> <nbr sockets>"
+so that the receiving agent knows the demand of the bytes it receives.
+There is no control connection.
+
+The output is one JSON event by line, in the format of 'iperf3 -J --json-stream'
+with the index of the demand in the "demand" key of each event:
+- the sending agent writes a "start" event with the flow tuples of the
+  connections of each demand and an "end" event with the bytes sent;
+- the receiving agent writes an "interval" event by reporting interval with
+  the received throughput of each connection and an "end" event with the
+  bytes received.
+"""
+import argparse
+import asyncio
+import json
+import signal
+import sys
+import time
+
+WRITE_CHUNK = 2 ** 17
+MIN_WRITE_CHUNK = 1448
+PACING_INTERVAL = 0.01  # A clamped connection writes at most the bytes of this duration at once
+CONNECT_TIMEOUT = 10  # The receiving agent of a demand may start slightly later
+CONNECT_RETRY = 0.1
+LINGER = 5  # Seconds that a receiving agent waits for late bytes after the duration
+
+
+def emit(event, demand, data):
+    sys.stdout.write(json.dumps({"event": event, "demand": demand, "data": data}) + "\n")
+    sys.stdout.flush()
+
+
+def flow_tuple(sock, index):
+    local = sock.getsockname()
+    remote = sock.getpeername()
+    return {"socket": index, "local_host": local[0], "local_port": local[1],
+            "remote_host": remote[0], "remote_port": remote[1]}
+
+
+class Demand:
+    """The connections of a demand on the receiving side"""
+
+    def __init__(self, demand, nbr_sockets):
+        self.demand = demand
+        self.received = [0] * nbr_sockets  # Bytes since the start
+        self.reported = [0] * nbr_sockets  # Bytes at the last report
+        self.start = time.monotonic()
+        self.last_report = self.start
+        self.open_sockets = 0
+        self.ended = False
+
+    def report(self):
+        now = time.monotonic()
+        seconds = now - self.last_report
+        streams = []
+        for j, received in enumerate(self.received):
+            n = received - self.reported[j]
+            self.reported[j] = received
+            streams.append({"socket": j, "start": self.last_report - self.start, "end": now - self.start,
+                            "seconds": seconds, "bytes": n,
+                            "bits_per_second": n * 8 / seconds if seconds > 0 else 0})
+        total = sum(stream["bytes"] for stream in streams)
+        emit("interval", self.demand,
+             {"streams": streams,
+              "sum": {"start": self.last_report - self.start, "end": now - self.start, "seconds": seconds,
+                      "bytes": total, "bits_per_second": total * 8 / seconds if seconds > 0 else 0}})
+        self.last_report = now
+
+    def end(self):
+        self.ended = True
+        seconds = time.monotonic() - self.start
+        total = sum(self.received)
+        emit("end", self.demand, {"sum_received": {"seconds": seconds, "bytes": total,
+                                                   "bits_per_second": total * 8 / seconds if seconds > 0 else 0}})
+
+
+class SinkProtocol(asyncio.Protocol):
+    """Count the bytes received on a connection without copying them"""
+
+    def __init__(self, agent: 'TrafficAgent'):
+        self.agent = agent
+        self.header = b""
+        self.demand = None
+        self.socket = None
+
+    def data_received(self, data):
+        if self.demand is None:
+            self.header += data
+            if b"\n" not in self.header:
+                return
+            line, _, data = self.header.partition(b"\n")
+            demand, self.socket, nbr_sockets = (int(x) for x in line.split())
+            self.demand = self.agent.receiving(demand, nbr_sockets)
+            self.demand.open_sockets += 1
+        self.demand.received[self.socket] += len(data)
+
+    def connection_lost(self, exc):
+        if self.demand is not None:
+            self.demand.open_sockets -= 1
+
+
+class TrafficAgent:
+
+    def __init__(self, interval=1.0):
+        """
+        :param interval: The reporting interval of the received throughput in seconds
+        """
+        self.interval = interval
+        self.demands = {}  # Receiving side, index of demand -> Demand
+        self.failures = 0
+
+    def receiving(self, demand, nbr_sockets) -> Demand:
+        if demand not in self.demands:
+            self.demands[demand] = Demand(demand, nbr_sockets)
+            asyncio.ensure_future(self._report(self.demands[demand]))
+        return self.demands[demand]
+
+    async def _report(self, demand: Demand):
+        """Report the throughput of the demand until all its connections are closed"""
+        next_report = demand.start + self.interval
+        while True:
+            await asyncio.sleep(max(0.0, next_report - time.monotonic()))
+            if demand.open_sockets == 0:
+                break
+            demand.report()
+            next_report += self.interval
+        demand.end()
+
+    async def listen(self, port):
+        return await asyncio.get_running_loop().create_server(lambda: SinkProtocol(self), host="::", port=port,
+                                                              reuse_address=True)
+
+    async def _connect(self, server, port, bind):
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while True:
+            try:
+                return await asyncio.open_connection(server, port, local_addr=(bind, 0) if bind else None)
+            except ConnectionRefusedError:
+                if time.monotonic() >= deadline:
+                    raise
+                await asyncio.sleep(CONNECT_RETRY)
+
+    async def _send(self, writer, rate, stop):
+        """Write zeros on the connection at 'rate' bps (0 for no clamp) until stop is set"""
+        loop = asyncio.get_running_loop()
+        chunk = bytes(WRITE_CHUNK if rate == 0
+                      else max(MIN_WRITE_CHUNK, min(WRITE_CHUNK, int(rate / 8 * PACING_INTERVAL))))
+        start = loop.time()
+        sent = 0
+        while not stop.is_set():
+            if rate > 0:
+                ahead = sent * 8 / rate - (loop.time() - start)
+                if ahead > 0:
+                    await asyncio.sleep(ahead)
+            writer.write(chunk)
+            await writer.drain()
+            sent += len(chunk)
+        return sent
+
+    async def send(self, demand, server, port, nbr_sockets, rate, stop, bind=None):
+        """Open the connections of a demand and send on them until stop is set
+
+        :param rate: The clamp of each connection in bps (0 for no clamp)
+        """
+        start = time.time()
+        try:
+            connections = await asyncio.gather(*[self._connect(server, port, bind) for _ in range(nbr_sockets)])
+        except OSError as e:
+            self.failures += 1
+            emit("error", demand, "Cannot connect to [%s]:%d: %s" % (server, port, e))
+            return
+
+        for j, (_, writer) in enumerate(connections):
+            writer.write(("%d %d %d\n" % (demand, j, nbr_sockets)).encode("ascii"))
+        emit("start", demand, {"connected": [flow_tuple(writer.get_extra_info("socket"), j)
+                                             for j, (_, writer) in enumerate(connections)],
+                               "timestamp": {"timesecs": int(start), "time": start}})
+        try:
+            sent = await asyncio.gather(*[self._send(writer, rate, stop) for _, writer in connections])
+        except OSError as e:
+            self.failures += 1
+            emit("error", demand, "Connection to [%s]:%d lost: %s" % (server, port, e))
+            return
+        finally:
+            for _, writer in connections:
+                writer.close()
+        seconds = time.time() - start
+        emit("end", demand, {"sum_sent": {"seconds": seconds, "bytes": sum(sent),
+                                          "bits_per_second": sum(sent) * 8 / seconds if seconds > 0 else 0}})
+
+    def end(self):
+        for demand in self.demands.values():
+            if not demand.ended:
+                demand.end()
+
+
+def parse_flow(value):
+    demand, server, port, nbr_sockets, rate = value.split(",")
+    return int(demand), server, int(port), int(nbr_sockets), float(rate)
+
+
+async def run(agent: TrafficAgent, args):
+    stop = asyncio.Event()  # The end of the sending
+    done = asyncio.Event()  # The end of the agent
+    loop = asyncio.get_running_loop()
+
+    def interrupt():  # A signal has only one handler
+        stop.set()
+        done.set()
+
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, interrupt)
+
+    server = await agent.listen(args.listen) if args.listen is not None else None
+    loop.call_later(args.duration, stop.set)
+    # The flows towards this host may have started later
+    loop.call_later(args.duration + (LINGER if server is not None else 0), done.set)
+    await asyncio.gather(*[agent.send(demand, host, port, nbr_sockets, rate * 10 ** 6, stop, bind=args.bind)
+                           for demand, host, port, nbr_sockets, rate in args.flow])
+    await done.wait()
+
+    if server is not None:
+        server.close()
+        agent.end()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-l", "--listen", type=int, default=None,
+                        help="Port on which the flows of the demands towards this host are received")
+    parser.add_argument("-f", "--flow", type=parse_flow, action="append", default=[],
+                        help="Demand sent by this host in the form <demand index>,<server ip>,<port>,"
+                             "<number of connections>,<clamp of each connection in Mbps (0 for none)>"
+                             " (can be repeated)")
+    parser.add_argument("-B", "--bind", default=None, help="Local address of the connections")
+    parser.add_argument("-t", "--duration", type=float, default=10, help="Duration in seconds")
+    parser.add_argument("-i", "--interval", type=float, default=1.0,
+                        help="Reporting interval of the received throughput in seconds")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    agent = TrafficAgent(interval=args.interval)
+    asyncio.run(run(agent, args))
+    return 0 if agent.failures == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
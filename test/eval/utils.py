@@ -1,11 +1,10 @@
 import math
 import os
-import subprocess
-import time
 from shlex import split
 
 import numpy as np
-from ipmininet.utils import realIntfList
+
+from reroutemininet.cgroup import CGROUP2_ROOT, in_cgroup
 
 TEST_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DEFAULT_CGROUP = "test.slice"
@@ -24,15 +23,7 @@ def run_in_cgroup(node, cmd, cgroup=DEFAULT_CGROUP, **kwargs):
     """
     Run asynchronously the command cmd in a cgroup
     """
-    popen = node.popen(split("bash"), stdin=subprocess.PIPE, **kwargs)
-    time.sleep(1)
-
-    os.system('echo %d > /sys/fs/cgroup/unified/%s/cgroup.procs' % (popen.pid, cgroup))
-    time.sleep(1)
-
-    popen.stdin.write(bytes(cmd))
-    popen.stdin.close()
-    return popen
+    return node.popen(in_cgroup(split(cmd), os.path.join(CGROUP2_ROOT, cgroup)), **kwargs)
 
 
 def tcpdump(node, *itfs):
@@ -59,6 +50,8 @@ def debug_tcpdump(node, itf, output_path, out_prefix=""):
 
 
 def get_addr(node):
+    from ipmininet.utils import realIntfList
+
     try:
         lo_itf = [node.intf('lo')]
     except KeyError:
@@ -71,55 +64,61 @@ def get_addr(node):
 
 
 def _one_dot_by_instance(bin_edges, cdf, nbr_instances):
-    new_bin_edges = []
-    new_cdf = []
-    i = 0
-    for l in np.linspace(0, 1, num=nbr_instances + 1):
-        if i == len(cdf):
-            break
-        new_bin_edges.append(bin_edges[i])
-        new_cdf.append(l)
-        if math.fabs(cdf[i] - l) <= 10e-6:
-            i += 1
-    return new_bin_edges, new_cdf
-
-
-def _histogram_data(bounded_data):
-    counts = []
-    bin_edges = []
-    bounded_data = sorted(bounded_data)
-    for i in range(len(bounded_data)):
-        if len(bin_edges) != 0 and bin_edges[-1] == bounded_data[i]:
-            counts[-1] += 1
-        else:
-            counts.append(1)
-            bin_edges.append(bounded_data[i])
-    return counts, bin_edges
+    """Resample the CDF at each multiple of 1/nbr_instances
+
+    A point of the CDF is consumed when its value matches the current level,
+    the levels before it repeat the previous bin edge. A point that matches
+    no later level blocks the following ones.
+    """
+    bin_edges = np.asarray(bin_edges)
+    cdf = np.asarray(cdf, dtype=float)
+    levels = np.linspace(0, 1, num=nbr_instances + 1)
+    # Range of the levels matching each point, the bounds being fixed for the rounding errors
+    last = len(levels) - 1
+
+    def matches(level):
+        return np.fabs(cdf - levels[np.clip(level, 0, last)]) <= 10e-6
+
+    first_level = np.searchsorted(levels, cdf - 10e-6)
+    first_level[(first_level > 0) & matches(first_level - 1)] -= 1
+    first_level[(first_level <= last) & ~matches(first_level)] += 1
+    last_level = np.searchsorted(levels, cdf + 10e-6, side="right") - 1
+    last_level[(last_level < last) & matches(last_level + 1)] += 1
+    last_level[(last_level >= 0) & ~matches(last_level)] -= 1
+    # Level at which each point is consumed: the first matching one after the previous point
+    indices = np.arange(len(cdf))
+    consumed_at = indices + np.maximum.accumulate(first_level - indices)
+    matching = consumed_at <= last_level
+    nbr_consumed = len(cdf) if matching.all() else int(np.argmin(matching))
+    consumed_before = np.searchsorted(consumed_at[:nbr_consumed], np.arange(len(levels)))
+    kept = consumed_before < len(cdf)
+    return bin_edges[consumed_before[kept]].tolist(), levels[kept].tolist()
 
 
 def cdf_data(cdf_values, nbr_instances=None):
-    data = sorted(cdf_values)
+    """The bin edges and the CDF values of the data, the infinite values being
+    the unsolved instances that lower the CDF
+
+    :param cdf_values: A sequence, a numpy array or an iterable of numbers
+    :param nbr_instances: If set, the CDF is resampled at each multiple of 1/nbr_instances
+    """
+    if not isinstance(cdf_values, np.ndarray):
+        cdf_values = np.fromiter(cdf_values, dtype=float)
 
-    # Count and filter math.inf
-    bounded_data = []
-    for value in data:
-        if value != math.inf:
-            bounded_data.append(value)
+    bounded_data = cdf_values[cdf_values != math.inf]
     if len(bounded_data) == 0:  # Every demand file was failed
         return None, None
 
-    counts, bin_edges = _histogram_data(bounded_data)
+    bin_edges, counts = np.unique(bounded_data, return_counts=True)
     cdf = np.cumsum(counts)
 
-    cdf = (cdf / cdf[-1]) * (len(bounded_data) / len(data))  # Unsolved instances hurts the cdf
-    bin_edges = list(bin_edges)
-    bin_edges.insert(0, 0)
-    cdf = list(cdf)
-    cdf.insert(0, 0)
+    cdf = (cdf / cdf[-1]) * (len(bounded_data) / len(cdf_values))  # Unsolved instances hurts the cdf
+    bin_edges = np.concatenate([[0], bin_edges])
+    cdf = np.concatenate([[0], cdf])
     if nbr_instances is not None:
         return _one_dot_by_instance(bin_edges, cdf, nbr_instances)
     else:
-        return bin_edges, cdf
+        return bin_edges.tolist(), cdf.tolist()
 
 
 def latexify(fig_width=None, fig_height=None, columns=2):
@@ -0,0 +1,131 @@
+"""Index and cache of the Repetita topologies and their demands
+
+The graphs are parsed once into a RepetitaGraph and pickled in a cache
+directory keyed by their path, modification time and size, so that later
+experiments, iterations and runner processes reuse them. The format is
+described at https://github.com/svissicchio/Repetita/wiki/Adding-Problem-Instances#topology-format
+"""
+import hashlib
+import os
+import pickle
+from collections import namedtuple
+from typing import Dict, List
+
+CACHE_DIR = os.path.join(os.path.abspath(os.environ["HOME"]), ".cache", "srv6-rerouting", "repetita")
+CACHE_VERSION = 1  # To increment when RepetitaGraph changes
+
+# nodes: the labels of the nodes
+# edges: tuples (label, src, dest, weight, bw in kbps, delay in ms)
+# changes: tuples (time, src, dest, weight, bw in kbps, delay in ms, *other fields)
+# stopping_time: the STOP value of the graph or -1
+RepetitaGraph = namedtuple("RepetitaGraph", ["nodes", "edges", "changes", "stopping_time"])
+
+_graphs = {}  # (path, mtime, size) -> RepetitaGraph
+_catalogs = {}  # directory -> {graph path: [flows paths]}
+_graph_flows = {}  # graph path -> [flows paths]
+
+
+def parse_graph(path) -> RepetitaGraph:
+    nodes = []
+    edges = []
+    changes = []
+    stopping_time = -1
+    with open(path) as fileobj:
+        nbr_nodes = int(fileobj.readline().split(" ")[1])  # NODES XXX
+        fileobj.readline()  # label x y
+        for _ in range(nbr_nodes):
+            label, _, _ = fileobj.readline().split(" ")  # Node line
+            nodes.append(label)
+
+        fileobj.readline()  # Empty line
+        nbr_edges = int(fileobj.readline().split(" ")[1])  # EDGES XXX
+        fileobj.readline()  # label src dest weight bw delay
+        for _ in range(nbr_edges):
+            label, src, dest, weight, bw, delay = fileobj.readline().strip().split(" ")  # Edge line
+            edges.append((label, int(src), int(dest), int(weight), int(bw), int(delay)))
+
+        try:
+            fileobj.readline()  # Empty line
+            nbr_changes = int(fileobj.readline().split(" ")[1])  # CHANGES XXX
+            fileobj.readline()  # time src dest weight bw delay
+            for _ in range(nbr_changes):
+                time, src, dest, weight, bw, delay, *other = fileobj.readline().strip().split(" ")  # Change line
+                changes.append((int(time), int(src), int(dest), int(weight), int(bw), int(delay), *other))
+
+            fileobj.readline()  # Empty line
+            stopping_time = int(fileobj.readline().split(" ")[1])  # STOP XXX
+        except IndexError:  # If the end of the file, there isn't any change
+            pass
+    return RepetitaGraph(nodes, edges, changes, stopping_time)
+
+
+def _cache_path(path, key):
+    digest = hashlib.sha1(repr((CACHE_VERSION,) + key).encode("utf-8")).hexdigest()
+    return os.path.join(CACHE_DIR, "%s_%s.pickle" % (os.path.basename(path), digest))
+
+
+def load_graph(path) -> RepetitaGraph:
+    """Return the parsed graph from the memory or disk cache if the file did not change"""
+    path = os.path.abspath(path)
+    stat = os.stat(path)
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    if key in _graphs:
+        return _graphs[key]
+
+    cache_path = _cache_path(path, key)
+    try:
+        with open(cache_path, "rb") as fileobj:
+            graph = pickle.load(fileobj)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        graph = parse_graph(path)
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            # Atomic replacement since several runners can share the cache
+            tmp_path = "%s.%d.tmp" % (cache_path, os.getpid())
+            with open(tmp_path, "wb") as fileobj:
+                pickle.dump(graph, fileobj, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+        except OSError as e:
+            print("Cannot cache the parsed graph %s: %s" % (path, e))
+
+    _graphs[key] = graph
+    return graph
+
+
+def index_directory(directory) -> Dict[str, List[str]]:
+    """Map each graph of the directory tree to the flow files of its directory whose name
+    contains the name of the graph (without extension)
+
+    The index is computed once by process.
+    """
+    key = os.path.abspath(directory)
+    if key in _catalogs:
+        return _catalogs[key]
+
+    catalog = {}
+    for root, _, files in os.walk(directory):
+        flows = sorted(f for f in files if ".flows" in f)
+        for f in sorted(files):
+            if ".graph" not in f:
+                continue
+            prefix = f.split(".")[0]
+            matching = [os.path.join(root, flow) for flow in flows if prefix in flow]
+            if len(matching) > 0:
+                catalog[os.path.join(root, f)] = matching
+    _catalogs[key] = catalog
+    return catalog
+
+
+def graph_flows(graph) -> List[str]:
+    """The flow files of the directory tree of the graph whose name contains the name of the graph
+
+    The flow files are looked up once by process.
+    """
+    graph = os.path.abspath(graph)
+    if graph not in _graph_flows:
+        prefix = os.path.basename(graph).split(".graph")[0]
+        flows = []
+        for root, _, files in os.walk(os.path.dirname(graph)):
+            flows.extend(os.path.join(root, f) for f in sorted(files) if ".flows" in f and prefix in f)
+        _graph_flows[graph] = flows
+    return _graph_flows[graph]
@@ -3,18 +3,20 @@ import string
 import subprocess
 import time
 from shlex import split
-from typing import Union, Optional, Tuple, List
+from typing import Callable, Union, Optional, Tuple, List
 
 from ipmininet.cli import IPCLI
 from ipmininet.router import IPNode
-from pyroute2 import IPRoute
 from srnmininet.srntopo import SRNTopo
 
 from eval.utils import MEASUREMENT_TIME
+from examples.repetita_catalog import load_graph
 from reroutemininet.config import Lighttpd
 from reroutemininet.host import ReroutingHostConfig
 from reroutemininet.link import RerouteIntf
 from reroutemininet.net import ReroutingNet
+from reroutemininet.netlink import netlink
+from reroutemininet.resources import registry
 from reroutemininet.topo import SRReroutedCtrlDomain
 
 MAX_QUEUE = 1000000000
@@ -78,6 +80,11 @@ class RepetitaEdge:
                 self.weight_dst, self.bw_dst, self.delay_dst)
 
 
+def _delay_us(delay: str) -> int:
+    """Convert a delay such as "10ms" to microseconds"""
+    return int(float(delay.rstrip("ms")) * 1000)
+
+
 class LinkChange:
 
     def __init__(self, topo: 'RepetitaTopo', time: Union[int, str], src: str, switch: str, dest: str,
@@ -104,7 +111,11 @@ class LinkChange:
                 topo.addLink("h" + self.src, self.src)
 
     def link_params(self, net: ReroutingNet) -> Tuple[IPNode, RerouteIntf, RerouteIntf]:
-        switch = net[self.switch]
+        """The destination, the interface whose netem emulates the delay towards it and its interface
+
+        Without intermediate switch (switch-free links), the netem is on the interface of the source.
+        """
+        switch = net[self.switch] if self.switch is not None else net[self.src]
         dest = net[self.dest]
         link = net.linksBetween(switch, dest)[0]
         if link.intf1.node == switch:
@@ -115,54 +126,74 @@ class LinkChange:
             dest_itf = link.intf1
         return dest, intf, dest_itf
 
-    def apply(self, net: ReroutingNet):
+    def netlink_request(self, net: ReroutingNet) -> Callable[[], None]:
+        """Resolve the interface of the change and return the netlink request applying it
 
-        if self.ddos:  # Start a iperf3 in UDP to emulate a DDoS on the link
-            dest = net["h" + self.dest]
-            self.pid_to_clean.append(dest.popen("iperf3 -s --one-off", stdout=subprocess.PIPE, stderr=subprocess.PIPE,
-                                                universal_newlines=True))
-            time.sleep(0.5)
-            cmd = f"iperf3 -u -c {dest.intf().ip6} -t {MEASUREMENT_TIME} -b {self.bw}M"
-            self.pid_to_clean.append(net["h" + self.src].popen(cmd, stdout=self.file,
-                                                               stderr=subprocess.STDOUT, universal_newlines=True))
-            self.applied_time = time.monotonic()
-            print("UDDDDDDDDDDDDDDDDDDDPPPPPPPPPPPPPPPPPPPPPPPPP")
+        The request is sent on the persistent socket of the namespace of the interface
+        (the root one if the netem is on a switch, the one of the source otherwise).
+        """
+        dest, intf, dest_itf = self.link_params(net)
+        sock = netlink.socket(intf.node)
+        dev = netlink.ifindex(intf)
+        if self.bw == 0:  # Loss of 100% if no bandwidth can pass => also blocks ICMPs
+            # TODO temporary
+            # ipr.tc("add", "netem", dev, parent="10:", handle="20:", delay=str(self.delay), loss=100, limit=1)
+            return lambda: sock.link("set", index=dev, state="down")
+        # TODO Too large queue
+        return lambda: sock.tc("change", "netem", dev, handle="10:", delay=str(self.delay * 1000), loss=0,
+                               limit=MAX_QUEUE)
+
+    def start_ddos(self, net: ReroutingNet):
+        """Start a iperf3 in UDP to emulate a DDoS on the link"""
+        dest = net["h" + self.dest]
+        self.pid_to_clean.append(registry.process(dest.popen("iperf3 -s --one-off", stdout=subprocess.PIPE,
+                                                             stderr=subprocess.PIPE, universal_newlines=True)))
+        time.sleep(0.5)
+        cmd = f"iperf3 -u -c {dest.intf().ip6} -t {MEASUREMENT_TIME} -b {self.bw}M"
+        self.pid_to_clean.append(registry.process(net["h" + self.src].popen(cmd, stdout=self.file,
+                                                                            stderr=subprocess.STDOUT,
+                                                                            universal_newlines=True)))
+        self.applied_time = time.monotonic()
+
+    def apply(self, net: ReroutingNet):
+        if self.ddos:
+            self.start_ddos(net)
         else:
-            dest, intf, dest_itf = self.link_params(net)
-            ipr = IPRoute()
-            if self.bw == 0:  # Loss of 100% if no bandwidth can pass => also blocks ICMPs
-                dev = ipr.link_lookup(ifname=intf.name)[0]
-                ipr.link("set", index=dev, state="down")  # TODO temporary
-                # ipr.tc("add", "netem", dev, parent="10:", handle="20:", delay=str(self.delay), loss=100, limit=1)
-                self.applied_time = time.monotonic()
-                print("KKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKK")
-                print(self.applied_time)
-                print("KKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKK")
-            else:
-                # Change netem
-                dev = ipr.link_lookup(ifname=intf.name)[0]
-                # TODO Too large queue
-                ipr.tc("change", "netem", dev, handle="10:", delay=str(self.delay * 1000), loss=0, limit=MAX_QUEUE)
-                print(f"DELAY CHANGED ON {intf.name} to {self.delay}")
-                self.applied_time = time.monotonic()
+            request = self.netlink_request(net)
+            self.applied_time = time.monotonic()
+            request()
+            print(f"LINK CHANGED TOWARDS {self.dest} to {self.bw} Mbps and {self.delay} ms")
 
     def revert(self, net: ReroutingNet):
-        print("GGGGGGGGGGGGGGGGGGGGGGGGGGGGGGGGGG")
+        if self.ddos:
+            self.clean()
+            return
         dest, intf, dest_itf = self.link_params(net)
+        sock = netlink.socket(intf.node)
+        dev = netlink.ifindex(intf)
+        if self.bw == 0:
+            sock.link("set", index=dev, state="up")  # TODO temporary
+            # TODO print(ipr.tc("delete", "netem", dev, parent="10:", handle="20:"))
+        elif self.switch is None:  # The netem of the interface is the root of its queue disciplines
+            sock.tc("change", "netem", dev, handle="10:", delay=str(_delay_us(intf.params["netem_delay"])),
+                    loss=0, limit=MAX_QUEUE)
+        else:
+            sock.tc("delete", "netem", dev, handle="10:")
+
+    def reset(self, net: ReroutingNet):
+        """Restore the link as it was before the change to apply it again later"""
         if self.ddos:
             self.clean()
+            self.pid_to_clean = []
         else:
-            ipr = IPRoute()
-            dev = ipr.link_lookup(ifname=intf.name)[0]
-            if self.bw == 0:
-                ipr.link("set", index=dev, state="up")  # TODO temporary
-                # TODO print(ipr.tc("delete", "netem", dev, parent="10:", handle="20:"))
-            else:
-                print(ipr.tc("delete", "netem", dev, handle="10:"))
-        print("GGGGGGGGGGGGGGGGGGGGGGGGGGGGGGGGGG")
+            dest, intf, dest_itf = self.link_params(net)
+            intf.config(**intf.params)  # Reinstall the initial queue disciplines
+            intf.cmd("ip link set dev {} up".format(intf.name))
+        self.applied_cmd = ""
+        self.applied_time = -1
 
     def clean(self):
-        self.file.close()  # TODO remove
+        self.file.flush()  # TODO remove (kept open as the change can be applied again on a warm network)
         for pid in self.pid_to_clean:
             if pid.poll() is None:
                 pid.kill()
@@ -201,7 +232,11 @@ class RepetitaTopo(SRNTopo):
 
     def __init__(self, repetita_graph=None, schema_tables=None,
                  rerouting_enabled=True, bw=None, ebpf=True, json_demands=(),
-                 localctrl_opts=None, enable_ecn=True, *args, **kwargs):
+                 localctrl_opts=None, enable_ecn=True, switch_free=False, *args, **kwargs):
+        """
+        :param switch_free: Whether the links are direct instead of going through an intermediate switch
+         (the delay is then emulated by a netem before the shaping on the same interface)
+        """
         self.repetita_graph = repetita_graph
         self.schema_tables = schema_tables
         self.rerouting_enabled = rerouting_enabled
@@ -215,6 +250,7 @@ class RepetitaTopo(SRNTopo):
         self.pending_changes = []
         self.applied_changes = []
         self.enable_ecn = enable_ecn
+        self.switch_free = switch_free
         self.stopping_time = -1
         super().__init__("controller", *args, **kwargs)
 
@@ -243,60 +279,36 @@ class RepetitaTopo(SRNTopo):
         node_index = []
         edge_dict = {}
         access_routers = []
-        with open(self.repetita_graph) as fileobj:
-            nbr_nodes = int(fileobj.readline().split(" ")[1])  # NODES XXX
-            fileobj.readline()  # label x y
-            for i in range(nbr_nodes):
-                label, _, _ = fileobj.readline().split(" ")  # Node line
-                router = self.addRouter(self.label2node(label))  # Interface names are at max 15 characters (NULL not included)
-                self.router_indices.append(self.label2node(label))  # Interface names are at max 15 characters (NULL not included)
-                for d in self.json_demands:  # Access routers only for flows
-                    if (d["src"] == i or d["dest"] == i) \
-                            and router not in access_routers:
-                        access_routers.append(router)
-                        break
-                node_index.append(router)
-            print(self.router_indices)
-
-            fileobj.readline()  # Empty line
-            nbr_edges = int(fileobj.readline().split(" ")[1])  # EDGES XXX
-            fileobj.readline()  # label src dest weight bw delay
-            for i in range(nbr_edges):
-                label, src, dest, weight, bw, delay = fileobj.readline().split(" ")  # Edge line
-                edge = RepetitaEdge(label, src, dest, weight, bw, delay)
-                if edge in edge_dict:
-                    edge_dict[edge].merge_directed_edge(edge)
-                else:
-                    edge_dict[edge] = edge
-
-            for edge in edge_dict.keys():
-                edge.add_to_topo(self, node_index)
-
-            try:
-                fileobj.readline()  # Empty line
-                # CHANGES XXX
-                nbr_changes = int(fileobj.readline().split(" ")[1])
-                fileobj.readline()  # time src dest weight bw delay
-                for i in range(nbr_changes):
-                    time, src, dest, weight, bw, delay, *other = \
-                        fileobj.readline().split(" ")  # Change line
-                    src = int(src)
-                    dest = int(dest)
-                    intermediate_switch = self.inter_switches[
-                        node_index[src]][node_index[dest]]
-                    change = LinkChange(self, time, node_index[src],
-                                        intermediate_switch,
-                                        node_index[dest], weight, bw, delay, *other)
-                    self.pending_changes.append(change)
-
-                # STOP XXX
-                fileobj.readline()  # Empty line
-                self.stopping_time = int(fileobj.readline().split(" ")[1])
-                print("KKKKKKKKKKKKKKKKKKKKKKKKKKKKKKKK ", self.stopping_time)
-            except IndexError:  # If the end of the file, there isn't any change
-                pass
-            except IOError:  # If the end of the file, there isn't any change
-                pass
+        graph = load_graph(self.repetita_graph)
+        for i, label in enumerate(graph.nodes):
+            router = self.addRouter(self.label2node(label))  # Interface names are at max 15 characters (NULL not included)
+            self.router_indices.append(self.label2node(label))  # Interface names are at max 15 characters (NULL not included)
+            for d in self.json_demands:  # Access routers only for flows
+                if (d["src"] == i or d["dest"] == i) \
+                        and router not in access_routers:
+                    access_routers.append(router)
+                    break
+            node_index.append(router)
+        print(self.router_indices)
+
+        for label, src, dest, weight, bw, delay in graph.edges:
+            edge = RepetitaEdge(label, src, dest, weight, bw, delay)
+            if edge in edge_dict:
+                edge_dict[edge].merge_directed_edge(edge)
+            else:
+                edge_dict[edge] = edge
+
+        for edge in edge_dict.keys():
+            edge.add_to_topo(self, node_index)
+
+        for change_time, src, dest, weight, bw, delay, *other in graph.changes:
+            intermediate_switch = self.inter_switches[
+                node_index[src]][node_index[dest]]
+            change = LinkChange(self, change_time, node_index[src],
+                                intermediate_switch,
+                                node_index[dest], weight, bw, delay, *other)
+            self.pending_changes.append(change)
+        self.stopping_time = graph.stopping_time
 
         self.pending_changes.sort()
 
@@ -322,6 +334,13 @@ class RepetitaTopo(SRNTopo):
 
         super().build(*args, **kwargs)
 
+    def reset_changes(self, net: ReroutingNet):
+        """Undo the applied changes so that they are pending again"""
+        for change in self.applied_changes:
+            change.reset(net)
+        self.pending_changes = sorted(self.pending_changes + self.applied_changes)
+        self.applied_changes = []
+
     def __str__(self):
         return "RepetitaNetwork %s" % os.path.basename(self.repetita_graph)
 
@@ -361,9 +380,21 @@ class RepetitaTopo(SRNTopo):
             # opts2["params2"]["delay"] = "5ms"
             # opts2["params2"]["max_queue_size"] = MAX_QUEUE
 
+            if self.switch_free:
+                default_params1.update({"netem_delay": src_delay, "netem_limit": MAX_QUEUE})
+                default_params2.update({"netem_delay": dst_delay, "netem_limit": MAX_QUEUE})
+                self.inter_switches.setdefault(node1, {})[node2] = None
+                self.inter_switches.setdefault(node2, {})[node1] = None
+                return super(SRNTopo, self).addLink(node1, node2, params1=default_params1, params2=default_params2,
+                                                    **{k: v for k, v in opts.items()
+                                                       if k not in ("params1", "params2")})
+
             opts1["params2"] = {"delay": dst_delay, "max_queue_size": MAX_QUEUE}
             opts2["params1"] = {"delay": src_delay, "max_queue_size": MAX_QUEUE}
 
+        elif self.switch_free:
+            return super(SRNTopo, self).addLink(node1, node2, **opts)
+
         # Netem queues might disturb shaping and ecn marking
         # Therefore, we put them on an intermediary switch
         self.switch_count += 1
@@ -0,0 +1,371 @@
+"""Management of the pinned eBPF objects without forking bpftool
+
+The operations needed by the sr-localctrl daemons (map ids of a pinned program,
+map information, pinning, cgroup attachment and map content) are done with
+direct bpf() system calls. A fake backend keeps the same state in memory to
+run the code without root privileges or eBPF support.
+"""
+import ctypes
+import errno
+import os
+import platform
+import struct
+from collections import namedtuple
+from typing import Callable, Dict, Iterable, List, Optional, Tuple
+
+# bpf() commands
+BPF_MAP_CREATE = 0
+BPF_MAP_LOOKUP_ELEM = 1
+BPF_MAP_UPDATE_ELEM = 2
+BPF_MAP_DELETE_ELEM = 3
+BPF_MAP_GET_NEXT_KEY = 4
+BPF_OBJ_PIN = 6
+BPF_OBJ_GET = 7
+BPF_PROG_ATTACH = 8
+BPF_PROG_DETACH = 9
+BPF_MAP_GET_FD_BY_ID = 14
+BPF_OBJ_GET_INFO_BY_FD = 15
+
+BPF_CGROUP_SOCK_OPS = 3
+BPF_F_ALLOW_MULTI = 2
+
+SYS_BPF = {"x86_64": 321, "aarch64": 280, "armv7l": 386, "i686": 357}
+
+# Names used by bpftool
+MAP_TYPES = {1: "hash", 2: "array", 3: "prog_array", 4: "perf_event_array", 5: "percpu_hash",
+             6: "percpu_array", 7: "stack_trace", 8: "cgroup_array", 9: "lru_hash", 10: "lru_percpu_hash"}
+
+ATTR_SIZE = 128  # Larger than all the attributes used, the unused bytes stay at 0
+PROG_INFO_SIZE = 80  # Up to the name of struct bpf_prog_info
+MAP_INFO_SIZE = 40  # Up to the name of struct bpf_map_info
+NAME_LENGTH = 16
+
+MapInfo = namedtuple("MapInfo", ["id", "name", "type", "key_size", "value_size", "max_entries"])
+BPFFailure = namedtuple("BPFFailure", ["node", "operation", "target", "error"])
+
+
+class BPFError(Exception):
+
+    def __init__(self, operation, target, err):
+        """
+        :param operation: The failing operation (e.g., 'pin')
+        :param target: The path or id of the object
+        :param err: The errno of the failure
+        """
+        super().__init__("Cannot %s %s: %s" % (operation, target, os.strerror(err)))
+        self.operation = operation
+        self.target = target
+        self.errno = err
+
+
+def possible_cpus():
+    """The number of possible CPUs, i.e., the number of values of per-cpu maps"""
+    with open("/sys/devices/system/cpu/possible") as fileobj:
+        count = 0
+        for cpu_range in fileobj.read().strip().split(","):
+            first, _, last = cpu_range.partition("-")
+            count += int(last or first) - int(first) + 1
+        return count
+
+
+class SyscallBackend:
+    """Backend calling bpf() directly"""
+
+    def __init__(self):
+        self.libc = ctypes.CDLL(None, use_errno=True)
+        self.nr_bpf = SYS_BPF[platform.machine()]
+        self._nbr_cpus = None
+
+    def _bpf(self, cmd, attr, operation, target):
+        ret = self.libc.syscall(self.nr_bpf, ctypes.c_int(cmd), attr, ctypes.c_uint(len(attr)))
+        if ret < 0:
+            raise BPFError(operation, target, ctypes.get_errno())
+        return ret
+
+    def _obj_get(self, path):
+        pathname = ctypes.create_string_buffer(path.encode("utf-8"))
+        attr = ctypes.create_string_buffer(ATTR_SIZE)
+        struct.pack_into("=Q", attr, 0, ctypes.addressof(pathname))
+        return self._bpf(BPF_OBJ_GET, attr, "open", path)
+
+    def _map_fd(self, map_id):
+        attr = ctypes.create_string_buffer(ATTR_SIZE)
+        struct.pack_into("=I", attr, 0, map_id)
+        return self._bpf(BPF_MAP_GET_FD_BY_ID, attr, "open map", map_id)
+
+    def _info(self, fd, info, target):
+        attr = ctypes.create_string_buffer(ATTR_SIZE)
+        struct.pack_into("=IIQ", attr, 0, fd, len(info), ctypes.addressof(info))
+        self._bpf(BPF_OBJ_GET_INFO_BY_FD, attr, "get the info of", target)
+
+    def value_size(self, info: MapInfo):
+        """The size of the values returned by map_items()"""
+        if "percpu" not in info.type:
+            return info.value_size
+        if self._nbr_cpus is None:
+            self._nbr_cpus = possible_cpus()
+        return ((info.value_size + 7) // 8 * 8) * self._nbr_cpus
+
+    def prog_map_ids(self, pin_path) -> List[int]:
+        fd = self._obj_get(pin_path)
+        try:
+            info = ctypes.create_string_buffer(PROG_INFO_SIZE)
+            self._info(fd, info, pin_path)
+            nr_map_ids, = struct.unpack_from("=I", info, 52)
+            if nr_map_ids == 0:
+                return []
+            map_ids = (ctypes.c_uint32 * nr_map_ids)()
+            info = ctypes.create_string_buffer(PROG_INFO_SIZE)
+            struct.pack_into("=IQ", info, 52, nr_map_ids, ctypes.addressof(map_ids))
+            self._info(fd, info, pin_path)
+            return list(map_ids)
+        finally:
+            os.close(fd)
+
+    def map_info(self, map_id) -> MapInfo:
+        fd = self._map_fd(map_id)
+        try:
+            info = ctypes.create_string_buffer(MAP_INFO_SIZE)
+            self._info(fd, info, map_id)
+        finally:
+            os.close(fd)
+        map_type, info_id, key_size, value_size, max_entries, _ = struct.unpack_from("=6I", info, 0)
+        name = info.raw[24:24 + NAME_LENGTH].split(b"\0", 1)[0].decode("utf-8")
+        return MapInfo(info_id, name, MAP_TYPES.get(map_type, str(map_type)), key_size, value_size, max_entries)
+
+    def _pin_fd(self, fd, path):
+        pathname = ctypes.create_string_buffer(path.encode("utf-8"))
+        attr = ctypes.create_string_buffer(ATTR_SIZE)
+        struct.pack_into("=QI", attr, 0, ctypes.addressof(pathname), fd)
+        self._bpf(BPF_OBJ_PIN, attr, "pin", path)
+
+    def pin_map(self, map_id, path):
+        fd = self._map_fd(map_id)
+        try:
+            self._pin_fd(fd, path)
+        finally:
+            os.close(fd)
+
+    def map_create(self, path, name, map_type, key_size, value_size, max_entries) -> MapInfo:
+        """Create a map and pin it at path (the map lives until it is unpinned)"""
+        types = {type_name: number for number, type_name in MAP_TYPES.items()}
+        attr = ctypes.create_string_buffer(ATTR_SIZE)
+        struct.pack_into("=4I", attr, 0, types[map_type], key_size, value_size, max_entries)
+        struct.pack_into("=%ds" % NAME_LENGTH, attr, 28, name.encode("utf-8")[:NAME_LENGTH - 1])
+        fd = self._bpf(BPF_MAP_CREATE, attr, "create the map", name)
+        try:
+            self._pin_fd(fd, path)
+            info = ctypes.create_string_buffer(MAP_INFO_SIZE)
+            self._info(fd, info, name)
+        finally:
+            os.close(fd)
+        return self.map_info(struct.unpack_from("=I", info, 4)[0])
+
+    def unpin(self, path):
+        try:
+            os.unlink(path)
+        except OSError as e:
+            raise BPFError("unpin", path, e.errno)
+
+    def _attach_cmd(self, cmd, operation, cgroup, prog_pin_path, attach_type, flags):
+        try:
+            cgroup_fd = os.open(cgroup, os.O_RDONLY | os.O_DIRECTORY)
+        except OSError as e:
+            raise BPFError(operation, cgroup, e.errno)
+        try:
+            prog_fd = self._obj_get(prog_pin_path)
+            try:
+                attr = ctypes.create_string_buffer(ATTR_SIZE)
+                struct.pack_into("=4I", attr, 0, cgroup_fd, prog_fd, attach_type, flags)
+                self._bpf(cmd, attr, operation, "%s to %s" % (prog_pin_path, cgroup))
+            finally:
+                os.close(prog_fd)
+        finally:
+            os.close(cgroup_fd)
+
+    def attach(self, cgroup, prog_pin_path, attach_type=BPF_CGROUP_SOCK_OPS, flags=BPF_F_ALLOW_MULTI):
+        self._attach_cmd(BPF_PROG_ATTACH, "attach", cgroup, prog_pin_path, attach_type, flags)
+
+    def detach(self, cgroup, prog_pin_path, attach_type=BPF_CGROUP_SOCK_OPS):
+        self._attach_cmd(BPF_PROG_DETACH, "detach", cgroup, prog_pin_path, attach_type, 0)
+
+    def _elem_cmd(self, cmd, operation, map_id, fd, key, value=None, flags=0):
+        attr = ctypes.create_string_buffer(ATTR_SIZE)
+        struct.pack_into("=IIQQQ", attr, 0, fd, 0, ctypes.addressof(key) if key is not None else 0,
+                         ctypes.addressof(value) if value is not None else 0, flags)
+        self._bpf(cmd, attr, operation, map_id)
+
+    def map_items(self, map_id) -> List[Tuple[bytes, bytes]]:
+        """All the (key, value) of the map, the values of per-cpu maps are concatenated
+        (each one is aligned on 8 bytes)"""
+        info = self.map_info(map_id)
+        fd = self._map_fd(map_id)
+        items = []
+        try:
+            key = None
+            next_key = ctypes.create_string_buffer(info.key_size)
+            value = ctypes.create_string_buffer(self.value_size(info))
+            while True:
+                try:
+                    self._elem_cmd(BPF_MAP_GET_NEXT_KEY, "iterate over the map", map_id, fd, key, next_key)
+                except BPFError as e:
+                    if e.errno == errno.ENOENT:  # End of the map
+                        break
+                    raise
+                try:
+                    self._elem_cmd(BPF_MAP_LOOKUP_ELEM, "lookup in the map", map_id, fd, next_key, value)
+                    items.append((next_key.raw, value.raw))
+                except BPFError as e:
+                    if e.errno != errno.ENOENT:  # Deleted in the meantime
+                        raise
+                key = ctypes.create_string_buffer(next_key.raw, info.key_size)
+        finally:
+            os.close(fd)
+        return items
+
+    def map_update(self, map_id, key: bytes, value: bytes):
+        fd = self._map_fd(map_id)
+        try:
+            self._elem_cmd(BPF_MAP_UPDATE_ELEM, "update the map", map_id, fd,
+                           ctypes.create_string_buffer(key, len(key)),
+                           ctypes.create_string_buffer(value, len(value)))
+        finally:
+            os.close(fd)
+
+    def map_delete(self, map_id, key: bytes):
+        fd = self._map_fd(map_id)
+        try:
+            self._elem_cmd(BPF_MAP_DELETE_ELEM, "delete from the map", map_id, fd,
+                           ctypes.create_string_buffer(key, len(key)))
+        finally:
+            os.close(fd)
+
+
+class FakeBackend:
+    """In-memory backend with the same interface as SyscallBackend
+
+    Programs and maps are declared with add_program() and the pins
+    are recorded without touching the file system.
+    """
+
+    def __init__(self):
+        self.programs: Dict[str, List[int]] = {}
+        self.maps: Dict[int, MapInfo] = {}
+        self.contents: Dict[int, Dict[bytes, bytes]] = {}
+        self.pins: Dict[str, int] = {}
+        self.attachments: Dict[str, List[Tuple[str, int]]] = {}
+        self._next_id = 1
+
+    def add_program(self, pin_path, maps: Iterable[Tuple[str, str, int, int, int]]):
+        """Declare a pinned program
+
+        :param maps: The (name, type, key_size, value_size, max_entries) of its maps
+        :return: The ids of the maps
+        """
+        map_ids = []
+        for name, map_type, key_size, value_size, max_entries in maps:
+            info = MapInfo(self._next_id, name, map_type, key_size, value_size, max_entries)
+            self.maps[info.id] = info
+            self.contents[info.id] = {}
+            if "array" in map_type:
+                self.contents[info.id] = {struct.pack("=I", i): bytes(value_size) for i in range(max_entries)}
+            map_ids.append(info.id)
+            self._next_id += 1
+        self.programs[pin_path] = map_ids
+        return map_ids
+
+    def _map(self, map_id) -> MapInfo:
+        if map_id not in self.maps:
+            raise BPFError("open map", map_id, errno.ENOENT)
+        return self.maps[map_id]
+
+    def prog_map_ids(self, pin_path) -> List[int]:
+        if pin_path not in self.programs:
+            raise BPFError("open", pin_path, errno.ENOENT)
+        return list(self.programs[pin_path])
+
+    def map_info(self, map_id) -> MapInfo:
+        return self._map(map_id)
+
+    def pin_map(self, map_id, path):
+        self._map(map_id)
+        if path in self.pins or path in self.programs:
+            raise BPFError("pin", path, errno.EEXIST)
+        self.pins[path] = map_id
+
+    def map_create(self, path, name, map_type, key_size, value_size, max_entries) -> MapInfo:
+        map_id, = self.add_program(path, [(name, map_type, key_size, value_size, max_entries)])
+        self.pins[path] = self.programs.pop(path)[0]
+        return self.maps[map_id]
+
+    def unpin(self, path):
+        if self.pins.pop(path, None) is None and self.programs.pop(path, None) is None:
+            raise BPFError("unpin", path, errno.ENOENT)
+
+    def attach(self, cgroup, prog_pin_path, attach_type=BPF_CGROUP_SOCK_OPS, flags=BPF_F_ALLOW_MULTI):
+        self.prog_map_ids(prog_pin_path)
+        attached = self.attachments.setdefault(cgroup, [])
+        if (prog_pin_path, attach_type) in attached:
+            raise BPFError("attach", "%s to %s" % (prog_pin_path, cgroup), errno.EEXIST)
+        attached.append((prog_pin_path, attach_type))
+
+    def detach(self, cgroup, prog_pin_path, attach_type=BPF_CGROUP_SOCK_OPS):
+        try:
+            self.attachments.get(cgroup, []).remove((prog_pin_path, attach_type))
+        except ValueError:
+            raise BPFError("detach", "%s to %s" % (prog_pin_path, cgroup), errno.ENOENT)
+
+    def map_items(self, map_id) -> List[Tuple[bytes, bytes]]:
+        self._map(map_id)
+        return list(self.contents[map_id].items())
+
+    def map_update(self, map_id, key: bytes, value: bytes):
+        info = self._map(map_id)
+        if len(key) != info.key_size or len(value) != info.value_size:
+            raise BPFError("update the map", map_id, errno.EINVAL)
+        self.contents[map_id][key] = value
+
+    def map_delete(self, map_id, key: bytes):
+        info = self._map(map_id)
+        if "array" in info.type:
+            raise BPFError("delete from the map", map_id, errno.EINVAL)
+        if self.contents[map_id].pop(key, None) is None:
+            raise BPFError("delete from the map", map_id, errno.ENOENT)
+
+    def value_size(self, info: MapInfo):
+        return info.value_size
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        _backend = FakeBackend() if os.environ.get("FAKE_BPF") else SyscallBackend()
+    return _backend
+
+
+def set_backend(backend):
+    """Replace the backend of the module (e.g., by a FakeBackend)"""
+    global _backend
+    _backend = backend
+
+
+def for_each_node(nodes: Iterable, operation: Callable, name: Optional[str] = None) -> List[BPFFailure]:
+    """Run the operation on every node without stopping at the first failure
+
+    :param nodes: The nodes given to the operation
+    :param operation: The function taking a node
+    :param name: The name of the operation in the failures
+    :return: The failures of the nodes
+    """
+    failures = []
+    for node in nodes:
+        try:
+            operation(node)
+        except BPFError as e:
+            failures.append(BPFFailure(str(node), e.operation, e.target, os.strerror(e.errno)))
+        except ValueError as e:
+            failures.append(BPFFailure(str(node), name or operation.__name__, None, str(e)))
+    return failures
@@ -0,0 +1,28 @@
+import os
+from typing import List
+
+CGROUP2_ROOT = "/sys/fs/cgroup/unified"
+
+# The shell joins the cgroup and is replaced by the command, so that the command
+# starts in the cgroup with the pid of the launched process. Unlike a preexec_fn
+# of subprocess, it keeps the fast vfork-based launch of the Python process.
+_JOIN_AND_EXEC = 'echo 0 > "$0/cgroup.procs" && exec "$@"'
+
+
+def in_cgroup(cmd: List[str], cgroup: str) -> List[str]:
+    """Wrap the command so that it joins the cgroup before it executes,
+    i.e., none of its sockets are created outside of the cgroup
+
+    :param cmd: The command and its arguments
+    :param cgroup: The path of the cgroup directory
+    """
+    return ["sh", "-c", _JOIN_AND_EXEC, os.path.normpath(cgroup)] + list(cmd)
+
+
+def current_cgroup(pid="self") -> str:
+    """The path of the cgroup v2 of the process"""
+    with open("/proc/%s/cgroup" % pid) as fileobj:
+        for line in fileobj:
+            if line.startswith("0::"):
+                return os.path.normpath(CGROUP2_ROOT + line[3:].strip())
+    raise ValueError("The process %s is not in the cgroup v2 hierarchy" % pid)
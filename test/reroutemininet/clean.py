@@ -3,6 +3,16 @@ import subprocess
 
 from ipmininet.clean import cleanup as ip_clean, killprocs
 from reroutemininet.config import SRLocalCtrl
+from reroutemininet.netlink import netlink
+from reroutemininet.resources import release_resources
+
+
+def teardown(net=None, level='info'):
+    """Release the resources recorded during the experiment and
+    fall back on the global cleanup if some of them are still there"""
+    netlink.close()  # The namespaces of its sockets are destroyed
+    if not release_resources(net):
+        cleanup(level=level)
 
 
 def cleanup(level='info'):
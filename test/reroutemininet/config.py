@@ -1,14 +1,14 @@
-import json
-import json
 import os
-import shlex
-import subprocess
 import time
 
 from ipmininet.host.config.base import HostDaemon
 from srnmininet.config.config import SRNDaemon, srn_template_lookup
 from srnmininet.srnrouter import mkdir_p
 
+from .bpf import get_backend
+from .resources import registry
+from .timing import timer
+
 __TEMPLATES_DIR = os.path.join(os.path.dirname(__file__), 'templates')
 srn_template_lookup.directories.append(__TEMPLATES_DIR)
 
@@ -28,6 +28,7 @@ class SRLocalCtrl(SRNDaemon):
     REVERSE_SRH_PROGRAM = os.path.join(os.environ["TPC_EBPF"], "ebpf_reverse_srh.o")
     USE_SECOND_PROGRAM = os.path.join(os.environ["TPC_EBPF"], "ebpf_use_second_path.o")
     TRACEROUTE = os.path.join(os.environ["TPC_EBPF"], "ebpf_traceroute.o")
+    RESETTABLE_MAP_TYPES = ("hash", "lru_hash", "percpu_hash", "lru_percpu_hash", "array", "percpu_array")
 
     def __init__(self, *args, template_lookup=srn_template_lookup, **kwargs):
         super().__init__(*args, template_lookup=template_lookup, **kwargs)
@@ -51,6 +52,17 @@ class SRLocalCtrl(SRNDaemon):
                 cls.EXP3_LOWEST_DELAY_EBPF_PROGRAM, cls.EXP3_LOWEST_COMPLETION_EBPF_PROGRAM, cls.REVERSE_SRH_PROGRAM,
                 cls.USE_SECOND_PROGRAM, cls.TRACEROUTE]
 
+    @classmethod
+    def used_programs(cls, opts):
+        """The programs attached by a daemon with these options
+
+        :param opts: The options of the daemon (missing ones take the default value)
+        """
+        programs = [opts.get("long_ebpf_program", cls.N_RTO_CHANGER_EBPF_PROGRAM),
+                    opts.get("short_ebpf_program", cls.EXP3_LOWEST_DELAY_EBPF_PROGRAM),
+                    opts.get("reverse_srh_ebpf_program", cls.REVERSE_SRH_PROGRAM)]
+        return list(dict.fromkeys(programs))
+
     def set_defaults(self, defaults):
         super().set_defaults(defaults)
         # defaults.loglevel = self.DEBUG  # TODO Remove
@@ -75,64 +87,30 @@ class SRLocalCtrl(SRNDaemon):
 
     def get_map_id(self, program):
         ebpf_load_path = self.ebpf_load_path(self._node.name, program)
-        cmd = "{bpftool} prog -j show pinned {ebpf_load_path}" \
-            .format(bpftool=self.options.bpftool,
-                    ebpf_load_path=ebpf_load_path)
-        print(cmd)
-        out = subprocess.check_output(shlex.split(cmd)).decode("utf-8")
-        try:
-            map_ids = json.loads(out)["map_ids"]
-        except (json.JSONDecodeError, KeyError) as e:
-            print("Cannot get the map ids of %s" % ebpf_load_path)
-            raise e
-
+        map_ids = get_backend().prog_map_ids(ebpf_load_path)
         if len(map_ids) == 0:
             raise ValueError("Cannot find the maps of %s" % ebpf_load_path)
         return map_ids
 
     def pin_maps(self):
+        backend = get_backend()
 
         map_ids = []
         map_ids.extend(self.get_map_id(self.options.long_ebpf_program))
-        print("HHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHH")
-        print(self.options.long_ebpf_program)
-        print(self.options.short_ebpf_program)
-        print(self.options.reverse_srh_ebpf_program)
-        print("HHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHHH")
         map_ids.extend(self.get_map_id(self.options.short_ebpf_program))
 
         # Pin maps to fds
         for map_id in map_ids:
-
-            cmd = "{bpftool} map -j show id {map_id}" \
-                .format(bpftool=self.options.bpftool, map_id=map_id)
-            print(cmd)
-            out = subprocess.check_output(shlex.split(cmd)).decode("utf-8")
-            try:
-                map_name = json.loads(out)["name"]
-            except (json.JSONDecodeError, KeyError) as e:
-                print("Cannot get the map ids")
-                raise e
+            map_name = backend.map_info(map_id).name
 
             # If the map is the destination map, pin it
             # The other map is an internal map for the eBPF program
             if map_name == "dest_map":
-                cmd = "{bpftool} map pin id {dest_map_id} {map_path}" \
-                    .format(bpftool=self.options.bpftool,
-                            dest_map_id=map_id,
-                            map_path=self.map_path("dest_map",
-                                                   self.options.long_ebpf_program))
-                print(cmd)
-                subprocess.check_call(shlex.split(cmd))
+                backend.pin_map(map_id, registry.pin(self.map_path("dest_map", self.options.long_ebpf_program)))
                 self.dest_map_id = map_id
             if map_name == "short_dest_map":
-                cmd = "{bpftool} map pin id {dest_map_id} {map_path}" \
-                    .format(bpftool=self.options.bpftool,
-                            dest_map_id=map_id,
-                            map_path=self.map_path("short_dest_map",
-                                                   self.options.short_ebpf_program))
-                print(cmd)
-                subprocess.check_call(shlex.split(cmd))
+                backend.pin_map(map_id, registry.pin(self.map_path("short_dest_map",
+                                                                   self.options.short_ebpf_program)))
                 self.short_dest_map_id = map_id
             if map_name == "stat_map":
                 self.stat_map_id = map_id
@@ -156,24 +134,16 @@ class SRLocalCtrl(SRNDaemon):
 
         time.sleep(1)
 
-        dest_map_id, short_dest_map_id = self.pin_maps()
+        with timer.span("localctrl_pin_maps", node=self._node.name):
+            dest_map_id, short_dest_map_id = self.pin_maps()
 
         # Create cgroup
-        for program in [self.options.long_ebpf_program, self.options.short_ebpf_program,
-                        self.options.reverse_srh_ebpf_program]:
-            mkdir_p(self.cgroup(program))
-
-            ebpf_load_path = self.ebpf_load_path(self._node.name,
-                                                 program)
-            cmd = "{bpftool} cgroup attach {cgroup} sock_ops" \
-                  " pinned {ebpf_load_path} multi" \
-                .format(bpftool=self.options.bpftool,
-                        cgroup=self.cgroup(program),
-                        ebpf_load_path=ebpf_load_path)
-            print(cmd)
-            subprocess.check_call(shlex.split(cmd))
-
-            self.attached[program] = True
+        with timer.span("localctrl_attach", node=self._node.name):
+            for program in [self.options.long_ebpf_program, self.options.short_ebpf_program,
+                            self.options.reverse_srh_ebpf_program]:
+                mkdir_p(registry.cgroup(self.cgroup(program)))
+                get_backend().attach(self.cgroup(program), self.ebpf_load_path(self._node.name, program))
+                self.attached[program] = True
 
         # Fill config template
 
@@ -183,18 +153,37 @@ class SRLocalCtrl(SRNDaemon):
 
         return cfg_content
 
+    def reset_maps(self):
+        """Empty the maps of the loaded programs to reuse them in another experiment.
+        The destination maps are kept because they are filled by the daemon."""
+        backend = get_backend()
+        map_ids = set()
+        for program in [self.options.long_ebpf_program, self.options.short_ebpf_program,
+                        self.options.reverse_srh_ebpf_program]:
+            map_ids.update(self.get_map_id(program))
+
+        for map_id in map_ids:
+            info = backend.map_info(map_id)
+            # Global variables of the programs (.data, .rodata, .bss) are not per-flow state
+            if info.name in ("dest_map", "short_dest_map") or "." in info.name:
+                continue
+            if info.type not in self.RESETTABLE_MAP_TYPES:
+                continue
+
+            zero_value = bytes(backend.value_size(info))
+            for key, value in backend.map_items(map_id):
+                if "array" in info.type:  # Array entries cannot be deleted
+                    if value != zero_value:
+                        backend.map_update(map_id, key, zero_value)
+                else:
+                    backend.map_delete(map_id, key)
+
     def cleanup(self):
-        detach_cmd = "{bpftool} cgroup detach {cgroup} sock_ops" \
-                     " pinned {ebpf_load_path} multi"
         for program in [self.options.long_ebpf_program, self.options.short_ebpf_program,
                         self.options.reverse_srh_ebpf_program]:
             if self.attached[program]:
-                ebpf_load_path = self.ebpf_load_path(self._node.name, program)
-                cmd = detach_cmd.format(bpftool=self.options.bpftool,
-                                        cgroup=self.cgroup(program),
-                                        ebpf_load_path=ebpf_load_path)
-                print(detach_cmd)
-                subprocess.check_call(shlex.split(cmd))
+                get_backend().detach(self.cgroup(program), self.ebpf_load_path(self._node.name, program))
+                self.attached[program] = False
 
         super().cleanup()
 
@@ -0,0 +1,243 @@
+"""Placement of the processes of an experiment on disjoint sets of CPUs
+
+The processes are split in classes (the Python controller, the daemons of
+the nodes, the capture tools and the traffic generators) and each class is
+restricted to its own CPUs so that a loaded class does not steal the CPU
+time of the others. The placement uses the cpuset controller of cgroup v2
+and falls back on the CPU affinity of the processes if it is not available
+(e.g., if cpuset is bound to the cgroup v1 hierarchy).
+
+The traffic generators run in the cgroups of the eBPF programs, so these
+cgroups are restricted instead of moving the processes out of them.
+"""
+import os
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+from mininet.log import lg
+
+from .cgroup import CGROUP2_ROOT, current_cgroup
+from .resources import registry
+
+CONTROLLER = "controller"
+DAEMONS = "daemons"
+CAPTURE = "capture"
+TRAFFIC = "traffic"
+CPU_CLASSES = (CONTROLLER, DAEMONS, CAPTURE, TRAFFIC)
+MIN_ISOLATED_CPUS = 4  # Below, the automatic policy does not isolate the classes
+BUSY_WARNING = 0.9  # Busy fraction of the CPUs of a class above which it is contended
+
+
+def parse_cpus(cpus: str) -> List[int]:
+    """Parse a CPU list such as "0-2,5" """
+    parsed = []
+    for part in cpus.split(","):
+        part = part.strip()
+        if len(part) == 0:
+            continue
+        first, _, last = part.partition("-")
+        parsed.extend(range(int(first), int(last or first) + 1))
+    return sorted(set(parsed))
+
+
+def format_cpus(cpus) -> str:
+    """Format a list of CPUs such as [0, 1, 2, 5] into "0-2,5" """
+    ranges = []
+    for cpu in sorted(set(cpus)):
+        if len(ranges) > 0 and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ",".join(str(first) if first == last else "%d-%d" % (first, last) for first, last in ranges)
+
+
+def automatic_policy(cpus=None) -> Dict[str, List[int]]:
+    """The first CPU is kept for the controller, the next quarter is shared by
+    the daemons and the capture tools and the traffic generators get the rest
+
+    :param cpus: The CPUs to split (by default, the ones the controller can use)
+    """
+    cpus = sorted(os.sched_getaffinity(0) if cpus is None else cpus)
+    if len(cpus) < MIN_ISOLATED_CPUS:
+        return {}
+    nbr_daemons = max(1, len(cpus) // 4)
+    return {CONTROLLER: cpus[:1],
+            DAEMONS: cpus[1:1 + nbr_daemons],
+            CAPTURE: cpus[1:1 + nbr_daemons],
+            TRAFFIC: cpus[1 + nbr_daemons:]}
+
+
+def parse_policy(specs: List[str]) -> Dict[str, List[int]]:
+    """Parse a policy given as ["auto"] or as a list of "<class>=<CPU list>"
+    (the classes that are not listed are not restricted)"""
+    if specs == ["auto"]:
+        return automatic_policy()
+    policy = {}
+    for spec in specs:
+        cpu_class, _, cpus = spec.partition("=")
+        if cpu_class not in CPU_CLASSES or len(cpus) == 0:
+            raise ValueError("Invalid CPU placement '%s', expected <class>=<CPU list> with a class among %s"
+                             % (spec, ", ".join(CPU_CLASSES)))
+        policy[cpu_class] = parse_cpus(cpus)
+    return policy
+
+
+def cpu_times() -> Dict[int, tuple]:
+    """The (busy, total) times of each CPU in clock ticks"""
+    times = {}
+    with open("/proc/stat") as fileobj:
+        for line in fileobj:
+            if not line.startswith("cpu") or line.startswith("cpu "):
+                continue
+            name, *values = line.split()
+            values = [int(v) for v in values]
+            idle = values[3] + values[4]  # idle + iowait
+            times[int(name[3:])] = (sum(values[:8]) - idle, sum(values[:8]))
+    return times
+
+
+def cpu_stall() -> float:
+    """The total time in µs during which a task waited for a CPU (-1 if not available)"""
+    try:
+        with open("/proc/pressure/cpu") as fileobj:
+            for line in fileobj:
+                if line.startswith("some"):
+                    return float(line.split("total=")[1])
+    except (OSError, IndexError, ValueError):
+        pass
+    return -1
+
+
+class CPUPlacement:
+    """Restrict each class of processes to the CPUs of a policy
+
+    The placement does nothing until a policy is configured.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.policy: Dict[str, List[int]] = {}
+        self.mechanism = None  # "cgroup" or "affinity" once configured
+        self._controller_affinity = None
+
+    @property
+    def enabled(self):
+        return len(self.policy) > 0
+
+    def configure(self, policy: Dict[str, List[int]]):
+        """Set the policy and choose the mechanism enforcing it
+
+        :param policy: The CPUs of each class (see parse_policy)
+        """
+        self.policy = {cpu_class: list(cpus) for cpu_class, cpus in policy.items()}
+        if not self.enabled:
+            self.mechanism = None
+            return
+        self.mechanism = "cgroup" if self._enable_cpuset() else "affinity"
+        lg.info("*** CPU placement with %s: %s\n" % (self.mechanism, ", ".join(
+            "%s on %s" % (cpu_class, format_cpus(cpus)) for cpu_class, cpus in self.policy.items())))
+
+    @staticmethod
+    def _enable_cpuset():
+        try:
+            with open(os.path.join(CGROUP2_ROOT, "cgroup.controllers")) as fileobj:
+                if "cpuset" not in fileobj.read().split():
+                    return False
+            with open(os.path.join(CGROUP2_ROOT, "cgroup.subtree_control"), "w") as fileobj:
+                fileobj.write("+cpuset")
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def _write(path, value):
+        with open(path, "w") as fileobj:
+            fileobj.write(value)
+
+    def _class_cgroup(self, cpu_class):
+        path = os.path.join(CGROUP2_ROOT, "rerouting_%s.slice" % cpu_class)
+        with self._lock:
+            if not os.path.exists(path):
+                os.mkdir(registry.cgroup(path))
+                self.restrict_cgroup(path, cpu_class)
+        return path
+
+    def restrict_cgroup(self, path, cpu_class):
+        """Restrict the processes of a cgroup to the CPUs of the class"""
+        if self.mechanism != "cgroup" or cpu_class not in self.policy:
+            return
+        try:
+            self._write(os.path.join(path, "cpuset.cpus"), format_cpus(self.policy[cpu_class]))
+        except OSError as e:
+            lg.warning("Cannot restrict the CPUs of the cgroup %s: %s\n" % (path, e))
+
+    def place(self, cpu_class, pid):
+        """Restrict a process (and its future children) to the CPUs of the class"""
+        if cpu_class not in self.policy:
+            return
+        try:
+            if self.mechanism == "cgroup":
+                cgroup = current_cgroup(pid)
+                if cgroup in {os.path.normpath(path) for path in registry.cgroups}:
+                    self.restrict_cgroup(cgroup, cpu_class)  # Keep it in its eBPF cgroup
+                else:
+                    self._write(os.path.join(self._class_cgroup(cpu_class), "cgroup.procs"), str(pid))
+            else:
+                os.sched_setaffinity(pid, self.policy[cpu_class])
+        except (OSError, ValueError) as e:  # E.g., the process already exited
+            lg.warning("Cannot place the process %d on the %s CPUs: %s\n" % (pid, cpu_class, e))
+
+    def pin_controller(self):
+        """Restrict the threads of this Python process to the CPUs of the controller"""
+        if CONTROLLER not in self.policy:
+            return
+        self._controller_affinity = os.sched_getaffinity(0)
+        for tid in os.listdir("/proc/self/task"):
+            try:
+                os.sched_setaffinity(int(tid), self.policy[CONTROLLER])
+            except OSError:
+                pass  # The thread exited
+
+    def unpin_controller(self):
+        if self._controller_affinity is None:
+            return
+        for tid in os.listdir("/proc/self/task"):
+            try:
+                os.sched_setaffinity(int(tid), self._controller_affinity)
+            except OSError:
+                pass
+        self._controller_affinity = None
+
+    @staticmethod
+    def sample():
+        """The counters compared by contention()"""
+        return cpu_times(), cpu_stall()
+
+    def contention(self, before, after, duration) -> dict:
+        """The CPU contention between two samples
+
+        :param duration: The time between the samples in seconds
+        :return: a dict with the placement, the busy fraction of the CPUs of each class (or of all
+         the CPUs without placement), the fraction of time during which a task waited for a CPU
+         and whether a class was contended
+        """
+        (times_before, stall_before), (times_after, stall_after) = before, after
+
+        def busy(cpus):
+            busy_time = sum(times_after[cpu][0] - times_before[cpu][0] for cpu in cpus if cpu in times_after)
+            total_time = sum(times_after[cpu][1] - times_before[cpu][1] for cpu in cpus if cpu in times_after)
+            return busy_time / total_time if total_time > 0 else 0
+
+        classes = self.policy if self.enabled else {"all": sorted(times_after)}
+        busy_by_class = OrderedDict((cpu_class, busy(cpus)) for cpu_class, cpus in classes.items())
+        return {"mechanism": self.mechanism,
+                "policy": {cpu_class: format_cpus(cpus) for cpu_class, cpus in self.policy.items()},
+                "busy": busy_by_class,
+                "busy_all": busy(sorted(times_after)),
+                "stall": (stall_after - stall_before) / (duration * 10 ** 6)
+                if stall_before >= 0 and duration > 0 else None,
+                "contended": any(b > BUSY_WARNING for b in busy_by_class.values())}
+
+
+placement = CPUPlacement()
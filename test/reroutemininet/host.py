@@ -1,11 +1,14 @@
 import os
-import subprocess
+from shlex import split
 
 from ipmininet.host.config import HostConfig
 from ipmininet.router import ProcessHelper
 from srnmininet.srnhost import SRNHost
 
+from .cgroup import in_cgroup
 from .config import SRLocalCtrl
+from .cpus import placement, TRAFFIC
+from .resources import registry
 
 
 class ReroutingHostConfig(HostConfig):
@@ -46,6 +49,7 @@ class ReroutingHost(SRNHost):
             .__init__(name, process_manager=CGroupProcessHelper, *args,
                       **kwargs)
         os.makedirs(self.cwd, exist_ok=True)
+        registry.namespace(self)
 
     @property
     def sr_controller(self):
@@ -54,19 +58,20 @@ class ReroutingHost(SRNHost):
     def run_cgroup(self, cmd, cgroup=None, program=None, **kwargs):
         """
         Run asynchronously the command cmd in a cgroup
+
+        The child joins the cgroup before executing the command
+        so that all its connections go through the attached programs.
         """
-        if isinstance(cmd, list):
-            cmd = " ".join(cmd)
+        if not isinstance(cmd, list):
+            cmd = split(cmd)
         program = SRLocalCtrl.N_RTO_CHANGER_EBPF_PROGRAM if program is None else program
-        print("Running '%s' in eBPF" % cmd)
-        popen = self.popen(["bash"], stdin=subprocess.PIPE, **kwargs)
-        # time.sleep(1)
+        print("Running '%s' in eBPF" % " ".join(cmd))
 
         if cgroup is None:
             cgroup = self.nconfig.daemon(SRLocalCtrl).cgroup(program)
-        os.system('echo %d > %s/cgroup.procs' % (popen.pid, cgroup))
-        # time.sleep(1)
-
-        popen.stdin.write(cmd.encode("utf-8"))
-        popen.stdin.close()
+        # Restrict the cgroup itself: moving the pid could race with the child joining it
+        placement.restrict_cgroup(cgroup, TRAFFIC)
+        popen = registry.process(self.popen(in_cgroup(cmd, cgroup), **kwargs))
+        if placement.mechanism != "cgroup":
+            placement.place(TRAFFIC, popen.pid)
         return popen
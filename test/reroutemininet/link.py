@@ -1,6 +1,8 @@
 from mininet.log import lg
 from srnmininet.link import SRNIntf
 
+from .resources import registry
+
 
 class RerouteIntf(SRNIntf):
 
@@ -24,6 +26,9 @@ class RerouteIntf(SRNIntf):
         # (useful to disable for apache benchmark measurements)
         self.cmd("sysctl net.ipv4.tcp_no_metrics_save=1")
         # self.cmd("ip link set {} mtu 1280".format(self.name))
+        if kwargs.get("bw") is not None or kwargs.get("delay") is not None \
+                or kwargs.get("netem_delay") is not None:
+            registry.qdisc(self.node, self.name)
         return r
 
     def bwCmds(self, bw=None, speedup=0, use_hfsc=False, use_tbf=False,
@@ -34,6 +39,13 @@ class RerouteIntf(SRNIntf):
 
         cmds, parent = [], ' root '
 
+        # Without intermediate switch, the delay is emulated before the shaping
+        # so that the netem queue does not disturb the shaping and the ECN marking
+        if self.params.get("netem_delay") is not None:
+            cmds += ['%s qdisc add dev %s root handle 10: netem delay {delay} limit {limit}'
+                     .format(delay=self.params["netem_delay"], limit=self.params.get("netem_limit", 1000))]
+            parent = ' parent 10:1 '
+
         if bw and bw <= 0:
             lg.error('Bandwidth limit', bw,
                      'is outside supported range ]0,inf[ - ignoring\n')
@@ -1,6 +1,7 @@
 from ipmininet.utils import realIntfList
 from srnmininet.srnnet import SRNNet
 
+from .cpus import placement, DAEMONS
 from .host import ReroutingHost
 from .link import RerouteIntf
 from .router import ReroutingRouter, ReroutingConfig
@@ -24,6 +25,12 @@ class ReroutingNet(SRNNet):
     def start(self):
         super().start()
 
+        # The daemons of the nodes are placed once they are all started
+        if placement.enabled:
+            for n in self.routers + self.hosts:
+                for popen in n._processes._processes.values():
+                    placement.place(DAEMONS, popen.pid)
+
         # TODO Reduce MSS for eBPF SRv6 tests, fix in the future !
         for h in self.hosts:
             if 'defaultRoute' in h.params:
@@ -0,0 +1,52 @@
+import threading
+
+from pyroute2 import IPRoute, NetNS
+
+
+class NetlinkSockets:
+    """Persistent netlink sockets to change the links of the network
+
+    A socket is opened on first use for each network namespace (the root one
+    for the nodes that are not in a namespace) and kept until close(), and
+    the interface indexes are looked up once by socket.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._sockets = {}  # pid of the namespace or None for the root one -> IPRoute or NetNS
+        self._indexes = {}  # (pid or None, interface name) -> interface index
+
+    @staticmethod
+    def _key(node):
+        return node.pid if node is not None and node.inNamespace else None
+
+    def socket(self, node=None):
+        """Return the socket of the namespace of the node
+
+        :param node: The mininet node or None for the root namespace
+        """
+        key = self._key(node)
+        with self._lock:
+            if key not in self._sockets:
+                self._sockets[key] = IPRoute() if key is None else NetNS("/proc/%d/ns/net" % key)
+            return self._sockets[key]
+
+    def ifindex(self, intf) -> int:
+        """Return the index of the interface in the namespace of its node"""
+        key = (self._key(intf.node), intf.name)
+        index = self._indexes.get(key)
+        if index is None:
+            index = self.socket(intf.node).link_lookup(ifname=intf.name)[0]
+            self._indexes[key] = index
+        return index
+
+    def close(self):
+        """Close the sockets, e.g., when the namespaces are destroyed"""
+        with self._lock:
+            for sock in self._sockets.values():
+                sock.close()
+            self._sockets.clear()
+            self._indexes.clear()
+
+
+netlink = NetlinkSockets()
@@ -0,0 +1,140 @@
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List
+
+from mininet.log import lg
+
+RELEASE_WORKERS = 16
+PROCESS_KILL_TIMEOUT = 5
+# In the order of release
+RESOURCE_KINDS = ("process", "qdisc", "namespace", "pin", "cgroup")
+
+ResourceFailure = namedtuple("ResourceFailure", ["kind", "resource", "error"])
+
+
+class ResourceRegistry:
+    """Record the resources created by an experiment to release exactly them
+
+    The resources are released by kind in an order that respects their
+    dependencies (e.g., a cgroup can only be removed once its processes
+    are dead) but all the resources of a kind are released concurrently.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.processes: List[subprocess.Popen] = []
+        self.namespaces = []  # Mininet nodes owning a network namespace
+        self.qdiscs = []  # (node, interface name)
+        self.pins: List[str] = []
+        self.cgroups: List[str] = []
+
+    def _add(self, resources, resource):
+        with self._lock:
+            if resource not in resources:
+                resources.append(resource)
+        return resource
+
+    def process(self, popen: subprocess.Popen) -> subprocess.Popen:
+        return self._add(self.processes, popen)
+
+    def namespace(self, node):
+        return self._add(self.namespaces, node)
+
+    def qdisc(self, node, intf_name):
+        return self._add(self.qdiscs, (node, intf_name))
+
+    def pin(self, path: str) -> str:
+        return self._add(self.pins, path)
+
+    def cgroup(self, path: str) -> str:
+        return self._add(self.cgroups, path)
+
+    def __len__(self):
+        return len(self.processes) + len(self.namespaces) + len(self.qdiscs) + len(self.pins) + len(self.cgroups)
+
+    @staticmethod
+    def _release_process(popen: subprocess.Popen):
+        if popen.poll() is None:
+            try:
+                # Processes launched in the nodes lead their own process group,
+                # this also kills the commands that they run
+                os.killpg(popen.pid, signal.SIGKILL)
+            except (ProcessLookupError, PermissionError):
+                popen.kill()
+            popen.wait(PROCESS_KILL_TIMEOUT)
+
+    @staticmethod
+    def _release_namespace(node):
+        if node.shell is not None and node.shell.poll() is None:
+            node.terminate()
+
+    @staticmethod
+    def _release_qdisc(qdisc):
+        node, intf_name = qdisc
+        if node.shell is None or node.shell.poll() is not None:
+            return  # The interface disappeared with the namespace
+        node.cmd("tc qdisc del dev %s root" % intf_name)
+
+    @staticmethod
+    def _release_pin(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def _release_cgroup(path):
+        try:
+            os.rmdir(path)
+        except FileNotFoundError:
+            pass
+
+    def release(self, kinds=RESOURCE_KINDS) -> List[ResourceFailure]:
+        """Release the recorded resources and forget them
+
+        :param kinds: The kinds of resources to release
+        :return: The resources that could not be released
+        """
+        stages = []
+        with self._lock:
+            for kind in RESOURCE_KINDS:
+                if kind in kinds:
+                    attribute = "processes" if kind == "process" else kind + "s"
+                    stages.append((kind, getattr(self, "_release_" + kind), getattr(self, attribute)))
+                    setattr(self, attribute, [])
+
+        failures = []
+        with ThreadPoolExecutor(max_workers=RELEASE_WORKERS) as executor:
+            for kind, release, resources in stages:
+                futures = [(resource, executor.submit(release, resource)) for resource in resources]
+                for resource, future in futures:
+                    try:
+                        future.result()
+                    except (OSError, subprocess.SubprocessError) as e:
+                        failures.append(ResourceFailure(kind, resource, str(e)))
+        return failures
+
+
+registry = ResourceRegistry()
+
+
+def release_resources(net=None) -> bool:
+    """Stop the network and release the resources of the registry
+
+    :param net: The network to stop (if any)
+    :return: True iff all the resources were released
+    """
+    start = time.time()
+    nbr_resources = len(registry)
+    if net is not None:
+        net.stop()
+    failures = registry.release()
+    for failure in failures:
+        lg.error("Cannot release the %s %s: %s\n" % failure)
+    lg.info("%d resources released in %.2f seconds\n" % (nbr_resources, time.time() - start))
+    return len(failures) == 0
@@ -2,6 +2,8 @@ from ipmininet.router.config import RouterConfig
 from ipmininet.router.config.ospf6 import OSPF6RedistributedRoute
 from srnmininet.srnrouter import SRNRouter
 
+from .resources import registry
+
 
 class ReroutingConfig(RouterConfig):
 
@@ -44,6 +46,7 @@ class ReroutingRouter(SRNRouter):
 
     def __init__(self, name, config=ReroutingConfig, *args, **kwargs):
         super().__init__(name, config=config, *args, **kwargs)
+        registry.namespace(self)
 
     @property
     def maxseg(self):
@@ -0,0 +1,63 @@
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from typing import List
+
+# start is the time.time() at the beginning of the span, duration is in seconds,
+# parent is the phase of the enclosing span and node the name of the node concerned (if any)
+Span = namedtuple("Span", ["phase", "parent", "node", "start", "duration"])
+
+
+class PhaseTimer:
+    """Record the wall time spent in each phase of an experiment
+
+        with timer.span("start"):
+            net.start()
+
+    Spans can be nested (e.g., the eBPF load while the network is built).
+    A span opened in a worker thread outside any span of this thread is
+    nested in the innermost span of the main thread. The spans are kept
+    until they are collected.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._open = {}  # Phases of the open spans by thread identifier
+        self.spans: List[Span] = []
+
+    def _parent(self):
+        stack = self._open.get(threading.get_ident()) or self._open.get(threading.main_thread().ident)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def span(self, phase: str, node=None):
+        """Time the code of the block
+
+        :param phase: The name of the phase
+        :param node: The name of the node concerned (None for the whole network)
+        """
+        with self._lock:
+            parent = self._parent()
+            self._open.setdefault(threading.get_ident(), []).append(phase)
+        start = time.time()
+        origin = time.monotonic()
+        try:
+            yield
+        finally:
+            duration = time.monotonic() - origin
+            with self._lock:
+                stack = self._open[threading.get_ident()]
+                stack.pop()
+                if len(stack) == 0:
+                    del self._open[threading.get_ident()]
+                self.spans.append(Span(phase, parent, node, start, duration))
+
+    def collect(self) -> List[Span]:
+        """Return the spans recorded since the last call and forget them"""
+        with self._lock:
+            spans, self.spans = self.spans, []
+        return spans
+
+
+timer = PhaseTimer()
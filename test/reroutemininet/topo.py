@@ -1,16 +1,42 @@
+import hashlib
+import re
 import shlex
 import subprocess
+import time
 
 from srnmininet.config.config import SRCtrlDomain
 
 from .config import SRLocalCtrl
 from .host import ReroutingHostConfig
+from .resources import registry
 from .router import ReroutingConfig
+from .timing import timer
 
 SIMULTANEOUS_LOADS = 1
 # 1 means sequential but you may want to put it if
 # you don't have much memory on your computer
 
+# Hashes of the eBPF objects already rejected by the verifier
+# (they are not loaded again on the other hosts or in later experiments)
+_rejected_objects = set()
+
+# What libbpf prints when bpf(BPF_PROG_LOAD) fails because of the verifier:
+# EACCES or EINVAL followed by the verifier log (the wording changed across versions)
+VERIFIER_ERROR = re.compile(rb"(?:load bpf program failed|BPF program load failed): "
+                            rb"(?:Permission denied|Invalid argument)")
+VERIFIER_LOG = re.compile(rb"-- BEGIN (?:DUMP LOG|PROG LOAD LOG) --")
+
+
+def object_hash(path):
+    with open(path, "rb") as fileobj:
+        return hashlib.sha256(fileobj.read()).hexdigest()
+
+
+def rejected_by_verifier(stderr: bytes) -> bool:
+    """Whether the output of 'bpftool prog load' shows a rejection of the verifier
+    (and not, e.g., a lack of permission or of memory)"""
+    return VERIFIER_ERROR.search(stderr) is not None and VERIFIER_LOG.search(stderr) is not None
+
 
 class SRReroutedCtrlDomain(SRCtrlDomain):
 
@@ -38,7 +64,24 @@ class SRReroutedCtrlDomain(SRCtrlDomain):
         self.rerouted_opts = rerouted_opts if rerouted_opts is not None else {}
         self.localctrl_opts = localctrl_opts if localctrl_opts is not None else {}
 
+    def programs(self):
+        """The eBPF programs that the sr-localctrl daemons attach
+
+        Each program has maps holding per-host state (e.g., the paths to the destinations),
+        so it cannot be shared between hosts but the programs that are never attached
+        do not need to be loaded.
+        """
+        return SRLocalCtrl.used_programs(self.localctrl_opts)
+
     def load_bpf_programs(self):
+        programs = self.programs()
+        hashes = {program: object_hash(program) for program in programs}
+        for program in programs:
+            if hashes[program] in _rejected_objects:
+                print("ERROR the eBPF program %s was already rejected by the verifier" % program)
+                return False
+
+        start = time.time()
         hosts = []  # list of list of host to load program concurrently
         for i in range(len(self.hosts)):
             if i % SIMULTANEOUS_LOADS == 0:
@@ -51,18 +94,22 @@ class SRReroutedCtrlDomain(SRCtrlDomain):
             processes = []
             for h in h_list:
                 # Load eBPF program
-                for program in SRLocalCtrl.all_programs():
+                for program in programs:
                     cmd = "{bpftool} prog load {ebpf_program} {ebpf_load_path}" \
                           " type sockops" \
                         .format(bpftool=SRLocalCtrl.BPFTOOL,
                                 ebpf_program=program,
-                                ebpf_load_path=SRLocalCtrl.ebpf_load_path(h, program))
+                                ebpf_load_path=registry.pin(SRLocalCtrl.ebpf_load_path(h, program)))
                     print(h + " " + cmd)
-                    processes.append((cmd, subprocess.Popen(shlex.split(cmd),
-                                                            stdout=subprocess.PIPE,
-                                                            stderr=subprocess.PIPE)))
-
-            for cmd, p in processes:
+                    processes.append((program, cmd, subprocess.Popen(shlex.split(cmd),
+                                                                     stdout=subprocess.PIPE,
+                                                                     stderr=subprocess.PIPE)))
+
+            for program, cmd, p in processes:
+                if failed:  # Do not wait for the other loads
+                    p.kill()
+                    p.wait()
+                    continue
                 stdout, stderr = p.communicate()
                 p.poll()
                 if stdout is not None:
@@ -71,12 +118,14 @@ class SRReroutedCtrlDomain(SRCtrlDomain):
                     print(stderr.decode("utf-8"))
                 if p.returncode != 0:
                     print("ERROR %d while loading the eBPF program ran with %s" % (p.returncode, cmd))
+                    if stderr is not None and rejected_by_verifier(stderr):
+                        _rejected_objects.add(hashes[program])
                     failed = True
-                    break
             if failed:
                 break
 
-        subprocess.call(shlex.split("pkill -9 bpftool"))
+        print("%d eBPF programs loaded on %d hosts in %.1f seconds"
+              % (len(programs), len(self.hosts), time.time() - start))
         return not failed
 
     def apply(self, topo):
@@ -95,7 +144,9 @@ class SRReroutedCtrlDomain(SRCtrlDomain):
 
         # Load the program concurrently as many times as needed
         # because the verification is a slow process
-        if not self.load_bpf_programs():
+        with timer.span("ebpf_load"):
+            loaded = self.load_bpf_programs()
+        if not loaded:
             raise ValueError("eBPF programs are not loading")
 
         for h in self.hosts:
@@ -10,9 +10,12 @@ from mininet.log import lg as log
 from eval.repetita_eval import short_flows, \
     short_flows_completion, eval_flowbender, eval_flowbender_timer, reverse_srh_failure, reverse_srh_load_balancer, \
     traceroute
+from eval.interactive import INTERACTIVE_RATE, INTERACTIVE_SIZES, INTERACTIVE_ZIPF_ALPHA
+from eval.scaling import LINK_MODES, SCALING_SIZES, startup_scaling
 from examples.repetita_network import RepetitaTopo
-from reroutemininet.clean import cleanup
+from reroutemininet.clean import cleanup, teardown
 from reroutemininet.config import SRLocalCtrl
+from reroutemininet.cpus import CPU_CLASSES, parse_policy, placement
 from reroutemininet.net import ReroutingNet
 
 project_dir = os.path.dirname(os.path.abspath(__file__))
@@ -25,15 +28,14 @@ def mininet_cli(lg, args, ovsschema):
     cleanup()
     topo_args = {"schema_tables": ovsschema["tables"], "cwd": args.log_dir,
                  "repetita_graph": os.path.join(project_dir, "examples/fake_albilene/FakeAlbilene.graph"),
-                 "ebpf": args.ebpf, "json_demands": json_demands,
+                 "ebpf": args.ebpf, "json_demands": json_demands, "switch_free": args.switch_free_links,
                  "localctrl_opts": {"short_ebpf_program": SRLocalCtrl.EXP3_LOWEST_DELAY_EBPF_PROGRAM}}
     net = ReroutingNet(topo=RepetitaTopo(**topo_args), static_routing=True)
     try:
         net.start()
         IPCLI(net)
     finally:
-        net.stop()
-        cleanup()
+        teardown(net)
 
 
 tests = {
@@ -45,6 +47,7 @@ tests = {
     "reverse_srh_failure": reverse_srh_failure,
     "reverse_srh_load_balancer": reverse_srh_load_balancer,
     "traceroute": traceroute,
+    "startup_scaling": startup_scaling,
 }
 
 script_dir = os.path.dirname(os.path.abspath(__file__))
@@ -74,6 +77,45 @@ def parse_args():
     parser.add_argument('--with-interactive', action="store_true",
                         help='Send interactive following a Zipf law in volume '
                              'while sending iperf traffic in the evaluation.')
+    parser.add_argument('--interactive-rate', type=float, default=INTERACTIVE_RATE,
+                        help='Mean number of interactive requests by second of each client'
+                             ' (only with --with-interactive)')
+    parser.add_argument('--interactive-sizes', type=int, nargs='+', default=INTERACTIVE_SIZES,
+                        help='Possible volumes of an interactive request in kB, the smallest ones are the most popular'
+                             ' (only with --with-interactive)')
+    parser.add_argument('--interactive-zipf-alpha', type=float, default=INTERACTIVE_ZIPF_ALPHA,
+                        help='Exponent of the Zipf law on the interactive volumes (only with --with-interactive)')
+    parser.add_argument('--interactive-seed', type=int, default=None,
+                        help='Seed of the interactive request generators (only with --with-interactive)')
+    parser.add_argument('--global-cleanup', action="store_true",
+                        help='Kill every emulation process and remove every pinned eBPF object of the machine'
+                             ' before each experiment (e.g., after a crash) instead of only releasing'
+                             ' the resources recorded by the previous experiment')
+    parser.add_argument('--switch-free-links', action="store_true",
+                        help='Connect the routers directly instead of through an intermediate switch'
+                             ' (the delay is then emulated before the shaping on the same interface)')
+    parser.add_argument('--warm-network', action="store_true",
+                        help='Keep the network of a topology running between its flow files'
+                             ' instead of starting it for each of them')
+    parser.add_argument('--iperf-json-stream', action="store_true",
+                        help='Parse the iperf3 intervals while the experiment runs'
+                             ' (needs iperf3 with --json-stream support)')
+    parser.add_argument('--traffic-agent', action="store_true",
+                        help='Send the bulk flows with one traffic agent by host'
+                             ' instead of one iperf3 client and server by demand')
+    parser.add_argument('--http-load', action="store_true",
+                        help='Use the asyncio HTTP load generator instead of ab and'
+                             ' packet captures for short flows')
+    parser.add_argument('--http-load-rate', type=float, default=None,
+                        help='Mean number of requests by second of each client following a Poisson process'
+                             ' (only with --http-load, the default keeps the demand number of requests in flight)')
+    parser.add_argument('--scaling-sizes', type=int, nargs='+', default=SCALING_SIZES,
+                        help='Numbers of routers of the synthetic topologies (only for startup_scaling)')
+    parser.add_argument('--scaling-link-modes', nargs='+', choices=LINK_MODES, default=LINK_MODES,
+                        help='Link models to compare (only for startup_scaling)')
+    parser.add_argument('--cpu-placement', nargs='+', default=None,
+                        help='Restrict the classes of processes (%s) to disjoint CPUs, either "auto" or'
+                             ' a list of <class>=<CPU list> such as "traffic=2-7"' % ", ".join(CPU_CLASSES))
     parser.add_argument('--number-tests',
                         help='Repeat test a given number of times',
                         default=1)
@@ -86,6 +128,8 @@ with open(os.path.join(args.src_dir, "sr.ovsschema"), "r") as fileobj:
     ovsschema = json.load(fileobj)
 
 log.setLogLevel(args.log)
+if args.cpu_placement is not None:
+    placement.configure(parse_policy(args.cpu_placement))
 sr_testdns = os.path.join(os.path.abspath(args.src_dir), "bin", "sr-testdns")
 
 # Add SR components to PATH